@@ -0,0 +1,203 @@
+"""Speculative generation of adaptive follow-up questions for live interviews"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from storage_backends import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculationCancelled(Exception):
+    pass
+
+
+class CancelFlag:
+    """``threading.Event``-like flag that is also set by a cancel from another worker"""
+
+    def __init__(self, generator, interview_id, index, attempt):
+        self.generator = generator
+        self.key = (interview_id, index)
+        self.attempt = attempt
+        self.event = threading.Event()
+
+    def set(self):
+        self.event.set()
+
+    def is_set(self):
+        if not self.event.is_set() and not self.generator._wanted(self.key, self.attempt):
+            self.event.set()
+        return self.event.is_set()
+
+
+class FollowUpGenerator:
+    """Pre-generate the next question while the candidate answers the current one.
+
+    ``generate_fn(history, planned_question, context, cancel_event)`` returns a
+    list of candidate question dicts.  Only one speculation per interview is
+    kept; starting a new one or ending the interview cancels the previous one.
+    Queued work is dropped outright and running work has its result discarded,
+    since an in-flight LLM call cannot be interrupted.
+
+    The next answer may reach a different worker than the one speculating, so
+    speculations are kept in a SQLite file next to the interview sessions
+    (``INTERVIEW_SESSION_DIR``), keyed by interview and question index with a
+    cancel flag: any worker can take a result or cancel a speculation.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS speculations (
+            interview_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            attempt TEXT NOT NULL,
+            state TEXT NOT NULL,
+            cancelled INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            started_at REAL NOT NULL,
+            PRIMARY KEY (interview_id, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS speculations_by_age ON speculations (started_at);
+    """
+
+    def __init__(self, generate_fn, max_workers=2, ttl=6 * 3600, directory=None):
+        self.generate_fn = generate_fn
+        # Speculations of interviews abandoned without being cancelled are dropped after this long
+        self.ttl = ttl
+        self.directory = directory or os.getenv(
+            'INTERVIEW_SESSION_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-sessions')
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='follow-up')
+        self._database = None
+        # Speculations running in this worker, so a cancel here also drops queued work
+        self.running = {}
+        self.lock = threading.Lock()
+
+    @property
+    def database(self):
+        # Opened on first use so importing the app creates no files
+        if self._database is None:
+            with self.lock:
+                if self._database is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._database = SQLiteDatabase(os.path.join(self.directory, 'speculations.db'), self.SCHEMA)
+        return self._database
+
+    def speculate(self, interview_id, index, history, planned_question=None, context=None):
+        """Start generating candidates for question ``index`` in the background"""
+        self._expire_old_speculations()
+        attempt = uuid.uuid4().hex
+        with self.database.connect() as connection:
+            # The interview's earlier speculation is superseded wherever it runs
+            connection.execute(
+                'UPDATE speculations SET cancelled = 1 WHERE interview_id = ? AND position != ?',
+                (interview_id, index)
+            )
+            connection.execute(
+                'INSERT OR REPLACE INTO speculations (interview_id, position, attempt, state, started_at) '
+                "VALUES (?, ?, ?, 'pending', ?)",
+                (interview_id, index, attempt, time.time())
+            )
+        cancel_flag = CancelFlag(self, interview_id, index, attempt)
+        with self.lock:
+            future = self.executor.submit(
+                self._generate, interview_id, index, attempt, history, planned_question, context or {}, cancel_flag
+            )
+            previous = self.running.get(interview_id)
+            self.running[interview_id] = (future, cancel_flag)
+        if previous:
+            self._cancel_local(previous)
+        future.add_done_callback(lambda _: self._forget(interview_id, future))
+        return future
+
+    def _forget(self, interview_id, future):
+        with self.lock:
+            if self.running.get(interview_id, (None,))[0] is future:
+                del self.running[interview_id]
+
+    def _wanted(self, key, attempt):
+        row = self.database.connect().execute(
+            'SELECT attempt, cancelled FROM speculations WHERE interview_id = ? AND position = ?', key
+        ).fetchone()
+        return row is not None and row[0] == attempt and not row[1]
+
+    def _generate(self, interview_id, index, attempt, history, planned_question, context, cancel_flag):
+        try:
+            if cancel_flag.is_set():
+                raise SpeculationCancelled()
+            candidates = self.generate_fn(history, planned_question, context, cancel_flag)
+            state = 'done'
+        except SpeculationCancelled:
+            candidates, state = None, 'failed'
+        except Exception as e:
+            logger.warning("Follow-up generation failed for %s: %s", interview_id, e)
+            candidates, state = None, 'failed'
+        with self.database.connect() as connection:
+            # A cancelled or superseded speculation leaves nothing behind
+            connection.execute(
+                'DELETE FROM speculations WHERE interview_id = ? AND position = ? AND attempt = ? AND cancelled = 1',
+                (interview_id, index, attempt)
+            )
+            connection.execute(
+                'UPDATE speculations SET state = ?, result = ? WHERE interview_id = ? AND position = ? AND attempt = ?',
+                (state, json.dumps(candidates), interview_id, index, attempt)
+            )
+        if cancel_flag.is_set():
+            raise SpeculationCancelled()
+        return candidates
+
+    def take(self, interview_id, index):
+        """Return ready candidates for ``index`` without waiting, else None"""
+        connection = self.database.connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT state, cancelled, result FROM speculations WHERE interview_id = ? AND position = ?',
+                (interview_id, index)
+            ).fetchone()
+            if row is None:
+                return None
+            state, cancelled, result = row
+            if state == 'pending':
+                # Never hold up the candidate; the planned question is served instead
+                connection.execute(
+                    'UPDATE speculations SET cancelled = 1 WHERE interview_id = ? AND position = ?',
+                    (interview_id, index)
+                )
+            else:
+                connection.execute(
+                    'DELETE FROM speculations WHERE interview_id = ? AND position = ?', (interview_id, index)
+                )
+        if state == 'pending':
+            self._cancel_running(interview_id)
+            return None
+        if cancelled or state != 'done':
+            return None
+        return json.loads(result) or None
+
+    def cancel(self, interview_id):
+        with self.database.connect() as connection:
+            connection.execute(
+                "DELETE FROM speculations WHERE interview_id = ? AND state != 'pending'", (interview_id,)
+            )
+            connection.execute('UPDATE speculations SET cancelled = 1 WHERE interview_id = ?', (interview_id,))
+        self._cancel_running(interview_id)
+
+    def _cancel_running(self, interview_id):
+        with self.lock:
+            speculation = self.running.pop(interview_id, None)
+        if speculation:
+            self._cancel_local(speculation)
+
+    def _cancel_local(self, speculation):
+        future, cancel_flag = speculation
+        cancel_flag.set()
+        future.cancel()
+
+    def _expire_old_speculations(self):
+        with self.database.connect() as connection:
+            connection.execute('DELETE FROM speculations WHERE started_at < ?', (time.time() - self.ttl,))
@@ -0,0 +1,355 @@
+"""Admission control and fair queuing for the expensive LLM endpoints.
+
+Each worker runs at most ``ADMISSION_CAPACITY`` admitted requests at once.
+Requests beyond that wait in a queue instead of piling onto Azure OpenAI,
+and are ordered so that one client's batch cannot starve everyone else:
+
+* Requests are ``interactive`` or ``batch``.  The classes share capacity by
+  weight, four interactive dispatches for every batch one while both are
+  waiting, and an idle class cannot bank credit for later.
+* Within a class, clients take turns: one request from each waiting client in
+  round-robin order.
+* A client has at most ``ADMISSION_CLIENT_CONCURRENCY`` requests running and
+  ``ADMISSION_CLIENT_QUEUE`` waiting, and starts requests at a sustained
+  ``ADMISSION_CLIENT_RATE`` per second with bursts of ``ADMISSION_CLIENT_BURST``.
+
+Clients are identified by the server, not by what they claim.  An
+``X-API-Key`` names the client only if it is one of ``ADMISSION_API_KEYS``;
+otherwise the client is its address, read from the ``X-Forwarded-For`` entry
+appended by the last of ``ADMISSION_TRUSTED_PROXIES`` proxies (the earlier
+entries are whatever the client sent).  The class is derived on the server
+too: ``X-Request-Class: batch`` can only lower a request's priority, keys in
+``ADMISSION_BATCH_API_KEYS`` are always batch, and a client's requests beyond
+``ADMISSION_INTERACTIVE_PER_CLIENT`` in flight run as batch, so a flood that
+leaves the header out still yields to people clicking in the UI.
+
+A request whose estimated queue wait exceeds its class's maximum wait is
+rejected at once with ``429`` and ``Retry-After`` rather than timing out
+later; the estimate comes from the queue ahead of it and a moving average of
+recent service times.  Limits apply per worker process.
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache, wraps
+
+from flask import jsonify, request
+
+import deadlines
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+REQUEST_CLASSES = ('interactive', 'batch')
+DEFAULT_WEIGHTS = {'interactive': 4, 'batch': 1}
+OUTCOMES = ('admitted', 'queued', 'demoted', 'rejected_rate', 'rejected_queue', 'rejected_wait', 'timeout')
+
+
+def _env_number(name, default, convert=float):
+    return convert(os.getenv(name, str(default)))
+
+
+def _key_hash(api_key):
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _key_hashes(name):
+    """Hashes of the comma-separated API keys in environment variable ``name``"""
+    return frozenset(_key_hash(key.strip()) for key in os.getenv(name, '').split(',') if key.strip())
+
+
+class Ticket:
+    def __init__(self, client, request_class):
+        self.client = client
+        self.request_class = request_class
+        self.admitted = False
+        self.event = threading.Event()
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """Seconds until a token is available; 0 if one was taken"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class AdmissionController:
+    def __init__(self, capacity=None, client_concurrency=None, client_queue=None, max_queue=None,
+                 client_rate=None, client_burst=None, max_wait=None, weights=None, service_time=None,
+                 max_clients=10000):
+        self.enabled = os.getenv('ADMISSION_CONTROL', 'on').lower() not in ('0', 'off', 'false', 'no')
+        self.capacity = capacity or _env_number('ADMISSION_CAPACITY', 32, int)
+        self.client_concurrency = client_concurrency or _env_number('ADMISSION_CLIENT_CONCURRENCY', 8, int)
+        self.client_queue = client_queue or _env_number('ADMISSION_CLIENT_QUEUE', 16, int)
+        self.max_queue = max_queue or _env_number('ADMISSION_MAX_QUEUE', 64, int)
+        self.client_rate = client_rate or _env_number('ADMISSION_CLIENT_RATE', 5)
+        self.client_burst = client_burst or _env_number('ADMISSION_CLIENT_BURST', 20)
+        self.max_wait = max_wait or {
+            'interactive': _env_number('ADMISSION_MAX_WAIT_INTERACTIVE', 15),
+            'batch': _env_number('ADMISSION_MAX_WAIT_BATCH', 90)
+        }
+        self.weights = weights or DEFAULT_WEIGHTS
+        # Seconds per admitted request until real ones have been measured
+        self.service_time = service_time or _env_number('ADMISSION_SERVICE_TIME', 5)
+        self.max_clients = max_clients
+        # In-flight requests of one client that still count as interactive
+        self.interactive_per_client = _env_number('ADMISSION_INTERACTIVE_PER_CLIENT', 2, int)
+
+        self.lock = threading.Lock()
+        self.running = 0
+        self.running_by_client = {}
+        self.queues = {name: OrderedDict() for name in REQUEST_CLASSES}
+        self.queued = {name: 0 for name in REQUEST_CLASSES}
+        # Stride scheduling: the waiting class with the lowest pass goes next
+        self.passes = {name: 0.0 for name in REQUEST_CLASSES}
+        self.virtual_time = 0.0
+        self.buckets = OrderedDict()
+        self.stats = {(name, outcome): 0 for name in REQUEST_CLASSES for outcome in OUTCOMES}
+
+    def admit(self, view):
+        """Decorator queuing or rejecting calls to ``view`` under the limits above"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return view(*args, **kwargs)
+            client = client_id()
+            request_class = self._classify(client, request_class_of())
+            # A request with little of its deadline left may not wait as long as its class allows
+            max_wait = deadlines.timeout(self.max_wait[request_class])
+            ticket, rejection = self._enter(client, request_class, max_wait)
+            if rejection:
+                return rejected(*rejection)
+
+            if not ticket.admitted:
+                with stage('queue'):
+                    ticket.event.wait(max_wait)
+                retry_after = self._abandon(ticket)
+                if retry_after is not None:
+                    return rejected('timeout', retry_after)
+
+            started = time.monotonic()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                self._release(ticket, time.monotonic() - started)
+        return wrapper
+
+    def _classify(self, client, request_class):
+        """Demote a client's interactive requests beyond the first few in flight to batch"""
+        if request_class != 'interactive':
+            return request_class
+        with self.lock:
+            in_flight = self.running_by_client.get(client, 0) + sum(
+                len(queue.get(client, ())) for queue in self.queues.values()
+            )
+            if in_flight < self.interactive_per_client:
+                return request_class
+            self.stats['interactive', 'demoted'] += 1
+        return 'batch'
+
+    def _enter(self, client, request_class, max_wait):
+        """Queue a ticket and dispatch; returns ``(ticket, None)`` or ``(None, (reason, retry_after))``"""
+        now = time.monotonic()
+        with self.lock:
+            backlog = self.queues[request_class].get(client)
+            if sum(self.queued.values()) >= self.max_queue or (backlog and len(backlog) >= self.client_queue):
+                self.stats[request_class, 'rejected_queue'] += 1
+                return None, ('queue_full', self._estimate_retry())
+
+            bucket = self._bucket(client, now)
+            wait = bucket.take(now)
+            if wait:
+                self.stats[request_class, 'rejected_rate'] += 1
+                return None, ('rate_limited', wait)
+
+            ticket = Ticket(client, request_class)
+            if not self.queued[request_class]:
+                # A class that was idle rejoins at the current virtual time
+                self.passes[request_class] = max(self.passes[request_class], self.virtual_time)
+            self.queues[request_class].setdefault(client, deque()).append(ticket)
+            self.queued[request_class] += 1
+            self._dispatch()
+            if ticket.admitted:
+                self.stats[request_class, 'admitted'] += 1
+                return ticket, None
+
+            estimate = self._estimate_wait(ticket)
+            if estimate > max_wait:
+                self._remove(ticket)
+                bucket.tokens += 1
+                self.stats[request_class, 'rejected_wait'] += 1
+                return None, ('overloaded', estimate - max_wait)
+            self.stats[request_class, 'queued'] += 1
+            return ticket, None
+
+    def _abandon(self, ticket):
+        """Take a ticket that waited too long out of the queue and return a Retry-After.
+
+        Returns None if it was admitted after all.
+        """
+        with self.lock:
+            if ticket.admitted:
+                return None
+            self._remove(ticket)
+            self.stats[ticket.request_class, 'timeout'] += 1
+            return self._estimate_retry()
+
+    def _release(self, ticket, elapsed):
+        with self.lock:
+            self.running -= 1
+            remaining = self.running_by_client[ticket.client] - 1
+            if remaining:
+                self.running_by_client[ticket.client] = remaining
+            else:
+                del self.running_by_client[ticket.client]
+            self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+            self._dispatch()
+
+    def _bucket(self, client, now):
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.client_rate, self.client_burst, now)
+            if len(self.buckets) > self.max_clients:
+                # A full bucket is indistinguishable from a new one
+                for key in list(self.buckets)[:len(self.buckets) // 10]:
+                    if self.buckets[key].full(now):
+                        del self.buckets[key]
+        else:
+            self.buckets.move_to_end(client)
+        return bucket
+
+    def _remove(self, ticket):
+        queue = self.queues[ticket.request_class]
+        backlog = queue.get(ticket.client)
+        if backlog and ticket in backlog:
+            backlog.remove(ticket)
+            self.queued[ticket.request_class] -= 1
+            if not backlog:
+                del queue[ticket.client]
+
+    def _dispatch(self):
+        """Admit waiting tickets while capacity lasts; called with the lock held"""
+        while self.running < self.capacity:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            ticket.admitted = True
+            self.running += 1
+            self.running_by_client[ticket.client] = self.running_by_client.get(ticket.client, 0) + 1
+            ticket.event.set()
+
+    def _eligible_client(self, request_class):
+        for client in self.queues[request_class]:
+            if self.running_by_client.get(client, 0) < self.client_concurrency:
+                return client
+        return None
+
+    def _next_ticket(self):
+        choice = None
+        for request_class in REQUEST_CLASSES:
+            client = self._eligible_client(request_class)
+            if client is not None and (choice is None or self.passes[request_class] < self.passes[choice[0]]):
+                choice = (request_class, client)
+        if choice is None:
+            return None
+
+        request_class, client = choice
+        queue = self.queues[request_class]
+        backlog = queue[client]
+        ticket = backlog.popleft()
+        # Round robin: this client goes to the back of its class
+        del queue[client]
+        if backlog:
+            queue[client] = backlog
+        self.queued[request_class] -= 1
+        self.virtual_time = self.passes[request_class]
+        self.passes[request_class] += 1 / self.weights[request_class]
+        return ticket
+
+    def _estimate_wait(self, ticket):
+        """Seconds until ``ticket`` is likely admitted, from the queues ahead of it"""
+        own_class = ticket.request_class
+        ahead = self.queued[own_class] - 1
+        # Other classes are served in proportion to their weight meanwhile
+        for other in REQUEST_CLASSES:
+            if other != own_class:
+                share = (ahead + 1) * self.weights[other] / self.weights[own_class]
+                ahead += min(self.queued[other], share)
+        client_ahead = len(self.queues[own_class][ticket.client]) - 1
+        return self.service_time * max(
+            (ahead + 1) / self.capacity,
+            (client_ahead + 1) / self.client_concurrency
+        )
+
+    def _estimate_retry(self):
+        """Seconds for the current queue to drain"""
+        return self.service_time * (sum(self.queued.values()) + 1) / self.capacity
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'running': self.running,
+                'queued': dict(self.queued),
+                'clients': len(self.running_by_client),
+                'service_time_seconds': self.service_time,
+                'outcomes': dict(self.stats)
+            }
+
+
+def client_id():
+    """The hash of a configured API key when one is sent, otherwise the caller's address"""
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        digest = _key_hash(api_key)
+        if digest in _key_hashes('ADMISSION_API_KEYS') or digest in _key_hashes('ADMISSION_BATCH_API_KEYS'):
+            return 'key:' + digest[:16]
+    return 'addr:' + client_address()
+
+
+def client_address():
+    """The address the nearest trusted proxy saw; earlier X-Forwarded-For entries are client-supplied"""
+    trusted = _env_number('ADMISSION_TRUSTED_PROXIES', 1, int)
+    forwarded = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+    if trusted and len(forwarded) >= trusted:
+        return forwarded[-trusted]
+    return request.remote_addr or 'unknown'
+
+
+def request_class_of():
+    """The class a request asked for; a header can only lower its priority"""
+    api_key = request.headers.get('X-API-Key')
+    if api_key and _key_hash(api_key) in _key_hashes('ADMISSION_BATCH_API_KEYS'):
+        return 'batch'
+    requested = request.headers.get('X-Request-Class', '').strip().lower()
+    return 'batch' if requested == 'batch' else 'interactive'
+
+
+def rejected(reason, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    logger.debug("Rejected %s %s: %s, retry after %ss", request.method, request.path, reason, retry_after)
+    response = jsonify({
+        'error': 'Too many requests, please retry later',
+        'reason': reason,
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
@@ -0,0 +1,69 @@
+"""Call analysis storage in a blob store with deterministic keys and a summary index"""
+from urllib.parse import quote
+
+from history_index import add_index_entry, delete_index_entry, is_index_blob, page_index_entries
+
+ANALYSIS_CONTAINER = "call-analysis-history"
+ANALYSIS_PREFIX = "analyses/"
+ANALYSIS_FILTER_FIELDS = ('recommendation',)
+
+
+def analysis_blob_name(interview_id):
+    """Primary key: one blob per interview, derived from the interview ID"""
+    return f"{ANALYSIS_PREFIX}{quote(interview_id, safe='')}.json"
+
+
+def analysis_summary(data):
+    """Fields shown in the analysis history list"""
+    jd_text = data.get('jd_text')
+    summary = (data.get('analysis') or {}).get('analysis', {}).get('summary') or 'No summary'
+    return {
+        'interview_id': data.get('interview_id'),
+        'timestamp': data.get('timestamp'),
+        'jd_preview': jd_text[:100] + '...' if jd_text else 'No JD',
+        'analysis_summary': summary[:100] + '...',
+        'recommendation': data.get('recommendation')
+    }
+
+
+def save_analysis(store, storage_data, container_name=ANALYSIS_CONTAINER):
+    """Write an analysis under its interview key and add it to the summary index"""
+    interview_id = storage_data['interview_id']
+    store.ensure_container(container_name)
+
+    blob_name = analysis_blob_name(interview_id)
+    previous_index = (store.get_metadata(container_name, blob_name) or {}).get('index_blob')
+
+    summary = analysis_summary(storage_data)
+    index_name = add_index_entry(
+        store, container_name, interview_id, summary['timestamp'], summary, ANALYSIS_FILTER_FIELDS
+    )
+    store.put_json(container_name, blob_name, storage_data, metadata={'index_blob': index_name})
+
+    # A re-analysed interview keeps a single entry in the index
+    if previous_index and previous_index != index_name:
+        delete_index_entry(store, container_name, previous_index)
+    return blob_name
+
+
+def load_analysis(store, interview_id, container_name=ANALYSIS_CONTAINER):
+    """Single blob read by interview ID; None when it does not exist"""
+    return store.get_json(container_name, analysis_blob_name(interview_id))
+
+
+def page_analysis_summaries(store, limit=20, cursor=None, recommendation=None,
+                            date_from=None, date_to=None, container_name=ANALYSIS_CONTAINER):
+    """One page of analysis summaries, newest first, read from the index only"""
+    entries, next_cursor = page_index_entries(
+        store, container_name, limit, cursor,
+        {'recommendation': recommendation}, date_from, date_to
+    )
+    for entry in entries:
+        key = entry.pop('key')
+        entry.setdefault('interview_id', key)
+    return entries, next_cursor
+
+
+def is_legacy_blob(blob_name):
+    """Blobs written before deterministic keys were introduced"""
+    return not (blob_name.startswith(ANALYSIS_PREFIX) or is_index_blob(blob_name))
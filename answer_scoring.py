@@ -0,0 +1,187 @@
+"""Background per-answer scoring for live interviews"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from storage_backends import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# How often aggregate() looks for answers scored by another worker
+POLL_INTERVAL = 0.2
+
+
+def recommendation_for_score(score):
+    """Same thresholds the call analysis uses for its recommendation"""
+    if score >= 80:
+        return 'Recommended for next round'
+    elif score >= 70:
+        return 'Maybe'
+    return 'Not recommended'
+
+
+class AnswerScorer:
+    """Score each answer as soon as it is submitted and store it by interview ID.
+
+    ``score_fn(question, answer, context)`` returns a dict with at least a
+    0-100 ``score``.  By the time the last answer arrives every earlier answer
+    has already been scored, so the final result is a cheap aggregation.
+
+    Answers of one interview reach whichever worker gets the request, so the
+    scores are kept in a SQLite file next to the interview sessions
+    (``INTERVIEW_SESSION_DIR``) and any worker can aggregate them.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS answer_scores (
+            interview_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            attempt TEXT NOT NULL,
+            state TEXT NOT NULL,
+            result TEXT,
+            submitted_at REAL NOT NULL,
+            PRIMARY KEY (interview_id, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS answer_scores_by_age ON answer_scores (submitted_at);
+    """
+
+    def __init__(self, score_fn, max_workers=4, ttl=6 * 3600, score_timeout=300, directory=None):
+        self.score_fn = score_fn
+        self.ttl = ttl
+        # An answer still pending after this long belonged to a worker that died
+        self.score_timeout = score_timeout
+        self.directory = directory or os.getenv(
+            'INTERVIEW_SESSION_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-sessions')
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='answer-score')
+        self._database = None
+        # Answers this worker is scoring, so aggregate() here can wait without polling
+        self.running = {}
+        self.lock = threading.Lock()
+
+    @property
+    def database(self):
+        # Opened on first use so importing the app creates no files
+        if self._database is None:
+            with self.lock:
+                if self._database is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._database = SQLiteDatabase(os.path.join(self.directory, 'answer_scores.db'), self.SCHEMA)
+        return self._database
+
+    def submit(self, interview_id, index, question, answer, context=None):
+        """Start scoring one answer in the background"""
+        self._expire_old_interviews()
+        # A resubmitted answer replaces the earlier attempt, whose result is then dropped
+        attempt = uuid.uuid4().hex
+        with self.database.connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO answer_scores (interview_id, position, question, attempt, state, submitted_at) '
+                "VALUES (?, ?, ?, ?, 'pending', ?)",
+                (interview_id, index, question, attempt, time.time())
+            )
+        key = (interview_id, index)
+        with self.lock:
+            future = self.executor.submit(self._score, key, attempt, question, answer, context or {})
+            previous = self.running.get(key)
+            self.running[key] = future
+        if previous:
+            previous.cancel()
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key, future):
+        with self.lock:
+            if self.running.get(key) is future:
+                del self.running[key]
+
+    def _score(self, key, attempt, question, answer, context):
+        result = self._evaluate(question, answer, context)
+        state = 'scored' if result.get('score') is not None else 'failed'
+        with self.database.connect() as connection:
+            connection.execute(
+                'UPDATE answer_scores SET state = ?, result = ? WHERE interview_id = ? AND position = ? AND attempt = ?',
+                (state, json.dumps(result), key[0], key[1], attempt)
+            )
+        return result
+
+    def _evaluate(self, question, answer, context):
+        if not answer or not answer.strip():
+            return {'score': 0, 'feedback': 'No answer given', 'strengths': [], 'concerns': ['No answer given']}
+        try:
+            result = self.score_fn(question, answer, context)
+            result['score'] = max(0, min(100, int(result.get('score', 0))))
+            return result
+        except Exception as e:
+            logger.warning("Answer scoring failed: %s", e)
+            return {'score': None, 'feedback': f'Scoring failed: {e}', 'strengths': [], 'concerns': []}
+
+    def partial_scores(self, interview_id):
+        """Scores finished so far, without waiting on pending answers; None for an unknown interview"""
+        rows = self.database.connect().execute(
+            'SELECT position, question, state, result, submitted_at FROM answer_scores '
+            'WHERE interview_id = ? ORDER BY position',
+            (interview_id,)
+        ).fetchall()
+        if not rows:
+            return None
+        abandoned_before = time.time() - self.score_timeout
+        scores = []
+        for index, question, state, result, submitted_at in rows:
+            item = {'index': index, 'question': question, 'status': state}
+            if state == 'pending' and submitted_at < abandoned_before:
+                item.update({'score': None, 'feedback': 'Scoring was interrupted', 'strengths': [], 'concerns': []})
+                item['status'] = 'failed'
+            elif result is not None:
+                item.update(json.loads(result))
+            scores.append(item)
+        return scores
+
+    def aggregate(self, interview_id, timeout=60):
+        """Wait for outstanding answers and combine the per-answer scores"""
+        until = time.monotonic() + timeout
+        with self.lock:
+            local = [future for key, future in self.running.items() if key[0] == interview_id]
+        wait(local, timeout=timeout)
+
+        # Answers submitted to other workers are scored there
+        answers = self.partial_scores(interview_id)
+        while answers and any(a['status'] == 'pending' for a in answers) and time.monotonic() < until:
+            time.sleep(min(POLL_INTERVAL, max(0.0, until - time.monotonic())))
+            answers = self.partial_scores(interview_id)
+        if answers is None:
+            return None
+
+        scored = [a['score'] for a in answers if a['status'] == 'scored']
+        overall = round(sum(scored) / len(scored)) if scored else 0
+        return {
+            'interview_id': interview_id,
+            'overall_score': overall,
+            'recommendation': recommendation_for_score(overall),
+            'answers_scored': len(scored),
+            'answers_pending': len([a for a in answers if a['status'] == 'pending']),
+            'strengths': [s for a in answers for s in a.get('strengths', [])],
+            'concerns': [c for a in answers for c in a.get('concerns', [])],
+            'answers': answers
+        }
+
+    def discard(self, interview_id):
+        with self.lock:
+            for key in [key for key in self.running if key[0] == interview_id]:
+                self.running.pop(key).cancel()
+        with self.database.connect() as connection:
+            connection.execute('DELETE FROM answer_scores WHERE interview_id = ?', (interview_id,))
+
+    def _expire_old_interviews(self):
+        cutoff = time.time() - self.ttl
+        expired = [interview_id for (interview_id,) in self.database.connect().execute(
+            'SELECT interview_id FROM answer_scores GROUP BY interview_id HAVING MAX(submitted_at) < ?', (cutoff,)
+        )]
+        for interview_id in expired:
+            self.discard(interview_id)
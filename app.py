@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, render_template, session, Response, redirect
+from flask import Flask, request, jsonify, render_template, session, Response, redirect, send_file
 from flask_cors import CORS
 import json
 import time
@@ -6,25 +6,64 @@ import random
 from werkzeug.utils import secure_filename
 import os
 from dotenv import load_dotenv
-import PyPDF2
-import docx
 import io
 from datetime import datetime
 import re
+import threading
+import logging
+import uuid
+import hmac
+from streaming_transcription import StreamingTranscriber
+from answer_scoring import AnswerScorer, recommendation_for_score
+from adaptive_questions import FollowUpGenerator
+from text_to_speech import TTSCache, create_synthesizer, DEFAULT_VOICE, VOICE_PATTERN
+from analysis_store import save_analysis, load_analysis, page_analysis_summaries
+from qa_store import save_qa_session, load_qa_session, page_qa_summaries, new_qa_blob_name
+from persistence_queue import WriteBehindQueue
+from storage_backends import create_blob_store, create_document_store, io_map
+from response_cache import ResponseCache
+from history_export import EXPORT_FORMATS, iter_records, render
+from history_index import build_range_conditions
+from dashboard_aggregates import (
+    DashboardAggregates, match_event, qa_session_event, interview_started_event, interview_analyzed_event
+)
+from app_logging import configure_logging
+import metrics
+from metrics import stage
+from request_profiler import RequestProfiler
+from interview_sessions import InterviewSessionStore
+from admission_control import AdmissionController
+from idempotency import IdempotencyStore
+from question_bank import QuestionBank
+import deadlines
+from deadlines import RequestCancelled
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+metrics.instrument_app(app)
+# Every request gets a deadline that downstream calls and retries honour
+deadlines.install(app)
+
+# Requests can be profiled on demand (X-Profile header) or at random (PROFILE_SAMPLE_RATE)
+request_profiler = RequestProfiler()
+request_profiler.install(app)
+
+# LLM endpoints are queued fairly per client and shed with 429 when the queue is too long
+admission = AdmissionController()
+
+# Retries carrying the same Idempotency-Key replay the first response instead of running again
+idempotency = IdempotencyStore()
 
 # Configure Azure OpenAI
 AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT')
 AZURE_OPENAI_API_KEY = os.getenv('AZURE_OPENAI_API_KEY')
 AZURE_DEPLOYMENT_NAME = os.getenv('AZURE_DEPLOYMENT_NAME', 'Phi-4-mini-instruct')
-
-# Configure Azure Storage
-AZURE_STORAGE_ACCOUNT_NAME = os.getenv('AZURE_STORAGE_ACCOUNT_NAME', 'qageneratorhistory')
-AZURE_STORAGE_ACCOUNT_KEY = os.getenv('AZURE_STORAGE_ACCOUNT_KEY')
+# Longest single completion call; a request's deadline may cut it shorter
+AZURE_OPENAI_TIMEOUT = float(os.getenv('AZURE_OPENAI_TIMEOUT', '90'))
 
 # Configure Azure Speech
 AZURE_SPEECH_KEY = os.getenv('AZURE_SPEECH_KEY')
@@ -32,38 +71,123 @@ AZURE_SPEECH_REGION = os.getenv('AZURE_SPEECH_REGION')
 AZURE_FAST_TRANSCRIPTION_ENDPOINT = os.getenv('AZURE_FAST_TRANSCRIPTION_ENDPOINT')
 AZURE_FAST_TRANSCRIPTION_KEY = os.getenv('AZURE_FAST_TRANSCRIPTION_KEY')
 
-print(f"Loaded endpoint: {AZURE_OPENAI_ENDPOINT}")
-print(f"Loaded deployment: {AZURE_DEPLOYMENT_NAME}")
+logger.info("Loaded endpoint: %s", AZURE_OPENAI_ENDPOINT)
+logger.info("Loaded deployment: %s", AZURE_DEPLOYMENT_NAME)
 
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-key-change-in-production')
 
-# Initialize Azure Storage
-try:
-    from azure.storage.blob import BlobServiceClient
-    if AZURE_STORAGE_ACCOUNT_KEY:
-        blob_service_client = BlobServiceClient(
-            account_url=f"https://{AZURE_STORAGE_ACCOUNT_NAME}.blob.core.windows.net",
-            credential=AZURE_STORAGE_ACCOUNT_KEY
-        )
-        print("Azure Storage initialized successfully")
-    else:
-        blob_service_client = None
-        print("Azure Storage credentials not provided")
-except Exception as e:
-    print(f"Azure Storage initialization failed: {e}")
-    blob_service_client = None
-
-# Initialize Firestore (optional)
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_PATH', 'firebase-key.json'))
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-except Exception as e:
-    print(f"Firestore initialization failed: {e}")
-    db = None
+# Clients are created on first use rather than at import, so workers boot quickly and the
+# app still imports without credentials.  /readyz creates them all ahead of traffic.
+_clients = {}
+_clients_lock = threading.RLock()
+
+def lazy_client(name, factory):
+    """Build a client once per process; a None result (not configured) is remembered too"""
+    if name not in _clients:
+        with _clients_lock:
+            if name not in _clients:
+                _clients[name] = factory()
+    return _clients[name]
+
+# Storage: Azure Blob and Firestore by default, SQLite with STORAGE_BACKEND=local
+def get_blob_store():
+    return lazy_client('blob_store', create_blob_store)
+
+def get_document_store():
+    return lazy_client('document_store', create_document_store)
+
+# Dashboards read one aggregate document, updated as the underlying data is written
+def get_dashboard_aggregates():
+    return lazy_client(
+        'dashboard_aggregates',
+        lambda: DashboardAggregates(get_document_store()) if get_document_store() else None
+    )
+
+# Live interview state is kept server-side; the session cookie only carries its ID
+def get_interview_sessions():
+    return lazy_client('interview_sessions', InterviewSessionStore)
+
+# Keys the cookie carried before interview state moved server-side
+LEGACY_INTERVIEW_KEYS = ('interview_id', 'current_question', 'questions', 'transcript', 'role', 'adaptive')
+
+def current_interview():
+    session_id = session.get('interview_session')
+    return get_interview_sessions().get(session_id) if session_id else None
+
+# Questions for catalog roles are pre-generated by build_question_bank.py
+def get_question_bank():
+    return lazy_client('question_bank', QuestionBank)
+
+# Role recorded for Q&A sessions on job descriptions outside the catalog
+CUSTOM_ROLE = 'Custom'
+
+# Dashboard and history reads are cached; persisting a write invalidates what depends on it
+response_cache = ResponseCache()
+
+# Storage writes are persisted in the background after the response is sent
+def persist_qa_sessions(payloads):
+    def save(payload):
+        save_qa_session(get_blob_store(), payload['data'], payload['blob_name'])
+        logger.debug("Saved QA session: %s", payload['blob_name'])
+    
+    io_map(save, payloads)
+    response_cache.invalidate('qa_sessions')
+
+def persist_call_analyses(payloads):
+    # Only the newest analysis of an interview re-analysed within one batch is written
+    latest = {storage_data['interview_id']: storage_data for storage_data in payloads}
+    
+    def save(storage_data):
+        blob_name = save_analysis(get_blob_store(), storage_data)
+        logger.debug("Saved call analysis: %s", blob_name)
+    
+    io_map(save, latest.values())
+    response_cache.invalidate('call_analyses')
+
+def persist_documents(payloads):
+    get_document_store().set_many([(p['collection'], p['document_id'], p['data']) for p in payloads])
+    response_cache.invalidate(*{p['collection'] for p in payloads})
+
+def persist_dashboard_events(events):
+    get_dashboard_aggregates().record(events)
+    response_cache.invalidate('dashboard')
+
+DASHBOARD_EVENTS = {'matches': match_event, 'qa_sessions': qa_session_event}
+
+persistence_queue = WriteBehindQueue(maxsize=int(os.getenv('PERSISTENCE_QUEUE_SIZE', '1000')))
+
+def register_persistence_handler(kind, handler):
+    """Register a write-behind handler; each batch it writes is timed as a write_behind stage"""
+    def timed_handler(payloads):
+        with stage(kind, endpoint='write_behind'):
+            handler(payloads)
+    persistence_queue.register(kind, timed_handler)
+
+register_persistence_handler('qa_session', persist_qa_sessions)
+register_persistence_handler('call_analysis', persist_call_analyses)
+register_persistence_handler('document', persist_documents)
+register_persistence_handler('dashboard', persist_dashboard_events)
+# Started by the first request rather than at import, so tooling that imports the app
+# neither creates a spool nor replays one
+app.before_request(persistence_queue.start)
+
+def persist_document(collection, data, document_id=None):
+    """Queue a document write; IDs are fixed up front so replays are idempotent"""
+    if not get_document_store():
+        return
+    document_id = document_id or uuid.uuid4().hex
+    persistence_queue.enqueue('document', {
+        'collection': collection,
+        'document_id': document_id,
+        'data': data
+    })
+    if collection in DASHBOARD_EVENTS:
+        record_dashboard_event(DASHBOARD_EVENTS[collection](data), f"{collection}/{document_id}")
+
+def record_dashboard_event(event, event_id):
+    """Queue a dashboard event; the aggregate applies each ``event_id`` once"""
+    if get_dashboard_aggregates():
+        persistence_queue.enqueue('dashboard', dict(event, event_id=event_id))
 
 SYSTEM_PROMPT = """You are TalentCore AI, a high-fidelity Talent Acquisition Intelligence agent. Your objective is to assist HR teams in 5 critical areas:
 
@@ -94,76 +218,41 @@ def extract_json_from_text(text):
         
         return json.loads(text)
 def save_to_azure_storage(data):
-    """Save QA session data to Azure Storage"""
-    if not blob_service_client:
+    """Queue QA session data for saving to Azure Storage"""
+    if not get_blob_store():
         return
     
     try:
-        import uuid
-        container_name = "qa-history"
-        blob_name = f"qa-session-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{str(uuid.uuid4())[:8]}.json"
-        
-        # Create container if it doesn't exist
-        try:
-            blob_service_client.create_container(container_name)
-        except:
-            pass  # Container already exists
-        
-        # Upload data
-        blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
-        blob_client.upload_blob(json.dumps(data), overwrite=True)
-        print(f"Saved QA session to Azure Storage: {blob_name}")
+        persistence_queue.enqueue('qa_session', {'blob_name': new_qa_blob_name(), 'data': data})
     except Exception as e:
-        print(f"Error saving to Azure Storage: {e}")
-
-def load_from_azure_storage():
-    """Load QA history from Azure Storage"""
-    if not blob_service_client:
-        print("Azure Storage client not available")
-        return []
-    
-    try:
-        container_name = "qa-history"
-        print(f"Connecting to container: {container_name}")
-        container_client = blob_service_client.get_container_client(container_name)
-        
-        history = []
-        blobs = container_client.list_blobs()
-        print("Listing blobs...")
-        
-        # Get all sessions, sorted by last modified
-        blob_list = sorted(blobs, key=lambda x: x.last_modified, reverse=True)
-        print(f"Found {len(blob_list)} blobs")
-        
-        for blob in blob_list:
-            try:
-                print(f"Reading blob: {blob.name}")
-                blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob.name)
-                data = json.loads(blob_client.download_blob().readall())
-                # Add blob name for retrieval
-                data['blob_name'] = blob.name
-                history.append(data)
-            except Exception as e:
-                print(f"Error reading blob {blob.name}: {e}")
-        
-        print(f"Successfully loaded {len(history)} history items")
-        return history
-    except Exception as e:
-        print(f"Error loading from Azure Storage: {e}")
-        return []
+        logger.error("Error saving to Azure Storage: %s", e)
 
 def retry_with_backoff(func, max_retries=3):
     for attempt in range(max_retries):
+        deadlines.check()
         try:
             return func()
+        except RequestCancelled:
+            raise
         except Exception as e:
-            print(f"Attempt {attempt + 1} failed: {str(e)}")
+            logger.warning("Attempt %d failed: %s", attempt + 1, e)
             if attempt == max_retries - 1:
                 raise e
-            time.sleep(2 ** attempt + random.uniform(0, 1))
+            metrics.record_retry()
+            # Gives up at once if the request's deadline would pass before the next attempt
+            deadlines.sleep(2 ** attempt + random.uniform(0, 1))
 
 def transcribe_audio(audio_file):
     """Transcribe audio using Azure Fast Transcription"""
+    audio_file.seek(0)
+    return transcribe_audio_bytes(audio_file.filename, audio_file.read())
+
+def transcribe_audio_bytes(filename, audio_data):
+    """Transcribe raw audio bytes using Azure Fast Transcription"""
+    return transcribe_audio_detailed(filename, audio_data)['text']
+
+def transcribe_audio_detailed(filename, audio_data):
+    """Transcribe audio bytes, keeping phrase offsets, durations and speakers"""
     try:
         import requests
         from requests.adapters import HTTPAdapter
@@ -177,19 +266,25 @@ def transcribe_audio(audio_file):
                 "Accept": "application/json"
             }
             
-            audio_file.seek(0)
-            audio_data = audio_file.read()
-            
-            filename = audio_file.filename.lower()
-            if filename.endswith('.m4a'):
+            lower_name = (filename or '').lower()
+            if lower_name.endswith('.m4a'):
                 content_type = "audio/mp4"
-            elif filename.endswith('.mp3'):
+            elif lower_name.endswith('.mp3'):
                 content_type = "audio/mpeg"
+            elif lower_name.endswith('.webm'):
+                content_type = "audio/webm"
+            elif lower_name.endswith('.ogg'):
+                content_type = "audio/ogg"
             else:
                 content_type = "audio/wav"
             
-            files = {"audio": (audio_file.filename, audio_data, content_type)}
-            data = {"locales": ["en-US"], "profanityFilterMode": "Masked"}
+            files = {"audio": (filename, audio_data, content_type)}
+            definition = {
+                "locales": ["en-US"],
+                "profanityFilterMode": "Masked",
+                "diarization": {"enabled": True, "maxSpeakers": 2}
+            }
+            data = {"definition": json.dumps(definition)}
             
             # Create session with retry
             session = requests.Session()
@@ -198,16 +293,20 @@ def transcribe_audio(audio_file):
             session.mount('http://', adapter)
             session.mount('https://', adapter)
             
-            print(f"Calling: {endpoint}")
-            response = session.post(endpoint, headers=headers, files=files, data=data, timeout=180)
+            logger.debug("Calling: %s", endpoint)
+            response = session.post(endpoint, headers=headers, files=files, data=data, timeout=deadlines.timeout(180))
             
-            print(f"Response status: {response.status_code}")
+            logger.debug("Response status: %s", response.status_code)
             
             if response.status_code == 200:
                 result = response.json()
-                phrases = result.get("combinedPhrases", [])
-                if phrases:
-                    return phrases[0].get("text", "No transcript available")
+                combined = result.get("combinedPhrases", [])
+                if combined:
+                    return {
+                        'text': combined[0].get("text", "No transcript available"),
+                        'phrases': result.get("phrases", []),
+                        'duration_ms': result.get("durationMilliseconds")
+                    }
                 else:
                     raise Exception("No transcript in response")
             else:
@@ -215,47 +314,116 @@ def transcribe_audio(audio_file):
         else:
             raise Exception("Azure Fast Transcription credentials not configured")
             
+    except RequestCancelled:
+        raise
     except Exception as e:
-        print(f"Transcription error: {e}")
+        logger.error("Transcription error: %s", e)
         raise Exception(f"Failed to transcribe: {str(e)}")
 
-def call_azure_openai(prompt):
+# Segments uploaded during a voice interview are transcribed as they arrive
+streaming_transcriber = StreamingTranscriber(transcribe_audio_detailed)
+
+def _create_openai_client():
+    from openai import AzureOpenAI
+    
+    return AzureOpenAI(
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        api_key=AZURE_OPENAI_API_KEY,
+        api_version="2024-02-15-preview",
+        # retry_with_backoff retries within the request deadline; SDK retries would not
+        max_retries=0
+    )
+
+def get_openai_client():
+    """One client per process, so concurrent requests share its connection pool"""
+    return lazy_client('openai', _create_openai_client)
+
+def call_azure_openai(prompt, max_tokens=1200):
     """Call Azure OpenAI API"""
     try:
-        from openai import AzureOpenAI
-
-        client = AzureOpenAI(
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_key=AZURE_OPENAI_API_KEY,
-            api_version="2024-02-15-preview"
-        )
-        
-        completion = client.chat.completions.create(
-            model=AZURE_DEPLOYMENT_NAME,
-            messages=[
-                {'role': 'system', 'content': SYSTEM_PROMPT},
-                {'role': 'user', 'content': prompt}
-            ],
-            max_tokens=1200,
-            temperature=0.7
-        )
+        with stage('llm'):
+            completion = get_openai_client().chat.completions.create(
+                model=AZURE_DEPLOYMENT_NAME,
+                messages=[
+                    {'role': 'system', 'content': SYSTEM_PROMPT},
+                    {'role': 'user', 'content': prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.7,
+                timeout=deadlines.timeout(AZURE_OPENAI_TIMEOUT)
+            )
+        metrics.record_token_usage(getattr(completion, 'usage', None))
         
         content = completion.choices[0].message.content
-        print(f"Azure API Response: {content[:200]}...")
+        logger.debug("Azure API Response: %s...", content[:200])
         
         # Use improved JSON extraction
-        return extract_json_from_text(content)
+        with stage('parse'):
+            return extract_json_from_text(content)
             
     except Exception as e:
-        print(f"Azure OpenAI Error: {str(e)}")
+        logger.error("Azure OpenAI Error: %s", e)
         # Return fallback only if all retries fail
         raise e
 
+def score_answer(question, answer, context):
+    """Short evaluation of a single interview answer"""
+    prompt = f"""Score this interview answer for a {context.get('role') or 'general'} role. Return valid JSON only:
+
+Question: {question[:400]}
+Answer: {answer[:1500]}
+
+{{"score": <0-100>, "feedback": "<one sentence>", "strengths": ["<short>"], "concerns": ["<short>"]}}"""
+    
+    def call_azure():
+        return call_azure_openai(prompt, max_tokens=250)
+    
+    return retry_with_backoff(call_azure)
+
+# Live interview answers are scored in the background as they are submitted
+answer_scorer = AnswerScorer(score_answer)
+
+def generate_follow_up_questions(history, planned_question, context, cancel_event):
+    """Follow-up question candidates based on the answers given so far"""
+    answers = "\n".join(f"Q: {h['question'][:200]}\nA: {h['answer'][:400]}" for h in history[-3:])
+    planned = planned_question.get('question', '') if planned_question else ''
+    prompt = f"""You are interviewing a candidate for a {context.get('role') or 'general'} role. Return valid JSON only.
+
+Recent answers:
+{answers}
+
+Planned next question: {planned}
+
+Write 2 follow-up questions that probe gaps or claims in the recent answers while covering the planned topic.
+
+{{"candidates": [{{"question": "<question>", "type": "follow-up", "rationale": "<short>"}}]}}"""
+    
+    def call_azure():
+        if cancel_event.is_set():
+            return {'candidates': []}
+        return call_azure_openai(prompt, max_tokens=300)
+    
+    result = retry_with_backoff(call_azure)
+    candidates = [c for c in result.get('candidates', []) if c.get('question')]
+    for candidate in candidates:
+        candidate.setdefault('type', 'follow-up')
+        if planned_question and planned_question.get('expected_duration'):
+            candidate.setdefault('expected_duration', planned_question['expected_duration'])
+    return candidates
+
+# Question audio is synthesized once per text and voice and served from disk
+tts_cache = TTSCache(create_synthesizer())
+
+# Adaptive interviews pre-generate the next question while the current one is answered
+follow_up_generator = FollowUpGenerator(generate_follow_up_questions)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/api/match', methods=['POST'])
+@idempotency.idempotent
+@admission.admit
 def match_jd_resume():
     try:
         jd_text = request.form.get('jd_text')
@@ -266,14 +434,16 @@ def match_jd_resume():
         
         # Extract text from different file formats
         filename = secure_filename(resume_file.filename)
-        if filename.endswith('.pdf'):
-            resume_text = extract_pdf_text(resume_file)
-        elif filename.endswith('.docx'):
-            resume_text = extract_docx_text(resume_file)
-        else:
-            resume_text = resume_file.read().decode('utf-8')
+        with stage('extract'):
+            if filename.endswith('.pdf'):
+                resume_text = extract_pdf_text(resume_file)
+            elif filename.endswith('.docx'):
+                resume_text = extract_docx_text(resume_file)
+            else:
+                resume_text = resume_file.read().decode('utf-8')
         
-        prompt = f"""{SYSTEM_PROMPT}
+        with stage('prompt'):
+            prompt = f"""{SYSTEM_PROMPT}
 
 Compare this Job Description with the Resume and provide a matching analysis:
 
@@ -288,65 +458,42 @@ Return JSON with: score (0-100), skill_gaps (array), strengths (array), cultural
         result = retry_with_backoff(call_azure)
         
         # Store in Firestore
-        if db:
+        if get_document_store():
             try:
-                db.collection('matches').add({
-                    'jd_text': jd_text[:500],  # Store first 500 chars
-                    'filename': filename,
-                    'result': result,
-                    'timestamp': datetime.now()
-                })
+                with stage('persist'):
+                    persist_document('matches', {
+                        'jd_text': jd_text[:500],  # Store first 500 chars
+                        'filename': filename,
+                        'result': result,
+                        'timestamp': datetime.now()
+                    })
             except Exception as e:
-                print(f"Firestore error: {e}")
+                logger.error("Firestore error: %s", e)
         
         return jsonify(result)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/generate-qa', methods=['POST'])
-def generate_qa():
-    import uuid
-    request_id = str(uuid.uuid4())[:8]
-    
-    try:
-        # Get parameters from request
-        job_description = request.json.get('jobDescription')
-        experience_level = request.json.get('experienceLevel')
-        skill_level = request.json.get('skillLevel')
-        question_type = request.json.get('questionType')
-        
-        print(f"[{request_id}] Request received - Experience: {experience_level}, Skill: {skill_level}, Question Type: {question_type}")
-
-        # Validation
-        if not job_description:
-            return jsonify({'error': 'Job description is required'}), 400
-        if not experience_level:
-            return jsonify({'error': 'Experience level is required'}), 400
-        if not skill_level:
-            return jsonify({'error': 'Skill level is required'}), 400
-        if not question_type:
-            return jsonify({'error': 'Question type is required'}), 400
-
-        print(f"[{request_id}] Processing job description with experience: {experience_level}, skill: {skill_level}, question type: {question_type}")
-
-        # Adjust question distribution based on question type
-        if question_type == 'technical':
-            question_distribution = """
+def build_qa_prompt(job_description, experience_level, skill_level, question_type):
+    """Prompt for 16 interview questions with answers, weighted by question type"""
+    # Adjust question distribution based on question type
+    if question_type == 'technical':
+        question_distribution = """
 Question Categories (distribute across 16 questions):
 - Technical Skills (12 questions): Deep dive into specific technologies/tools, frameworks, and domain knowledge
 - Problem Solving (2 questions): Technical challenges and solutions
 - System Design (2 questions): Architecture and scalability considerations
 """
-        elif question_type == 'technical-scenario':
-            question_distribution = """
+    elif question_type == 'technical-scenario':
+        question_distribution = """
 Question Categories (distribute across 16 questions):
 - Technical Skills (8 questions): Core technologies, tools, and frameworks
 - Scenario-based Technical (6 questions): Real-world technical scenarios and problem-solving
 - System Design (2 questions): Architecture and scalability considerations
 """
-        elif question_type == 'technical-coding':
-            question_distribution = """
+    elif question_type == 'technical-coding':
+        question_distribution = """
 Question Categories (distribute across 16 questions):
 - Technical Skills (6 questions): Core technologies, tools, and frameworks
 - Coding Questions (8 questions): Write code snippets, solve algorithms, debug code, explain data structures, code optimization
@@ -359,38 +506,38 @@ For coding questions, include:
 - Code review and optimization
 - Programming logic challenges
 """
-        elif question_type == 'behavioral':
-            question_distribution = """
+    elif question_type == 'behavioral':
+        question_distribution = """
 Question Categories (distribute across 16 questions):
 - Behavioral (8 questions): Leadership, teamwork, communication, conflict resolution
 - Problem Solving (4 questions): Real-world scenarios and challenges
 - Best Practices (2 questions): Code quality, security, performance
 - Industry Knowledge (2 questions): Trends, future outlook
 """
-        elif question_type == 'competency-based':
-            question_distribution = """
+    elif question_type == 'competency-based':
+        question_distribution = """
 Question Categories (distribute across 16 questions):
 - Competency-based (10 questions): Specific skills, achievements, and experiences
 - Problem Solving (3 questions): Real-world scenarios and challenges
 - Best Practices (2 questions): Quality, efficiency, security considerations
 - Leadership/Collaboration (1 question): Team dynamics, stakeholder management
 """
-        elif question_type == 'situational':
-            question_distribution = """
+    elif question_type == 'situational':
+        question_distribution = """
 Question Categories (distribute across 16 questions):
 - Situational (10 questions): "What would you do if..." scenarios
 - Problem Solving (4 questions): Real-world scenarios and challenges
 - System Design (2 questions): Architecture and scalability considerations
 """
-        elif question_type == 'skill-based':
-            question_distribution = """
+    elif question_type == 'skill-based':
+        question_distribution = """
 Question Categories (distribute across 16 questions):
 - Skill-based (12 questions): Specific technical skills, tools, and methodologies
 - Problem Solving (2 questions): Technical challenges and solutions
 - Best Practices (2 questions): Quality, efficiency, security considerations
 """
-        else:  # mixed (all question types)
-            question_distribution = """
+    else:  # mixed (all question types)
+        question_distribution = """
 Question Categories (distribute across 16 questions):
 - Technical Skills (6 questions): Deep dive into specific technologies/tools
 - Problem Solving (3 questions): Real-world scenarios and challenges
@@ -400,7 +547,7 @@ Question Categories (distribute across 16 questions):
 - Industry Knowledge (1 question): Trends, future outlook
 """
 
-        prompt = f"""You are a senior technical recruiter and interview architect. Generate exactly 16 comprehensive interview questions with detailed answers.
+    prompt = f"""You are a senior technical recruiter and interview architect. Generate exactly 16 comprehensive interview questions with detailed answers.
 
 Job Description: {job_description}
 Experience Level: {experience_level}
@@ -433,59 +580,152 @@ Return ONLY valid JSON with detailed, professional answers:
 }}
 
 Generate the JSON now:"""
+    return prompt
+
+@app.route('/api/roles')
+def list_roles():
+    """Catalog roles, and whether each has pre-generated question banks"""
+    bank = get_question_bank()
+    built = {key[0] for key in bank.built_keys()}
+    return jsonify({'roles': [
+        {'slug': role['slug'], 'title': role['title'], 'description': role['description'],
+         'prebuilt': role['slug'] in built}
+        for role in bank.catalog
+    ]})
+
+@app.route('/generate-qa', methods=['POST'])
+@idempotency.idempotent
+def generate_qa():
+    request_id = str(uuid.uuid4())[:8]
+    
+    try:
+        # Get parameters from request
+        job_description = request.json.get('jobDescription')
+        experience_level = request.json.get('experienceLevel')
+        skill_level = request.json.get('skillLevel')
+        question_type = request.json.get('questionType')
+        
+        logger.info("[%s] Request received - Experience: %s, Skill: %s, Question Type: %s", request_id, experience_level, skill_level, question_type)
+        if request_profiler.profile_id():
+            logger.info("[%s] Profiled as %s", request_id, request_profiler.profile_id())
+
+        # Validation
+        if not job_description:
+            return jsonify({'error': 'Job description is required'}), 400
+        if not experience_level:
+            return jsonify({'error': 'Experience level is required'}), 400
+        if not skill_level:
+            return jsonify({'error': 'Skill level is required'}), 400
+        if not question_type:
+            return jsonify({'error': 'Question type is required'}), 400
+
+        # Catalog roles are answered from the pre-generated bank without taking an admission slot;
+        # custom JDs are generated live
+        with stage('bank'):
+            banked = get_question_bank().lookup(
+                job_description, experience_level, skill_level, question_type, request.json.get('role')
+            )
+        if not banked:
+            # Catalog roles without a banked answer are generated live but still counted by role
+            catalog_role = get_question_bank().catalog_role(job_description, request.json.get('role'))
+            role_title = catalog_role['title'] if catalog_role else CUSTOM_ROLE
+            return generate_qa_live(request_id, job_description, experience_level, skill_level, question_type, role_title)
+        
+        role, questions = banked
+        result = {'questions': questions, 'source': 'question_bank', 'role': role['slug']}
+        logger.info("[%s] Served %d questions from the bank for %s", request_id, len(questions), role['slug'])
+        save_qa_result(request_id, job_description, experience_level, skill_level, question_type, result, role['title'])
+        return jsonify(result)
+    
+    except Exception as e:
+        logger.error("Generate QA Error: %s", e)
+        return jsonify({'error': 'Failed to generate questions. Please try again.', 'details': str(e)}), 500
+
+@admission.admit
+def generate_qa_live(request_id, job_description, experience_level, skill_level, question_type, role_title):
+    """Generate questions for a custom JD with Azure OpenAI, under admission control"""
+    try:
+        with stage('prompt'):
+            prompt = build_qa_prompt(job_description, experience_level, skill_level, question_type)
         
         def call_azure():
             return call_azure_openai(prompt)
         
         result = retry_with_backoff(call_azure)
-        
-
-        
-        print(f"[{request_id}] Generated {len(result.get('questions', []))} questions")
-        
-        # Save to Azure Storage
-        storage_data = {
-            'session_id': request_id,
-            'job_description': job_description[:500],
-            'experience_level': experience_level,
-            'skill_level': skill_level,
-            'question_type': question_type,
-            'questions': result.get('questions', []),
-            'timestamp': datetime.now().isoformat(),
-            'request_id': request_id
-        }
-        save_to_azure_storage(storage_data)
-        
-        # Store in Firestore if available
-        if db:
-            try:
-                store_data = {
-                    'job_description': job_description[:500],
-                    'experience_level': experience_level,
-                    'skill_level': skill_level,
-                    'question_type': question_type,
-                    'questions': result.get('questions', []),
-                    'timestamp': datetime.now()
-                }
-                db.collection('qa_sessions').add(store_data)
-            except Exception as e:
-                print(f"Firestore error: {e}")
-        
+        logger.info("[%s] Generated %d questions", request_id, len(result.get('questions', [])))
+        save_qa_result(request_id, job_description, experience_level, skill_level, question_type, result, role_title)
         return jsonify(result)
     
     except Exception as e:
-        print(f"Generate QA Error: {str(e)}")
+        logger.error("Generate QA Error: %s", e)
         return jsonify({'error': 'Failed to generate questions. Please try again.', 'details': str(e)}), 500
 
+def save_qa_result(request_id, job_description, experience_level, skill_level, question_type, result, role_title):
+    """Record a generated or banked Q&A session in the history"""
+    # Save to Azure Storage
+    storage_data = {
+        'session_id': request_id,
+        'role': role_title,
+        'job_description': job_description[:500],
+        'experience_level': experience_level,
+        'skill_level': skill_level,
+        'question_type': question_type,
+        'questions': result.get('questions', []),
+        'timestamp': datetime.now().isoformat(),
+        'request_id': request_id
+    }
+    with stage('persist'):
+        save_to_azure_storage(storage_data)
+    
+    # Store in Firestore if available
+    if get_document_store():
+        try:
+            store_data = {
+                'role': role_title,
+                'job_description': job_description[:500],
+                'experience_level': experience_level,
+                'skill_level': skill_level,
+                'question_type': question_type,
+                'questions': result.get('questions', []),
+                'timestamp': datetime.now()
+            }
+            with stage('persist'):
+                persist_document('qa_sessions', store_data)
+        except Exception as e:
+            logger.error("Firestore error: %s", e)
 
 @app.route('/api/analyze-call', methods=['POST'])
+@idempotency.idempotent
+@admission.admit
 def analyze_call():
     try:
+        phrases = None
+        duration_ms = None
+        stream_result = None
+        
         # Handle both JSON and form data
         if request.is_json:
             transcript = request.json.get('transcript')
             interview_id = request.json.get('interview_id')
             jd_text = request.json.get('jd', '')
+            stream_id = request.json.get('stream_id')
+            
+            # Audio streamed during the interview is already transcribed
+            if stream_id and not transcript:
+                try:
+                    with stage('transcribe'):
+                        stream_result = streaming_transcriber.finish(
+                            stream_id, timeout=deadlines.timeout(streaming_transcriber.segment_timeout)
+                        )
+                    if stream_result['pending']:
+                        # Analysing now would score and store a truncated transcript
+                        return jsonify({'error': 'Transcription still in progress, retry shortly',
+                                        'pending': stream_result['pending']}), 504
+                    transcript = stream_result['transcript']
+                    phrases = stream_result.get('phrases')
+                    duration_ms = stream_result.get('duration_ms')
+                except KeyError as e:
+                    return jsonify({'error': str(e)}), 404
         else:
             # Handle file upload
             jd_text = request.form.get('jd', '')
@@ -496,16 +736,32 @@ def analyze_call():
                 return jsonify({'error': 'No audio file provided'}), 400
             
             # Transcribe audio using Azure Speech-to-Text
-            print(f"Transcribing audio file: {audio_file.filename}")
-            transcript = transcribe_audio(audio_file)
+            logger.info("Transcribing audio file: %s", audio_file.filename)
+            with stage('transcribe'):
+                transcription = transcribe_audio_detailed(audio_file.filename, audio_file.read())
+            transcript = transcription['text']
+            phrases = transcription['phrases']
+            duration_ms = transcription['duration_ms']
         
         if not transcript:
             return jsonify({'error': 'No transcript provided'}), 400
         
-        prompt = f"""Analyze interview based on JD requirements. Return valid JSON:
+        # Engagement metrics come from transcript timings, not from the LLM
+        from conversation_metrics import build_metrics_summary
+        
+        with stage('metrics'):
+            delivery_metrics = build_metrics_summary(transcript, phrases, duration_ms)
+        details = delivery_metrics['details']
+        metrics_line = f"words={details['total_words']}, filler_rate_per_100_words={details['filler_rate_per_100_words']}"
+        if delivery_metrics['source'] == 'timings':
+            metrics_line += f", words_per_minute={details['words_per_minute']}, median_answer_latency_ms={details['answer_latency']['median_ms']}, long_pauses={details['pauses']['long_pauses']}"
+        
+        with stage('prompt'):
+            prompt = f"""Analyze interview based on JD requirements. Return valid JSON:
 
 JD: {jd_text[:400]}
 Transcript: {transcript[:800]}
+Measured delivery metrics: {metrics_line}
 
 Provide:
 1. Extract 3-5 key skills from JD
@@ -516,7 +772,6 @@ Provide:
   "nbro": "Recommend/Maybe/Not Recommend with reason",
   "analysis": {{
     "Analysis": {{"overall_score": <0-100>, "confidence_level": <0-100>}},
-    "Metrics": {{"engagement_score": <0-100>, "communication_clarity": <0-100>}},
     "skills": [
       {{"skill": "<JD skill>", "score": <0-100>, "feedback": "<transcript evidence>", "recommendations": ["<action>"]}}
     ],
@@ -529,60 +784,105 @@ Provide:
         
         result = retry_with_backoff(call_azure)
         
-        # Debug: Print the result structure
-        print(f"Analysis result: {json.dumps(result, indent=2)}")
-        
-        # Add transcript to result
+        # Add transcript and measured metrics to result
         result['transcript'] = transcript
+        if not isinstance(result.get('analysis'), dict):
+            result['analysis'] = {}
+        result['analysis']['Metrics'] = delivery_metrics
+        if stream_result and stream_result['incomplete']:
+            # Some audio never made it into the transcript; say so rather than look complete
+            result['transcript_incomplete'] = True
+            result['transcript_gaps'] = {
+                'failed_segments': stream_result['failed'],
+                'missing_segments': stream_result['missing'],
+                'gaps': stream_result.get('gaps', [])
+            }
         
         # Generate interview ID if not provided
         if not interview_id:
-            interview_id = f"call_{int(time.time())}"
+            interview_id = f"call_{uuid.uuid4().hex}"
+        
+        # Normalised recommendation so history can be filtered on it
+        overall_score = (result['analysis'].get('Analysis') or {}).get('overall_score') or 0
+        recommendation = recommendation_for_score(overall_score)
         
         # Store analysis in Azure Storage
-        if blob_service_client:
+        if get_blob_store():
             try:
-                import uuid
-                container_name = "call-analysis-history"
-                blob_name = f"call-analysis-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{str(uuid.uuid4())[:8]}.json"
-                
-                try:
-                    blob_service_client.create_container(container_name)
-                except:
-                    pass
-                
                 storage_data = {
                     'interview_id': interview_id,
                     'jd_text': jd_text[:500],
                     'transcript': transcript[:1000],
                     'analysis': result,
+                    'recommendation': recommendation,
                     'timestamp': datetime.now().isoformat()
                 }
                 
-                blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
-                blob_client.upload_blob(json.dumps(storage_data), overwrite=True)
-                print(f"Saved call analysis to Azure Storage: {blob_name}")
+                with stage('persist'):
+                    persistence_queue.enqueue('call_analysis', storage_data)
             except Exception as e:
-                print(f"Error saving to Azure Storage: {e}")
+                logger.error("Error saving to Azure Storage: %s", e)
         
         # Store analysis in Firestore
-        if db:
+        if get_document_store():
             try:
-                db.collection('call_analyses').document(interview_id).set({
-                    'jd_text': jd_text[:500],
-                    'transcript': transcript[:1000],
-                    'analysis': result,
-                    'interview_id': interview_id,
-                    'timestamp': datetime.now()
-                })
+                with stage('persist'):
+                    persist_document('call_analyses', document_id=interview_id, data={
+                        'jd_text': jd_text[:500],
+                        'transcript': transcript[:1000],
+                        'analysis': result,
+                        'interview_id': interview_id,
+                        'recommendation': recommendation,
+                        'timestamp': datetime.now()
+                    })
             except Exception as e:
-                print(f"Firestore error: {e}")
+                logger.error("Firestore error: %s", e)
         
         return jsonify(result)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/transcription-stream', methods=['POST'])
+def open_transcription_stream():
+    """Open a stream that accepts audio segments while the interview runs"""
+    stream_id = streaming_transcriber.open_stream()
+    return jsonify({'stream_id': stream_id, 'status': 'open'})
+
+@app.route('/api/transcription-stream/<stream_id>/chunk', methods=['POST'])
+def upload_transcription_chunk(stream_id):
+    try:
+        audio_file = request.files.get('audio')
+        seq = request.form.get('seq', type=int)
+        if not audio_file or seq is None:
+            return jsonify({'error': 'Audio chunk and sequence number are required'}), 400
+        
+        streaming_transcriber.add_segment(
+            stream_id, seq, audio_file.filename or f'chunk-{seq}.webm', audio_file.read(),
+            audio_ms=request.form.get('duration_ms', type=int)
+        )
+        return jsonify({'status': 'accepted', 'seq': seq})
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+
+@app.route('/api/transcription-stream/<stream_id>')
+def get_transcription_stream(stream_id):
+    try:
+        return jsonify(streaming_transcriber.status(stream_id))
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 404
+
+@app.route('/api/transcription-stream/<stream_id>/finish', methods=['POST'])
+def finish_transcription_stream(stream_id):
+    try:
+        return jsonify(streaming_transcriber.finish(
+            stream_id, timeout=deadlines.timeout(streaming_transcriber.segment_timeout)
+        ))
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 404
+
 @app.route('/api/get-analysis')
 def get_analysis():
     try:
@@ -590,26 +890,21 @@ def get_analysis():
         if not interview_id:
             return jsonify({'error': 'Interview ID required'}), 400
         
-        # Try Azure Storage first
-        if blob_service_client:
+        # Try Azure Storage first: a single read by deterministic key
+        if get_blob_store():
             try:
-                container_name = "call-analysis-history"
-                container_client = blob_service_client.get_container_client(container_name)
-                blobs = container_client.list_blobs()
-                
-                for blob in blobs:
-                    blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob.name)
-                    data = json.loads(blob_client.download_blob().readall())
-                    if data.get('interview_id') == interview_id:
-                        return jsonify(data)
+                data = load_analysis(get_blob_store(), interview_id)
+                if data:
+                    return jsonify(data)
             except Exception as e:
-                print(f"Azure Storage error: {e}")
+                logger.warning("Azure Storage error: %s", e)
         
         # Fallback to Firestore
-        if db:
-            doc = db.collection('call_analyses').document(interview_id).get()
-            if doc.exists:
-                return jsonify(doc.to_dict())
+        if get_document_store():
+            data = get_document_store().get('call_analyses', interview_id)
+            if data:
+                metrics.record_fallback('firestore')
+                return jsonify(data)
         
         return jsonify({'error': 'Analysis not found'}), 404
     except Exception as e:
@@ -619,53 +914,65 @@ def get_analysis():
 def analysis_history():
     return render_template('analysis_history.html')
 
+def history_page_args():
+    """Shared cursor, page size and date range arguments of the history APIs"""
+    return {
+        'limit': request.args.get('limit', 20, type=int),
+        'cursor': request.args.get('cursor') or None,
+        'date_from': request.args.get('from') or None,
+        'date_to': request.args.get('to') or None
+    }
+
 @app.route('/api/analysis-history')
+@response_cache.cached(ttl=15, tags=('call_analyses',))
 def get_analysis_history():
     try:
+        page_args = history_page_args()
+        recommendation = request.args.get('recommendation') or None
+        
         # Try Azure Storage first
-        if blob_service_client:
+        if get_blob_store():
             try:
-                container_name = "call-analysis-history"
-                container_client = blob_service_client.get_container_client(container_name)
-                history = []
-                blobs = container_client.list_blobs()
-                blob_list = sorted(blobs, key=lambda x: x.last_modified, reverse=True)
+                # Previews come from the summary index; no analysis is downloaded
+                history, next_cursor = page_analysis_summaries(
+                    get_blob_store(), recommendation=recommendation, **page_args
+                )
                 
-                for blob in blob_list[:20]:
-                    try:
-                        blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob.name)
-                        data = json.loads(blob_client.download_blob().readall())
-                        history.append({
-                            'interview_id': data.get('interview_id'),
-                            'timestamp': data.get('timestamp'),
-                            'jd_preview': data.get('jd_text', '')[:100] + '...' if data.get('jd_text') else 'No JD',
-                            'analysis_summary': data.get('analysis', {}).get('analysis', {}).get('summary', 'No summary')[:100] + '...'
-                        })
-                    except:
-                        pass
-                
-                if history:
-                    return jsonify({'history': history})
-            except:
-                pass
+                if history or page_args['cursor']:
+                    return jsonify({'history': history, 'next_cursor': next_cursor})
+            except ValueError as e:
+                return jsonify({'error': f'Invalid filter: {e}'}), 400
+            except Exception as e:
+                logger.warning("Azure Storage error: %s", e)
         
         # Fallback to Firestore
-        if not db:
-            return jsonify({'history': []})
-        
-        analyses = db.collection('call_analyses').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(20).get()
+        if not get_document_store():
+            return jsonify({'history': [], 'next_cursor': None})
+        metrics.record_fallback('firestore')
+        
+        limit = max(1, min(page_args['limit'], 100))
+        conditions = build_range_conditions(page_args['date_from'], page_args['date_to'])
+        if recommendation:
+            conditions.insert(0, ('recommendation', '==', recommendation))
+        analyses = get_document_store().query(
+            'call_analyses', conditions, order_by='timestamp', descending=True,
+            limit=limit, start_after=page_args['cursor']
+        )
         
         history = []
-        for analysis in analyses:
-            data = analysis.to_dict()
+        for _, data in analyses:
             history.append({
                 'interview_id': data.get('interview_id'),
                 'timestamp': data.get('timestamp'),
                 'jd_preview': data.get('jd_text', '')[:100] + '...' if data.get('jd_text') else 'No JD',
-                'analysis_summary': data.get('analysis', {}).get('analysis', {}).get('summary', 'No summary')[:100] + '...'
+                'analysis_summary': data.get('analysis', {}).get('analysis', {}).get('summary', 'No summary')[:100] + '...',
+                'recommendation': data.get('recommendation')
             })
         
-        return jsonify({'history': history})
+        next_cursor = analyses[-1][0] if len(analyses) == limit else None
+        return jsonify({'history': history, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -703,6 +1010,8 @@ def dashboard():
 
 def extract_pdf_text(file):
     try:
+        import PyPDF2
+        
         pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.read()))
         text = ""
         for page in pdf_reader.pages:
@@ -713,6 +1022,8 @@ def extract_pdf_text(file):
 
 def extract_docx_text(file):
     try:
+        import docx
+        
         doc = docx.Document(io.BytesIO(file.read()))
         text = ""
         for paragraph in doc.paragraphs:
@@ -728,27 +1039,47 @@ def start_interview():
         candidate_name = request.json.get('candidate_name')
         role = request.json.get('role')
         questions = request.json.get('questions', [])
-        
-        interview_id = f"interview_{int(time.time())}"
-        session['interview_id'] = interview_id
-        session['current_question'] = 0
-        session['questions'] = questions
-        session['transcript'] = []
+        adaptive = bool(request.json.get('adaptive', False))
+        voice = request.json.get('voice', DEFAULT_VOICE)
+        if not VOICE_PATTERN.match(voice or ''):
+            return jsonify({'error': 'Invalid voice'}), 400
+        
+        # A new interview in this browser supersedes the previous one and its speculation
+        previous = current_interview()
+        if previous:
+            follow_up_generator.cancel(previous.interview_id)
+            get_interview_sessions().delete(previous.session_id)
+        for key in LEGACY_INTERVIEW_KEYS:
+            session.pop(key, None)
+        
+        interview_id = f"interview_{uuid.uuid4().hex}"
+        interview = get_interview_sessions().create(interview_id, role, questions, adaptive)
+        session['interview_session'] = interview.session_id
+        
+        # Synthesize every question up front so playback starts instantly
+        audio_urls = [
+            f"/api/tts-audio/{tts_cache.prefetch(q['question'], voice)}"
+            for q in questions if q.get('question')
+        ]
         
         # Store interview session
-        if db:
-            db.collection('interviews').document(interview_id).set({
+        if get_document_store():
+            interview_doc = {
                 'candidate_name': candidate_name,
                 'role': role,
                 'questions': questions,
+                'adaptive': adaptive,
                 'status': 'started',
                 'timestamp': datetime.now()
-            })
+            }
+            get_document_store().set('interviews', interview_id, interview_doc)
+            record_dashboard_event(interview_started_event(interview_doc), f"interviews/{interview_id}/started")
         
         return jsonify({
             'interview_id': interview_id,
             'status': 'started',
-            'first_question': questions[0] if questions else None
+            'first_question': questions[0] if questions else None,
+            'audio_urls': audio_urls
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -756,29 +1087,89 @@ def start_interview():
 @app.route('/api/next-question', methods=['POST'])
 def next_question():
     try:
-        interview_id = session.get('interview_id')
-        current_q = session.get('current_question', 0)
-        questions = session.get('questions', [])
+        interview = current_interview()
+        if interview is None:
+            return jsonify({'error': 'No interview in progress'}), 400
+        interview_id = interview.interview_id
         answer = request.json.get('answer', '')
         
         # Store answer
-        session['transcript'].append({
-            'question': questions[current_q]['question'] if current_q < len(questions) else '',
-            'answer': answer,
-            'timestamp': datetime.now().isoformat()
-        })
+        interview = get_interview_sessions().record_answer(interview, answer)
+        current_q = interview.current_question
+        questions = interview.questions
+        answered = current_q - 1
+        question_text = interview.question_text(answered)
         
-        current_q += 1
-        session['current_question'] = current_q
+        # Score this answer now so the final result is just an aggregation
+        if question_text:
+            answer_scorer.submit(interview_id, answered, question_text, answer, {'role': interview.role})
         
         if current_q >= len(questions):
-            return jsonify({'status': 'completed', 'message': 'Interview completed'})
+            follow_up_generator.cancel(interview_id)
+            return jsonify({
+                'status': 'completed',
+                'message': 'Interview completed',
+                'results_url': f'/api/interview-results/{interview_id}'
+            })
         
-        return jsonify({
+        response = {
             'status': 'continue',
             'question': questions[current_q],
             'progress': f"{current_q + 1}/{len(questions)}"
-        })
+        }
+        
+        if interview.adaptive:
+            # Serve the pre-generated follow-up if it is ready, else the planned question
+            candidates = follow_up_generator.take(interview_id, current_q)
+            if candidates:
+                interview = get_interview_sessions().replace_question(interview, current_q, candidates[0])
+                questions = interview.questions
+                response['question'] = candidates[0]
+                response['adaptive'] = True
+            
+            # Speculate on the question after this one while the candidate answers
+            if current_q + 1 < len(questions):
+                follow_up_generator.speculate(
+                    interview_id, current_q + 1, interview.transcript(),
+                    questions[current_q + 1], {'role': interview.role}
+                )
+        
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/interview-results/<interview_id>')
+def interview_results(interview_id):
+    """Aggregate the per-answer scores of a live interview"""
+    try:
+        if request.args.get('partial'):
+            return jsonify({'interview_id': interview_id, 'answers': answer_scorer.partial_scores(interview_id) or []})
+        
+        results = answer_scorer.aggregate(interview_id, timeout=deadlines.timeout(60))
+        if results is None:
+            return jsonify({'error': 'No scored answers for this interview'}), 404
+        
+        if get_document_store() and not results['answers_pending']:
+            try:
+                previous = {}
+                
+                def mark_analyzed(data):
+                    if data is None:
+                        raise KeyError(f"No interview {interview_id}")
+                    previous['status'] = data.get('status')
+                    data.update({'status': 'analyzed', 'results': results, 'analyzed_at': datetime.now()})
+                    return data
+                
+                interview_doc = get_document_store().transform('interviews', interview_id, mark_analyzed)
+                # Results are re-requested; only the first completion counts in the dashboard
+                if previous['status'] != 'analyzed':
+                    record_dashboard_event(
+                        interview_analyzed_event(results, interview_doc.get('analysis')), f"interviews/{interview_id}/analyzed"
+                    )
+            except Exception as e:
+                logger.error("Firestore error: %s", e)
+        
+        return jsonify(results)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -786,42 +1177,142 @@ def next_question():
 def voice_stream():
     try:
         text = request.json.get('text')
+        voice = request.json.get('voice', DEFAULT_VOICE)
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
-        # Simulate TTS response (replace with actual Gemini TTS when available)
+        # Usually already cached by start_interview; otherwise synthesized now
+        key = tts_cache.get(text, voice)
         response_data = {
             'text': text,
             'status': 'ready',
-            'audio_url': f'/api/tts-audio?text={text[:50]}',  # Truncate for URL
-            'duration': len(text) * 0.08
+            'audio_url': f'/api/tts-audio/{key}',
+            'duration': tts_cache.duration(key)
         }
         
         return jsonify(response_data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/tts-audio/<key>')
+def tts_audio(key):
+    """Stream cached question audio with HTTP range support"""
+    try:
+        path = tts_cache.wait(key, timeout=deadlines.timeout(30))
+    except RequestCancelled:
+        raise
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Audio synthesis failed: {e}'}), 500
+    if not path:
+        return jsonify({'error': 'Audio not found'}), 404
+    
+    # Content-addressed files never change, so browsers may cache them indefinitely
+    response = send_file(path, mimetype=tts_cache.synthesizer.mimetype, conditional=True, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/api/persistence-stats')
+def persistence_stats():
+    """Write-behind queue depth and flush latency"""
+    return jsonify(persistence_queue.metrics())
+
+# Imported on first use by the handlers that need them; /readyz loads them ahead of traffic
+DEFERRED_MODULES = ('PyPDF2', 'docx', 'conversation_metrics')
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the worker is serving requests; touches no client or store"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: creates every client and loads deferred modules, so the first real request is fast"""
+    try:
+        import importlib
+
+        for module in DEFERRED_MODULES:
+            importlib.import_module(module)
+        # False means not configured; the app then falls back as it does for any request
+        components = {
+            'blob_store': get_blob_store() is not None,
+            'document_store': get_document_store() is not None,
+            'interview_sessions': get_interview_sessions() is not None,
+            'openai': bool(AZURE_OPENAI_ENDPOINT) and get_openai_client() is not None,
+            'persistence_queue': persistence_queue.thread is not None and persistence_queue.thread.is_alive()
+        }
+    except Exception as e:
+        logger.error("Readiness check failed: %s", e)
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+
+    if not components['persistence_queue']:
+        return jsonify({'status': 'unavailable', 'components': components}), 503
+    return jsonify({'status': 'ready', 'components': components})
+
+def collect_component_metrics():
+    """Counters the caches, the write-behind queue, admission control and idempotency keep themselves"""
+    cache = response_cache.metrics()
+    queue_stats = persistence_queue.metrics()
+    tts = tts_cache.metrics()
+    admitted = admission.metrics()
+    replays = idempotency.metrics()
+    return [
+        ('talentcore_response_cache_requests_total', 'counter', 'Cached GET endpoint lookups by result', [
+            ({'result': 'hit'}, cache['hits']),
+            ({'result': 'stale'}, cache['stale_hits']),
+            ({'result': 'miss'}, cache['misses'])
+        ]),
+        ('talentcore_response_cache_not_modified_total', 'counter', 'Cached responses answered with 304',
+         [({}, cache['not_modified'])]),
+        ('talentcore_response_cache_entries', 'gauge', 'Responses held in the cache', [({}, cache['entries'])]),
+        ('talentcore_tts_cache_requests_total', 'counter', 'Question audio lookups by result', [
+            ({'result': 'hit'}, tts['hits']),
+            ({'result': 'in_flight'}, tts['in_flight_hits']),
+            ({'result': 'synthesized'}, tts['syntheses'])
+        ]),
+        ('talentcore_tts_cache_evictions_total', 'counter', 'Question audio files removed from the cache',
+         [({}, tts['evictions'])]),
+        ('talentcore_write_behind_jobs_total', 'counter', 'Write-behind persistence jobs by outcome', [
+            ({'outcome': outcome}, queue_stats[outcome])
+            for outcome in ('enqueued', 'flushed', 'failed', 'retried', 'inline_writes')
+        ]),
+        ('talentcore_write_behind_queue_depth', 'gauge', 'Jobs waiting to be persisted',
+         [({}, queue_stats['queue_depth'])]),
+        ('talentcore_admission_requests_total', 'counter', 'LLM endpoint requests by class and admission outcome', [
+            ({'class': request_class, 'outcome': outcome}, count)
+            for (request_class, outcome), count in admitted['outcomes'].items()
+        ]),
+        ('talentcore_admission_queue_depth', 'gauge', 'Requests waiting for admission', [
+            ({'class': request_class}, depth) for request_class, depth in admitted['queued'].items()
+        ]),
+        ('talentcore_admission_running', 'gauge', 'Admitted requests in progress', [({}, admitted['running'])]),
+        ('talentcore_idempotency_requests_total', 'counter', 'Requests with an Idempotency-Key by outcome', [
+            ({'outcome': outcome}, replays[outcome])
+            for outcome in ('claimed', 'replayed', 'waited', 'mismatched', 'released')
+        ])
+    ]
+
+metrics.register_collector(collect_component_metrics)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Latency histograms and counters of this worker in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/dashboard-stats')
+@response_cache.cached(ttl=30, tags=('dashboard',))
 def dashboard_stats():
     """Get analytics dashboard data"""
     try:
-        if not db:
+        dashboard_aggregates = get_dashboard_aggregates()
+        if not dashboard_aggregates:
             return jsonify({'error': 'Database not available'}), 500
         
-        # Get recent matches
-        matches = db.collection('matches').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(10).get()
-        
-        dashboard_data = {
-            'total_matches': len(matches),
-            'avg_score': sum([m.to_dict().get('result', {}).get('score', 0) for m in matches]) / len(matches) if matches else 0,
-            'recent_matches': [{
-                'filename': m.to_dict().get('filename', 'Unknown'),
-                'score': m.to_dict().get('result', {}).get('score', 0),
-                'timestamp': m.to_dict().get('timestamp')
-            } for m in matches]
-        }
-        
-        return jsonify(dashboard_data)
+        # One precomputed document, whatever the number of matches
+        return jsonify(dashboard_aggregates.stats())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -829,45 +1320,73 @@ def dashboard_stats():
 def get_qa_session(session_id):
     """Get specific QA session details"""
     try:
-        if not blob_service_client:
+        if not get_blob_store():
             return jsonify({'error': 'Storage not available'}), 500
         
-        container_name = "qa-history"
-        blob_client = blob_service_client.get_blob_client(container=container_name, blob=session_id)
-        
-        data = json.loads(blob_client.download_blob().readall())
+        data = load_qa_session(get_blob_store(), session_id)
+        if data is None:
+            return jsonify({'error': 'Session not found'}), 404
         return jsonify(data)
     except Exception as e:
-        print(f"Error getting QA session: {e}")
+        logger.error("Error getting QA session: %s", e)
         return jsonify({'error': 'Session not found'}), 404
 
 @app.route('/api/qa-history')
+@response_cache.cached(ttl=15, tags=('qa_sessions',))
 def get_qa_history():
     """Get Q&A generation history from Azure Storage"""
     try:
-        print("Loading QA history from Azure Storage...")
-        # Load from Azure Storage
-        history = load_from_azure_storage()
-        print(f"Loaded {len(history)} history items from Azure Storage")
-        
-        # Format for frontend
-        formatted_history = []
-        for item in history:
-            formatted_history.append({
-                'session_id': item.get('blob_name', item.get('session_id', item.get('request_id', ''))),
-                'experience_level': item.get('experience_level', ''),
-                'skill_level': item.get('skill_level', ''),
-                'question_type': item.get('question_type', ''),
-                'question_count': len(item.get('questions', [])),
-                'timestamp': item.get('timestamp')
-            })
+        if not get_blob_store():
+            logger.warning("Blob storage not available")
+            return jsonify({'history': []})
+        
+        # Only one page of the summary index is read, filtered by the storage service
+        filters = {
+            'experience_level': request.args.get('experience_level'),
+            'skill_level': request.args.get('skill_level'),
+            'question_type': request.args.get('question_type')
+        }
+        formatted_history, next_cursor = page_qa_summaries(get_blob_store(), filters=filters, **history_page_args())
         
-        print(f"Returning {len(formatted_history)} formatted history items")
-        return jsonify({'history': formatted_history})
+        return jsonify({'history': formatted_history, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
     except Exception as e:
-        print(f"Error getting QA history: {e}")
+        logger.error("Error getting QA history: %s", e)
         return jsonify({'error': str(e)}), 500
 
+# Exports hand out every stored transcript and job description, so they need the admin token
+EXPORT_ADMIN_TOKEN = os.getenv('EXPORT_ADMIN_TOKEN', '')
+
+def is_export_admin():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(EXPORT_ADMIN_TOKEN) and hmac.compare_digest(token.encode(), EXPORT_ADMIN_TOKEN.encode())
+
+@app.route('/api/export/<dataset>')
+def export_history(dataset):
+    """Stream a whole dataset as NDJSON or CSV without loading it into memory"""
+    if not is_export_admin():
+        return jsonify({'error': 'Exports require a valid X-Admin-Token'}), 403
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown format {export_format}; expected ndjson or csv'}), 400
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.fromisoformat(value)
+        records = iter_records(dataset, get_blob_store(), get_document_store(), date_from, date_to)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filename = f"{dataset}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return Response(
+        render(records, dataset, export_format),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @app.route('/api/customize-qa', methods=['POST', 'OPTIONS'])
 def customize_qa():
     # Handle preflight OPTIONS request
@@ -878,7 +1397,6 @@ def customize_qa():
         response.headers.add('Access-Control-Allow-Methods', 'POST')
         return response
     
-    print("Customize QA endpoint called")  # Debug log
     try:
         # Simple test response first
         return jsonify({
@@ -890,11 +1408,12 @@ def customize_qa():
         })
         
     except Exception as e:
-        print(f"Error in customize_qa: {str(e)}")
+        logger.error("Error in customize_qa: %s", e)
         return jsonify({'error': 'Failed to customize questions', 'details': str(e)}), 500
 
 
 @app.route('/api/hiring-assistant', methods=['POST'])
+@admission.admit
 def hiring_assistant():
     try:
         query = request.json.get('query')
@@ -924,46 +1443,16 @@ Return JSON with actionable insights."""
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/dashboard-data')
+@response_cache.cached(ttl=30, tags=('dashboard',))
 def get_dashboard_data():
     """Enhanced dashboard with comprehensive analytics"""
     try:
-        if not db:
+        dashboard_aggregates = get_dashboard_aggregates()
+        if not dashboard_aggregates:
             return jsonify({'error': 'Database not available'}), 500
         
-        # Get analytics data
-        matches = list(db.collection('matches').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(50).get())
-        interviews = list(db.collection('interviews').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(50).get())
-        qa_sessions = list(db.collection('qa_sessions').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(50).get())
-        
-        dashboard_data = {
-            'overview': {
-                'total_matches': len(matches),
-                'total_interviews': len(interviews),
-                'total_qa_sessions': len(qa_sessions),
-                'avg_match_score': sum([m.to_dict().get('result', {}).get('score', 0) for m in matches]) / len(matches) if matches else 0
-            },
-            'recent_activity': [
-                {
-                    'type': 'match',
-                    'filename': m.to_dict().get('filename', 'Unknown'),
-                    'score': m.to_dict().get('result', {}).get('score', 0),
-                    'timestamp': m.to_dict().get('timestamp')
-                } for m in matches[:10]
-            ],
-            'interview_analytics': {
-                'completed': len([i for i in interviews if i.to_dict().get('status') == 'analyzed']),
-                'in_progress': len([i for i in interviews if i.to_dict().get('status') == 'started']),
-                'avg_sentiment': sum([i.to_dict().get('analysis', {}).get('sentiment_analysis', {}).get('overall_score', 0) for i in interviews if i.to_dict().get('analysis')]) / len([i for i in interviews if i.to_dict().get('analysis')]) if interviews else 0
-            },
-            'role_distribution': {}
-        }
-        
-        # Calculate role distribution
-        for session in qa_sessions:
-            role = session.to_dict().get('role', 'Unknown')
-            dashboard_data['role_distribution'][role] = dashboard_data['role_distribution'].get(role, 0) + 1
-        
-        return jsonify(dashboard_data)
+        # Counters, averages and rollups are maintained as data is written
+        return jsonify(dashboard_aggregates.summary())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
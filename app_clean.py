@@ -10,6 +10,7 @@ import docx
 import io
 from datetime import datetime
 import re
+from storage_backends import create_document_store
 
 load_dotenv()
 
@@ -25,17 +26,8 @@ print(f"Loaded deployment: {AZURE_DEPLOYMENT_NAME}")
 
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-key-change-in-production')
 
-# Initialize Firestore (optional)
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_PATH', 'firebase-key.json'))
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-except Exception as e:
-    print(f"Firestore initialization failed: {e}")
-    db = None
+# Initialize document storage: Firestore by default, SQLite with STORAGE_BACKEND=local
+document_store = create_document_store()
 
 SYSTEM_PROMPT = """You are TalentCore AI, a high-fidelity Talent Acquisition Intelligence agent. Your objective is to assist HR teams in 5 critical areas:
 
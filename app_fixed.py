@@ -11,6 +11,7 @@ import io
 from datetime import datetime
 import requests
 import re
+from storage_backends import create_document_store
 
 load_dotenv()
 
@@ -32,17 +33,8 @@ except Exception as e:
 
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-key-change-in-production')
 
-# Initialize Firestore (optional)
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_PATH', 'firebase-key.json'))
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-except Exception as e:
-    print(f"Firestore initialization failed: {e}")
-    db = None
+# Initialize document storage: Firestore by default, SQLite with STORAGE_BACKEND=local
+document_store = create_document_store()
 
 SYSTEM_PROMPT = """You are TalentCore AI, a high-fidelity Talent Acquisition Intelligence agent. Your objective is to assist HR teams in 5 critical areas:
 
@@ -314,7 +306,7 @@ Generate the JSON now:"""
         print(f"[{request_id}] Generated {len(result.get('questions', []))} questions for method: {method}")
         
         # Store in Firestore if available
-        if db:
+        if document_store:
             try:
                 store_data = {
                     'method': method,
@@ -334,7 +326,7 @@ Generate the JSON now:"""
                 
                 store_data['questions'] = result.get('questions', [])
                 
-                db.collection('qa_sessions').add(store_data)
+                document_store.add('qa_sessions', store_data)
                 print(f"Stored in Firestore: method={method}")
             except Exception as e:
                 print(f"Firestore error: {e}")
@@ -380,9 +372,9 @@ Return ONLY a valid JSON object with: score (0-100), skill_gaps (array), strengt
         result = retry_with_backoff(call_gemini)
         
         # Store in Firestore
-        if db:
+        if document_store:
             try:
-                db.collection('matches').add({
+                document_store.add('matches', {
                     'jd_text': jd_text[:500],
                     'filename': filename,
                     'result': result,
@@ -0,0 +1,43 @@
+"""Leveled, asynchronous logging for the web app.
+
+Modules log through ``logging.getLogger(__name__)``.  ``configure_logging``
+routes every record through a queue to a background thread that formats and
+writes it, so a request thread never blocks on stderr.  ``LOG_LEVEL`` sets
+the level (INFO by default); DEBUG adds per-request detail such as LLM
+response previews.
+"""
+import atexit
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+
+# SDKs that log every HTTP call at INFO
+QUIET_LOGGERS = ('azure', 'httpx', 'openai', 'urllib3', 'google')
+
+_listener = None
+
+
+def configure_logging(level=None, stream=None):
+    """Install the queue handler on the root logger once per process"""
+    global _listener
+    if _listener is not None:
+        return
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    # Unbounded so logging never blocks; the writer keeps up with anything but a flood
+    records = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(records))
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what is queued when the worker exits
+    atexit.register(_listener.stop)
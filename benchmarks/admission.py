@@ -0,0 +1,106 @@
+"""Interactive latency while one client floods the LLM endpoints with a batch.
+
+Starts the mock upstream with a cap on concurrent calls (a deployment's
+throughput quota) and one gunicorn worker, then for admission control off and
+on runs two closed loops side by side for ``--duration`` seconds:
+
+* one batch client (a single API key, ``X-Request-Class: batch``) with
+  ``--batch-clients`` connections uploading resumes to /api/match, backing off
+  for ``Retry-After`` when rejected;
+* ``--interactive-clients`` recruiters, each with their own API key, doing
+  the same one match at a time.
+
+Usage:
+    python benchmarks/admission.py [--modes off,on] [--batch-clients 48] [--interactive-clients 4]
+                                   [--duration 20] [--latency 0.5] [--upstream-concurrency 8]
+"""
+import argparse
+import sys
+import threading
+import time
+import uuid
+
+import fixtures
+from harness import AppServer, run_closed_loop
+from mock_upstream import MockUpstreamServer
+
+
+def match_sender(url, pdf, headers, rejections):
+    def send(session, timeout):
+        response = session.post(url, data={'jd_text': fixtures.JOB_DESCRIPTION},
+                                files={'resume': ('resume.pdf', pdf)}, headers=headers, timeout=timeout)
+        if response.status_code == 429:
+            with rejections['lock']:
+                rejections['count'] += 1
+            time.sleep(min(float(response.headers.get('Retry-After', 1)), timeout))
+        return response.status_code == 200
+    return send
+
+
+def benchmark_mode(mode, args, upstream_url):
+    recruiter_keys = [f"recruiter-{n}" for n in range(args.interactive_clients)]
+    env = {
+        'ADMISSION_CONTROL': mode, 'WEB_CONCURRENCY': '1', 'ADMISSION_CAPACITY': str(args.upstream_concurrency),
+        # Only configured keys identify a client; everything here comes from one address
+        'ADMISSION_API_KEYS': ','.join(['batch-recruiter'] + recruiter_keys), 'ADMISSION_TRUSTED_PROXIES': '0'
+    }
+    unassigned = list(recruiter_keys)
+    assign_lock = threading.Lock()
+    with AppServer(upstream_url, args.port, args.gunicorn, env=env) as server:
+        url = f"{server.url}/api/match"
+        pdf = fixtures.resume_pdf()
+        batch_rejections = {'count': 0, 'lock': threading.Lock()}
+        interactive_rejections = {'count': 0, 'lock': threading.Lock()}
+        batch_send = match_sender(url, pdf, {'X-API-Key': 'batch-recruiter', 'X-Request-Class': 'batch'},
+                                  batch_rejections)
+
+        def interactive_send(session, timeout):
+            # One API key per connection: each loop client is a different recruiter
+            if 'X-API-Key' not in session.headers:
+                with assign_lock:
+                    session.headers['X-API-Key'] = unassigned.pop() if unassigned else uuid.uuid4().hex
+            key = session.headers['X-API-Key']
+            return match_sender(url, pdf, {'X-API-Key': key}, interactive_rejections)(session, timeout)
+
+        results = {}
+        batch = threading.Thread(target=lambda: results.update(
+            batch=run_closed_loop(batch_send, args.batch_clients, args.duration)))
+        batch.start()
+        results['interactive'] = run_closed_loop(interactive_send, args.interactive_clients, args.duration)
+        batch.join()
+        results['batch']['rejected'] = batch_rejections['count']
+        results['interactive']['rejected'] = interactive_rejections['count']
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='off,on', help='ADMISSION_CONTROL values to compare')
+    parser.add_argument('--batch-clients', type=int, default=48)
+    parser.add_argument('--interactive-clients', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--latency', type=float, default=0.5, help='mock LLM latency in seconds')
+    parser.add_argument('--upstream-concurrency', type=int, default=8,
+                        help='calls the mock serves at once; also the admission capacity')
+    parser.add_argument('--gunicorn', default='gunicorn', help='gunicorn executable')
+    parser.add_argument('--port', type=int, default=5057)
+    args = parser.parse_args()
+
+    upstream = MockUpstreamServer(latency=args.latency, max_concurrency=args.upstream_concurrency).start()
+    print(f"{args.batch_clients} batch and {args.interactive_clients} interactive clients, {args.duration:.0f}s, "
+          f"upstream {args.latency}s latency with {args.upstream_concurrency} concurrent calls")
+    print('| admission | interactive req/s | interactive p50 (s) | interactive p95 (s) | interactive 429s '
+          '| batch req/s | batch p95 (s) | batch 429s |')
+    print('|---|---|---|---|---|---|---|---|')
+    for mode in args.modes.split(','):
+        results = benchmark_mode(mode, args, upstream.url)
+        interactive, batch = results['interactive'], results['batch']
+        print(f"| {mode} | {interactive['throughput']:.1f} | {interactive['p50']:.2f} | {interactive['p95']:.2f} "
+              f"| {interactive['rejected']} | {batch['throughput']:.1f} | {batch['p95']:.2f} | {batch['rejected']} |",
+              flush=True)
+    upstream.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Realistic request payloads, generated in memory so no binaries live in the repo."""
+import io
+import math
+import struct
+import wave
+
+JOB_DESCRIPTION = """Senior Backend Engineer (Python)
+
+We are looking for a backend engineer to design and operate the services behind our hiring platform.
+You will build REST APIs in Python and Flask, model data in PostgreSQL and Firestore, run workloads on
+Azure App Service and Kubernetes, and own reliability: monitoring, incident response and capacity planning.
+
+Requirements: 5+ years of Python, distributed systems experience, SQL, message queues (Kafka or Service Bus),
+CI/CD, testing culture, and clear written communication. Nice to have: LLM integrations, speech APIs."""
+
+RESUME_LINES = [
+    'Jordan Rivera - Backend Engineer',
+    'Experience: 7 years building Python services (Flask, FastAPI, Celery).',
+    'Acme Logistics (2020-present): designed an event pipeline on Kafka and PostgreSQL handling 2M orders/day;',
+    'cut p95 API latency from 900 ms to 180 ms; led on-call and incident reviews.',
+    'Brightside Health (2017-2020): built HIPAA-compliant APIs on Azure, migrated cron jobs to Service Bus.',
+    'Skills: Python, SQL, Kafka, Redis, Docker, Kubernetes, Azure, Terraform, pytest, observability.',
+    'Education: BSc Computer Science.'
+]
+
+TRANSCRIPT = (
+    "Interviewer: Can you walk me through a system you designed recently? "
+    "Candidate: Sure, um, I built an event pipeline in Python with Kafka and Postgres for order processing. "
+    "Interviewer: How did you handle failures? "
+    "Candidate: We used retries with backoff, idempotent consumers and a dead letter queue, and we monitored lag. "
+    "Interviewer: What would you change? "
+    "Candidate: I would add schema validation earlier and, like, better load testing before launch."
+)
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def resume_pdf(lines=RESUME_LINES):
+    """One-page PDF whose text PyPDF2 can extract"""
+    content = ['BT', '/F1 11 Tf', '14 TL', '50 780 Td']
+    for line in lines:
+        content.append(f"({_pdf_escape(line)}) Tj T*")
+    content.append('ET')
+    stream = '\n'.join(content).encode('latin-1')
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length ' + str(len(stream)).encode() + b' >>\nstream\n' + stream + b'\nendstream',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+    ]
+    output = io.BytesIO()
+    output.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(f"{number} 0 obj\n".encode() + body + b'\nendobj\n')
+    xref = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode())
+    output.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return output.getvalue()
+
+
+def resume_docx(lines=RESUME_LINES):
+    import docx
+
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def interview_wav(seconds=20, sample_rate=16000):
+    """Mono 16-bit speech-band tone; the mock transcriber ignores the content, but size and upload cost are real"""
+    frames = bytearray()
+    for i in range(seconds * sample_rate):
+        frames += struct.pack('<h', int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate)))
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+    return output.getvalue()
@@ -0,0 +1,156 @@
+"""Shared pieces of the benchmark scripts: running the app against mocks and driving load."""
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def state_env(workdir):
+    """Environment pointing every file the app keeps state in under ``workdir``
+
+    Without it a run would read a locally built question bank and leave
+    sessions, idempotency records and caches behind for the next run.
+    """
+    return {
+        'LOCAL_STORAGE_DIR': os.path.join(workdir, 'storage'),
+        'PERSISTENCE_SPOOL_DIR': os.path.join(workdir, 'spool'),
+        'TTS_CACHE_DIR': os.path.join(workdir, 'tts'),
+        'INTERVIEW_SESSION_DIR': os.path.join(workdir, 'sessions'),
+        'TRANSCRIPTION_STREAM_DIR': os.path.join(workdir, 'transcription'),
+        'IDEMPOTENCY_DIR': os.path.join(workdir, 'idempotency'),
+        'RESPONSE_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'PROFILE_DIR': os.path.join(workdir, 'profiles'),
+        'QUESTION_BANK_PATH': os.path.join(workdir, 'question_bank.db'),
+        'CALL_HISTORY_DB': os.path.join(workdir, 'history.db')
+    }
+
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        try:
+            if requests.get(url, timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+class AppServer:
+    """The app under gunicorn with local storage, talking to the mock upstream.
+
+    Used as a context manager; the working directory holding all of the run's
+    state (see ``state_env``) is deleted afterwards, so runs never see each
+    other's cached responses, sessions or question bank.
+    """
+
+    def __init__(self, upstream_url, port, gunicorn='gunicorn', env=None):
+        self.upstream_url = upstream_url
+        self.port = port
+        self.gunicorn = gunicorn
+        self.extra_env = env or {}
+        self.workdir = None
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.workdir = tempfile.mkdtemp(prefix='talentcore-bench-')
+        env = dict(
+            os.environ,
+            PORT=str(self.port),
+            AZURE_OPENAI_ENDPOINT=self.upstream_url,
+            AZURE_OPENAI_API_KEY='mock-key',
+            AZURE_FAST_TRANSCRIPTION_ENDPOINT=self.upstream_url,
+            AZURE_FAST_TRANSCRIPTION_KEY='mock-key',
+            STORAGE_BACKEND='local',
+            TTS_ENGINE='silent',
+            # Every benchmark client shares one address, which per-client limits would throttle
+            ADMISSION_CONTROL='off',
+            LOG_LEVEL='WARNING',
+            **state_env(self.workdir)
+        )
+        env.update(self.extra_env)
+        self.process = subprocess.Popen(
+            [self.gunicorn, 'app:app'], cwd=REPO_ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_ready(f"{self.url}/readyz", self.process)
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def summarize(latencies, errors, duration):
+    latencies = sorted(latencies)
+    return {
+        'completed': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / duration,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99)
+    }
+
+
+def run_closed_loop(send, concurrency, duration):
+    """Each of ``concurrency`` clients calls ``send(session)`` again as soon as it returns.
+
+    ``send`` returns True for a successful request.  Only requests finished
+    within ``duration`` seconds count.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                ok = send(session, max(1.0, deadline - started))
+            except requests.RequestException:
+                ok = False
+            finished = time.monotonic()
+            if finished > deadline:
+                break
+            with lock:
+                if ok:
+                    latencies.append(finished - started)
+                else:
+                    errors[0] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    return summarize(latencies, errors[0], duration)
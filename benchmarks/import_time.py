@@ -0,0 +1,95 @@
+"""Start-up cost of importing the app, measured with ``python -X importtime``.
+
+Imports a module (``app`` by default) in fresh interpreters, keeps the
+fastest run and prints its total import time with the heaviest top-level
+imports.  Exits 1 when the import exceeds ``--budget-ms`` or pulls in one of
+the modules that must stay deferred until first use, so CI catches start-up
+regressions.
+
+Usage:
+    python benchmarks/import_time.py [--module app] [--runs 5] [--top 15] [--budget-ms 1500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from harness import state_env
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy SDKs and parsers app.py loads on first use; importing any of them at start-up is a regression
+DEFERRED_MODULES = (
+    'azure.storage.blob', 'firebase_admin', 'google.cloud.firestore', 'openai', 'PyPDF2', 'docx', 'numpy'
+)
+
+
+def parse_importtime(stderr):
+    """``[(module, cumulative_us, depth)]`` in ``-X importtime`` order, children before their parent"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(cumulative_us), depth))
+    return entries
+
+
+def direct_imports(entries, module):
+    """Modules first imported by ``module`` itself, with their cumulative time"""
+    index = next(i for i, (name, _, _) in enumerate(entries) if name == module)
+    depth = entries[index][2]
+    children = []
+    for name, cumulative_us, d in reversed(entries[:index]):
+        if d <= depth:
+            break
+        if d == depth + 1:
+            children.append((name, cumulative_us))
+    return children
+
+
+def measure(module):
+    with tempfile.TemporaryDirectory(prefix='import-time-') as workdir:
+        # No credentials, and no state outside the run: the import must neither need nor touch them
+        env = dict(os.environ, **state_env(workdir), PYTHONDONTWRITEBYTECODE='1')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters; the fastest run is reported')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, help='fail when the import takes longer')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    entries = min(runs, key=lambda run: next(us for name, us, _ in run if name == args.module))
+    imported = {name: cumulative_us for name, cumulative_us, _ in entries}
+    total_ms = imported[args.module] / 1000
+
+    children = sorted(direct_imports(entries, args.module), key=lambda item: item[1], reverse=True)
+    print(f"import {args.module}: {total_ms:.1f} ms (fastest of {args.runs})")
+    print('| module | cumulative (ms) |')
+    print('|---|---|')
+    for name, cumulative in children[:args.top]:
+        print(f"| {name} | {cumulative / 1000:.1f} |")
+
+    failures = [f"{name} is imported at start-up" for name in DEFERRED_MODULES if name in imported]
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.1f} ms, budget is {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""End-to-end load test of every API route against local mock upstreams.
+
+Starts the mock Azure OpenAI / Fast Transcription server and the app under
+gunicorn on local storage, seeds some history, then drives each scenario in
+turn with a closed loop of clients and reports throughput and p50/p95/p99.
+
+Results can be saved as a baseline and later runs compared against it; a
+p95 more than ``--tolerance`` above, or throughput more than ``--tolerance``
+below the baseline fails the run with exit status 1.
+
+Usage:
+    python benchmarks/load_test.py [--scenarios generate_qa,match_pdf,...] [--concurrency 8]
+                                   [--duration 10] [--latency 0.5] [--tokens-per-second 0]
+                                   [--error-rate 0] [--url http://host:port]
+                                   [--save-baseline FILE] [--baseline FILE] [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import requests
+
+import fixtures
+from harness import AppServer, run_closed_loop
+from mock_upstream import MockUpstreamServer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'default.json')
+
+
+def build_scenarios(base_url):
+    """``{name: send(session, timeout) -> ok}`` for each route under test"""
+    pdf = fixtures.resume_pdf()
+    docx_file = fixtures.resume_docx()
+    wav = fixtures.interview_wav()
+    qa_body = {'jobDescription': fixtures.JOB_DESCRIPTION, 'experienceLevel': 'senior',
+               'skillLevel': 'advanced', 'questionType': 'technical'}
+
+    def post_json(path, body):
+        def send(session, timeout):
+            return session.post(base_url + path, json=body, timeout=timeout).status_code == 200
+        return send
+
+    def upload_resume(filename, data):
+        def send(session, timeout):
+            response = session.post(base_url + '/api/match', data={'jd_text': fixtures.JOB_DESCRIPTION},
+                                    files={'resume': (filename, data)}, timeout=timeout)
+            return response.status_code == 200
+        return send
+
+    def analyze_transcript(session, timeout):
+        body = {'transcript': fixtures.TRANSCRIPT, 'jd': fixtures.JOB_DESCRIPTION,
+                'interview_id': f"bench_{uuid.uuid4().hex[:12]}"}
+        return session.post(base_url + '/api/analyze-call', json=body, timeout=timeout).status_code == 200
+
+    def analyze_audio(session, timeout):
+        response = session.post(base_url + '/api/analyze-call', data={'jd': fixtures.JOB_DESCRIPTION},
+                                files={'audio': ('interview.wav', wav, 'audio/wav')}, timeout=timeout)
+        return response.status_code == 200
+
+    def get(path):
+        def send(session, timeout):
+            return session.get(base_url + path, timeout=timeout).status_code == 200
+        return send
+
+    return {
+        'generate_qa': post_json('/generate-qa', qa_body),
+        'match_pdf': upload_resume('resume.pdf', pdf),
+        'match_docx': upload_resume('resume.docx', docx_file),
+        'analyze_transcript': analyze_transcript,
+        'analyze_audio': analyze_audio,
+        'hiring_assistant': post_json('/api/hiring-assistant', {'query': 'How should we assess a backend engineer?'}),
+        'qa_history': get('/api/qa-history?limit=20'),
+        'analysis_history': get('/api/analysis-history?limit=20'),
+        'dashboard_stats': get('/api/dashboard-stats'),
+        'dashboard_data': get('/api/dashboard-data')
+    }
+
+
+def seed(scenarios, count=10):
+    """Write some history so the read routes have pages and aggregates to serve"""
+    session = requests.Session()
+    for _ in range(count):
+        for name in ('generate_qa', 'match_pdf', 'analyze_transcript'):
+            scenarios[name](session, 60)
+    # Let the write-behind queue flush
+    time.sleep(2)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of ``results`` against ``baseline`` as readable lines"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        if result['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95'] * 1000:.0f} ms vs baseline {base['p95'] * 1000:.0f} ms")
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput']:.1f} req/s vs baseline {base['throughput']:.1f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', help='comma-separated; all by default')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario')
+    parser.add_argument('--latency', type=float, default=0.5, help='mock upstream latency in seconds')
+    parser.add_argument('--tokens-per-second', type=float, default=0, help='mock completion speed; 0 for instant')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls failing')
+    parser.add_argument('--url', help='test a running app instead of starting one; it must use the mocks itself')
+    parser.add_argument('--gunicorn', default='gunicorn', help='gunicorn executable')
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, help='write results as the baseline')
+    parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE, help='fail on regressions against it')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    args = parser.parse_args()
+
+    upstream = MockUpstreamServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                  error_rate=args.error_rate).start()
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        server = AppServer(upstream.url, args.port, args.gunicorn).__enter__()
+        base_url = server.url
+
+    try:
+        scenarios = build_scenarios(base_url)
+        selected = args.scenarios.split(',') if args.scenarios else list(scenarios)
+        unknown = [name for name in selected if name not in scenarios]
+        if unknown:
+            parser.error(f"unknown scenarios {', '.join(unknown)}; expected {', '.join(scenarios)}")
+
+        seed(scenarios)
+        print(f"{args.concurrency} clients, {args.duration:.0f}s per scenario, upstream {args.latency}s latency, "
+              f"{args.tokens_per_second or 'instant'} tokens/s, {args.error_rate:.0%} errors")
+        print('| scenario | completed | errors | req/s | p50 (ms) | p95 (ms) | p99 (ms) |')
+        print('|---|---|---|---|---|---|---|')
+        results = {}
+        for name in selected:
+            result = results[name] = run_closed_loop(scenarios[name], args.concurrency, args.duration)
+            print(f"| {name} | {result['completed']} | {result['errors']} | {result['throughput']:.1f} "
+                  f"| {result['p50'] * 1000:.0f} | {result['p95'] * 1000:.0f} | {result['p99'] * 1000:.0f} |",
+                  flush=True)
+    finally:
+        if server:
+            server.__exit__(None, None, None)
+        upstream.shutdown()
+
+    config = {key: getattr(args, key) for key in ('concurrency', 'duration', 'latency', 'tokens_per_second', 'error_rate')}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'host': {'cpus': os.cpu_count(), 'python': platform.python_version(), 'platform': platform.platform()},
+                'config': config,
+                'results': results
+            }, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != config:
+            print(f"Warning: baseline was recorded with {baseline.get('config')}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Stand-in for Azure OpenAI and Azure Fast Transcription.
+
+Chat completions return JSON shaped like what each prompt of the app asks
+for (questions, match scores, call analyses, answer scores), after a fixed
+``latency`` plus the time to "generate" the reply at ``tokens_per_second``.
+A fraction ``error_rate`` of requests fails with a 429 or 500, so retries
+and fallbacks show up in benchmarks.  ``max_concurrency`` caps the calls
+served at once, like a deployment's throughput quota; the rest wait their turn.  Transcription requests get a short
+diarized transcript with phrase timings.
+
+Usage:
+    python benchmarks/mock_upstream.py [--port 8900] [--latency 1.0]
+                                       [--tokens-per-second 0] [--error-rate 0] [--max-concurrency 0]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Roughly four characters per token, as with GPT tokenizers on English text
+CHARS_PER_TOKEN = 4
+
+TRANSCRIPT_PHRASES = [
+    (0, "Can you walk me through a system you designed recently?"),
+    (1, "Sure, um, I built an event pipeline in Python with Kafka and Postgres for order processing."),
+    (0, "How did you handle failures?"),
+    (1, "We used retries with backoff, idempotent consumers and a dead letter queue, and we monitored lag."),
+    (0, "What would you change?"),
+    (1, "I would add schema validation earlier and, like, better load testing before launch.")
+]
+
+
+def _questions():
+    return {'questions': [
+        {'question': f"Question {i + 1}: how would you design a resilient service for scenario {i + 1}?",
+         'answer': "A strong answer covers requirements, trade-offs, failure handling, observability and "
+                   "a concrete example from production experience. " * 2}
+        for i in range(16)
+    ]}
+
+
+def completion_for(prompt):
+    """Reply content matching the prompt's expected JSON"""
+    if 'Generate exactly 16' in prompt:
+        body = _questions()
+    elif 'Compare this Job Description' in prompt:
+        body = {'score': 78, 'skill_gaps': ['Kubernetes', 'GraphQL'], 'strengths': ['Python', 'SQL', 'APIs'],
+                'cultural_fit': 72}
+    elif 'Analyze interview' in prompt:
+        body = {'nbro': 'Recommend - solid technical depth', 'analysis': {
+            'Analysis': {'overall_score': 74, 'confidence_level': 80},
+            'skills': [{'skill': skill, 'score': 70 + i * 5, 'feedback': 'Clear evidence in the transcript.',
+                        'recommendations': ['Probe deeper on trade-offs']}
+                       for i, skill in enumerate(['Python', 'Distributed systems', 'Communication'])],
+            'summary': 'The candidate explained their design clearly and handled follow-ups well.'
+        }}
+    elif 'Score this interview answer' in prompt:
+        body = {'score': 70, 'feedback': 'Relevant and specific answer.', 'strengths': ['Specific'],
+                'concerns': []}
+    elif 'follow-up questions' in prompt:
+        body = {'candidates': [{'question': 'Can you give a concrete example of that?', 'type': 'follow-up',
+                                'rationale': 'Probe the claim'}]}
+    else:
+        body = {'answer': 'Mock response', 'score': 75}
+    return json.dumps(body)
+
+
+def transcription_result():
+    phrases = []
+    offset = 0
+    for speaker, text in TRANSCRIPT_PHRASES:
+        duration = 350 * len(text.split())
+        phrases.append({'speaker': speaker, 'offsetMilliseconds': offset, 'durationMilliseconds': duration,
+                        'text': text, 'locale': 'en-US', 'confidence': 0.92})
+        offset += duration + 600
+    return {
+        'durationMilliseconds': offset,
+        'combinedPhrases': [{'text': ' '.join(text for _, text in TRANSCRIPT_PHRASES)}],
+        'phrases': phrases
+    }
+
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        server = self.server
+        server.count('requests')
+        if server.slots:
+            with server.slots:
+                return self._respond(server, body)
+        return self._respond(server, body)
+
+    def _respond(self, server, body):
+        time.sleep(server.latency)
+        if random.random() < server.error_rate:
+            server.count('errors')
+            status = random.choice((429, 500))
+            return self._send(status, {'error': {'code': str(status), 'message': 'Injected failure'}},
+                              {'Retry-After': '1'} if status == 429 else None)
+
+        if 'transcriptions:transcribe' in self.path:
+            return self._send(200, transcription_result())
+
+        try:
+            messages = json.loads(body).get('messages') or []
+            prompt = messages[-1].get('content', '') if messages else ''
+        except ValueError:
+            prompt = ''
+        content = completion_for(prompt)
+        completion_tokens = max(1, len(content) // CHARS_PER_TOKEN)
+        if server.tokens_per_second:
+            time.sleep(completion_tokens / server.tokens_per_second)
+        self._send(200, {
+            'id': 'chatcmpl-mock',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'mock',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': max(1, len(prompt) // CHARS_PER_TOKEN),
+                'completion_tokens': completion_tokens,
+                'total_tokens': max(1, len(prompt) // CHARS_PER_TOKEN) + completion_tokens
+            }
+        })
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, port=0, latency=1.0, tokens_per_second=0, error_rate=0.0, max_concurrency=0):
+        super().__init__(('127.0.0.1', port), MockUpstreamHandler)
+        self.latency = latency
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.stats = {'requests': 0, 'errors': 0}
+        self.stats_lock = threading.Lock()
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds before each response')
+    parser.add_argument('--tokens-per-second', type=float, default=0, help='completion speed; 0 for instant')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with 429/500')
+    parser.add_argument('--max-concurrency', type=int, default=0, help='calls served at once; 0 for unlimited')
+    args = parser.parse_args()
+
+    server = MockUpstreamServer(args.port, args.latency, args.tokens_per_second, args.error_rate, args.max_concurrency)
+    print(f"Mock upstream on {server.url} with {args.latency}s latency")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Throughput of the gunicorn serving modes against a slow mock LLM.
+
+Starts the mock upstream, then for each mode runs gunicorn with the repo's
+gunicorn.conf.py and keeps ``--concurrency`` clients posting to
+/api/hiring-assistant (one LLM call per request) for ``--duration`` seconds.
+Storage runs on the local backend in a temporary directory.
+
+Usage:
+    python benchmarks/serving_modes.py [--modes sync,threaded,gevent] [--concurrency 200]
+                                       [--duration 20] [--latency 1.0] [--gunicorn gunicorn]
+"""
+import argparse
+import sys
+
+from harness import AppServer, run_closed_loop
+from mock_upstream import MockUpstreamServer
+
+
+def benchmark_mode(mode, args, upstream_url):
+    with AppServer(upstream_url, args.port, args.gunicorn, env={'SERVING_MODE': mode}) as server:
+        url = f"{server.url}/api/hiring-assistant"
+
+        def send(session, timeout):
+            response = session.post(url, json={'query': 'How should we assess a backend engineer?'}, timeout=timeout)
+            return response.status_code == 200
+
+        return run_closed_loop(send, args.concurrency, args.duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='sync,threaded,gevent')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--latency', type=float, default=1.0, help='mock LLM latency in seconds')
+    parser.add_argument('--gunicorn', default='gunicorn', help='gunicorn executable')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    upstream = MockUpstreamServer(latency=args.latency).start()
+    print(f"{args.concurrency} concurrent clients, {args.duration:.0f}s per mode, {args.latency}s upstream latency")
+    print('| mode | completed | errors | req/s | p50 (s) | p95 (s) |')
+    print('|---|---|---|---|---|---|')
+    for mode in args.modes.split(','):
+        result = benchmark_mode(mode, args, upstream.url)
+        print(f"| {mode} | {result['completed']} | {result['errors']} | {result['throughput']:.1f} "
+              f"| {result['p50']:.2f} | {result['p95']:.2f} |", flush=True)
+    upstream.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
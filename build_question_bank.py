@@ -0,0 +1,122 @@
+"""Pre-generate question banks for the role catalog.
+
+For each catalog role, experience band, skill level and question type this
+asks Azure OpenAI for questions with the same prompt ``/generate-qa`` uses,
+several requests at a time, and stores each bank as soon as it arrives.
+Banks already in the store are skipped, so an interrupted run picks up where
+it stopped; ``--force`` regenerates them.
+
+Usage:
+    python build_question_bank.py [--roles backend-engineer,data-engineer] [--experience junior,senior]
+                                  [--skill-levels advanced] [--question-types technical,behavioral]
+                                  [--workers 8] [--limit N] [--force] [--dry-run]
+                                  [--catalog role_catalog.json] [--bank data/question_bank.db]
+"""
+import argparse
+import itertools
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from question_bank import EXPERIENCE_BANDS, QUESTION_TYPES, SKILL_LEVELS, QuestionBank, load_catalog
+
+# Fewer questions than this means the completion was cut short or malformed
+MIN_QUESTIONS = 10
+
+
+def _choices(value, allowed, name, parser):
+    if not value:
+        return list(allowed)
+    chosen = [v.strip() for v in value.split(',') if v.strip()]
+    unknown = [v for v in chosen if v not in allowed]
+    if unknown:
+        parser.error(f"unknown {name} {', '.join(unknown)}; expected {', '.join(allowed)}")
+    return chosen
+
+
+def generate(role, experience, skill_level, question_type):
+    """Questions for one bank, generated exactly as the live endpoint would"""
+    from app import build_qa_prompt, call_azure_openai, retry_with_backoff
+
+    prompt = build_qa_prompt(role['description'], EXPERIENCE_BANDS[experience], skill_level, question_type)
+    result = retry_with_backoff(lambda: call_azure_openai(prompt))
+    questions = result.get('questions', [])
+    if len(questions) < MIN_QUESTIONS:
+        raise ValueError(f"only {len(questions)} questions generated")
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalog', help='role catalog JSON (default QUESTION_BANK_CATALOG or role_catalog.json)')
+    parser.add_argument('--bank', help='bank file (default QUESTION_BANK_PATH or data/question_bank.db)')
+    parser.add_argument('--roles', help='comma-separated role slugs; all by default')
+    parser.add_argument('--experience', help=f"comma-separated bands of {', '.join(EXPERIENCE_BANDS)}")
+    parser.add_argument('--skill-levels', help=f"comma-separated of {', '.join(SKILL_LEVELS)}")
+    parser.add_argument('--question-types', help=f"comma-separated of {', '.join(QUESTION_TYPES)}")
+    parser.add_argument('--workers', type=int, default=8, help='concurrent LLM requests')
+    parser.add_argument('--limit', type=int, help='generate at most this many banks in this run')
+    parser.add_argument('--force', action='store_true', help='regenerate banks that already exist')
+    parser.add_argument('--dry-run', action='store_true', help='list the banks that would be generated')
+    args = parser.parse_args()
+
+    load_dotenv()
+    catalog = load_catalog(args.catalog)
+    slugs = [role['slug'] for role in catalog]
+    roles = {role['slug']: role for role in catalog}
+    selected_roles = _choices(args.roles, slugs, 'roles', parser)
+    bands = _choices(args.experience, list(EXPERIENCE_BANDS), 'experience bands', parser)
+    skill_levels = _choices(args.skill_levels, SKILL_LEVELS, 'skill levels', parser)
+    question_types = _choices(args.question_types, QUESTION_TYPES, 'question types', parser)
+
+    bank = QuestionBank(args.bank, catalog)
+    built = set() if args.force else bank.built_keys()
+    todo = [key for key in itertools.product(selected_roles, bands, skill_levels, question_types) if key not in built]
+    skipped = len(selected_roles) * len(bands) * len(skill_levels) * len(question_types) - len(todo)
+    if args.limit is not None:
+        todo = todo[:args.limit]
+    print(f"{len(todo)} banks to generate, {skipped} already built")
+    if args.dry_run:
+        for key in todo:
+            print('  ' + ' / '.join(key))
+        return 0
+    if not todo:
+        return 0
+
+    bank.create()
+    # Load the app (Azure OpenAI client, prompts) once, before the worker threads need it
+    import app  # noqa: F401
+    logging.getLogger('app').setLevel(logging.WARNING)
+    done = failed = 0
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix='bank')
+    try:
+        futures = {executor.submit(generate, roles[key[0]], *key[1:]): key for key in todo}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                # Each bank is written as it completes: the store is the checkpoint
+                bank.put(*key, future.result())
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"Failed {' / '.join(key)}: {e}")
+            if (done + failed) % 25 == 0 or done + failed == len(todo):
+                rate = (done + failed) / max(time.monotonic() - started, 1e-9)
+                print(f"{done + failed}/{len(todo)} ({failed} failed), {rate:.1f} banks/s", flush=True)
+    except KeyboardInterrupt:
+        print(f"Interrupted after {done} banks; run again to resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 130
+    executor.shutdown()
+
+    stats = bank.stats()
+    print(f"Generated {done}, failed {failed}; the bank now holds {stats['banks']} banks for {stats['roles']} roles")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
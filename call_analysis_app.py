@@ -4,44 +4,31 @@ import time
 import os
 from dotenv import load_dotenv
 from datetime import datetime
-import threading
 import tempfile
 import azure.cognitiveservices.speech as speechsdk
 from pydub import AudioSegment
 from openai import AzureOpenAI
 import html
+from interview_history import InterviewHistory, DEFAULT_HISTORY_DB
 
 app = Flask(__name__)
 load_dotenv()
 
-# History management
+# History management: an append-only log, so each insert costs the same
 HISTORY_FILE = 'history.json'
-HISTORY_LOCK = threading.Lock()
-
-def load_history():
+history_store = InterviewHistory(os.getenv('CALL_HISTORY_DB', DEFAULT_HISTORY_DB))
+if os.path.exists(HISTORY_FILE):
     try:
-        with HISTORY_LOCK:
-            if not os.path.exists(HISTORY_FILE):
-                return []
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        history_store.import_json_file(HISTORY_FILE)
     except Exception as e:
-        print(f"Error loading history: {e}")
-        return []
+        print(f"Error migrating history: {e}")
 
-def save_history(history):
+def add_interview_to_history(interview):
     try:
-        with HISTORY_LOCK:
-            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+        history_store.append(interview)
     except Exception as e:
         print(f"Error saving history: {e}")
 
-def add_interview_to_history(interview):
-    history = load_history()
-    history.insert(0, interview)
-    save_history(history)
-
 SYSTEM_PROMPT = """
 You are TalentWiz, an expert AI assistant for technical interviews and candidate analysis. Provide structured, unbiased, and actionable insights based on the job description and interview transcript. Always respond in valid JSON as instructed.
 """
@@ -0,0 +1,217 @@
+"""Deterministic conversation metrics computed from transcription phrase timings"""
+import re
+import numpy as np
+
+FILLER_PATTERN = re.compile(
+    r"\b(?:um+|uh+|erm+|er|ah+|hmm+|you know|i mean|kind of|sort of|basically|actually|like)\b",
+    re.IGNORECASE
+)
+
+# Pauses longer than this break the flow of an answer
+LONG_PAUSE_MS = 2000
+PAUSE_BUCKETS_MS = [0, 500, 1000, 2000, 5000, np.inf]
+PAUSE_BUCKET_LABELS = ['<0.5s', '0.5-1s', '1-2s', '2-5s', '>5s']
+
+# Comfortable conversational speaking pace
+IDEAL_WPM_LOW = 120
+IDEAL_WPM_HIGH = 160
+
+
+def _round(value, digits=1):
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def _clip_score(value):
+    return int(np.clip(round(float(value)), 0, 100))
+
+
+def _phrase_arrays(phrases):
+    """Flatten Fast Transcription phrases into column arrays sorted by offset"""
+    texts = [p.get('text', '') for p in phrases]
+    offsets = np.array([p.get('offsetMilliseconds', 0) for p in phrases], dtype=float)
+    durations = np.array([p.get('durationMilliseconds', 0) for p in phrases], dtype=float)
+    speakers = np.array([p.get('speaker', 0) for p in phrases])
+    words = np.array([len(t.split()) for t in texts], dtype=float)
+    fillers = np.array([len(FILLER_PATTERN.findall(t)) for t in texts], dtype=float)
+
+    order = np.argsort(offsets, kind='stable')
+    return offsets[order], durations[order], speakers[order], words[order], fillers[order]
+
+
+def _pause_distribution(gaps):
+    if gaps.size == 0:
+        return {'count': 0, 'mean_ms': None, 'median_ms': None, 'p90_ms': None, 'max_ms': None,
+                'long_pauses': 0, 'histogram': dict.fromkeys(PAUSE_BUCKET_LABELS, 0)}
+    histogram, _ = np.histogram(gaps, bins=PAUSE_BUCKETS_MS)
+    return {
+        'count': int(gaps.size),
+        'mean_ms': _round(gaps.mean(), 0),
+        'median_ms': _round(np.median(gaps), 0),
+        'p90_ms': _round(np.percentile(gaps, 90), 0),
+        'max_ms': _round(gaps.max(), 0),
+        'long_pauses': int((gaps > LONG_PAUSE_MS).sum()),
+        'histogram': dict(zip(PAUSE_BUCKET_LABELS, histogram.tolist()))
+    }
+
+
+def _label_roles(phrases):
+    """Relabel per-segment speakers as ``candidate`` or ``interviewer``
+
+    Diarization numbers speakers afresh in every streamed segment, so labels
+    are mapped to roles segment by segment: the speaker who talks most in a
+    segment is the candidate.  A segment with a single speaker is the
+    interviewer's only when most of its phrases are questions.
+    """
+    by_segment = {}
+    for phrase in phrases:
+        by_segment.setdefault(phrase.get('segment', 0), []).append(phrase)
+    labelled = []
+    for segment_phrases in by_segment.values():
+        talk_ms = {}
+        for phrase in segment_phrases:
+            speaker = phrase.get('speaker', 0)
+            talk_ms[speaker] = talk_ms.get(speaker, 0) + phrase.get('durationMilliseconds', 0)
+        if len(talk_ms) > 1:
+            candidate = max(talk_ms, key=talk_ms.get)
+        else:
+            questions = sum(p.get('text', '').rstrip().endswith('?') for p in segment_phrases)
+            candidate = None if questions * 2 > len(segment_phrases) else next(iter(talk_ms))
+        for phrase in segment_phrases:
+            role = 'candidate' if phrase.get('speaker', 0) == candidate else 'interviewer'
+            labelled.append(dict(phrase, speaker=role))
+    return labelled
+
+
+def compute_conversation_metrics(phrases, total_duration_ms=None):
+    """Compute pace, talk time, pauses, fillers and answer latency from phrases.
+
+    ``phrases`` is the ``phrases`` list returned by Fast Transcription, each with
+    ``offsetMilliseconds``, ``durationMilliseconds``, ``text`` and, when
+    diarization is enabled, ``speaker``.  The candidate is taken to be the
+    speaker with the most talk time.
+
+    Phrases merged from a streamed recording carry the ``segment`` they came
+    from.  Diarization labels speakers separately in every segment, so with
+    more than one segment speakers are first mapped to ``candidate`` and
+    ``interviewer`` by ``_label_roles`` and ``speaker_roles`` is ``'estimated'``.
+    """
+    if not phrases:
+        return None
+    estimated_roles = len({p.get('segment', 0) for p in phrases}) > 1
+    if estimated_roles:
+        phrases = _label_roles(phrases)
+
+    offsets, durations, speakers, words, fillers = _phrase_arrays(phrases)
+    ends = offsets + durations
+    speaker_ids, speaker_idx = np.unique(speakers, return_inverse=True)
+
+    talk_ms = np.bincount(speaker_idx, weights=durations, minlength=len(speaker_ids))
+    speaker_words = np.bincount(speaker_idx, weights=words, minlength=len(speaker_ids))
+    speaker_fillers = np.bincount(speaker_idx, weights=fillers, minlength=len(speaker_ids))
+    total_talk_ms = talk_ms.sum()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speaker_wpm = np.where(talk_ms > 0, speaker_words / (talk_ms / 60000.0), np.nan)
+        speaker_filler_rate = np.where(speaker_words > 0, speaker_fillers / speaker_words * 100, 0.0)
+
+    # Silence between consecutive phrases, ignoring overlapping speech
+    gaps = np.clip(offsets[1:] - ends[:-1], 0, None)
+
+    if estimated_roles and 'candidate' in speaker_ids:
+        candidate = int(np.flatnonzero(speaker_ids == 'candidate')[0])
+    else:
+        candidate = int(np.argmax(talk_ms))
+    # Latency is the silence before the candidate starts answering the other speaker
+    turn_changes = (speaker_idx[1:] == candidate) & (speaker_idx[:-1] != candidate)
+    latencies = gaps[turn_changes]
+
+    if total_duration_ms is None:
+        total_duration_ms = float(ends.max()) if ends.size else 0.0
+    total_words = words.sum()
+
+    metrics = {
+        'duration_ms': _round(total_duration_ms, 0),
+        'total_words': int(total_words),
+        'words_per_minute': _round(total_words / (total_talk_ms / 60000.0)) if total_talk_ms else None,
+        'candidate_speaker': speaker_ids[candidate].item(),
+        'speakers': {
+            str(speaker_ids[i].item()): {
+                'talk_time_ms': _round(talk_ms[i], 0),
+                'talk_time_ratio': _round(talk_ms[i] / total_talk_ms, 3) if total_talk_ms else None,
+                'words': int(speaker_words[i]),
+                'words_per_minute': _round(speaker_wpm[i]),
+                'filler_rate_per_100_words': _round(speaker_filler_rate[i], 2)
+            } for i in range(len(speaker_ids))
+        },
+        'silence_ratio': _round(1 - total_talk_ms / total_duration_ms, 3) if total_duration_ms else None,
+        'pauses': _pause_distribution(gaps),
+        'filler_words': int(fillers.sum()),
+        'filler_rate_per_100_words': _round(fillers.sum() / total_words * 100, 2) if total_words else 0.0,
+        'answer_latency': {
+            'count': int(latencies.size),
+            'mean_ms': _round(latencies.mean(), 0) if latencies.size else None,
+            'median_ms': _round(np.median(latencies), 0) if latencies.size else None,
+            'max_ms': _round(latencies.max(), 0) if latencies.size else None
+        }
+    }
+    if estimated_roles:
+        metrics['speaker_roles'] = 'estimated'
+    return metrics
+
+
+def compute_text_metrics(transcript):
+    """Fallback metrics when only a plain transcript (no timings) is available"""
+    words = len(transcript.split())
+    filler_count = len(FILLER_PATTERN.findall(transcript))
+    return {
+        'total_words': words,
+        'filler_words': filler_count,
+        'filler_rate_per_100_words': round(filler_count / words * 100, 2) if words else 0.0
+    }
+
+
+def score_engagement_metrics(metrics):
+    """Map raw metrics onto the 0-100 scores shown in the analysis UI"""
+    filler_rate = metrics.get('filler_rate_per_100_words') or 0.0
+    clarity = 100 - min(filler_rate * 6, 45)
+    scores = {'engagement_score': None, 'communication_clarity': None, 'enthusiasm_level': None}
+
+    if 'speakers' not in metrics:
+        scores['communication_clarity'] = _clip_score(clarity)
+        return scores
+
+    candidate = metrics['speakers'][str(metrics['candidate_speaker'])]
+    wpm = candidate['words_per_minute'] or 0.0
+    pace_gap = max(IDEAL_WPM_LOW - wpm, wpm - IDEAL_WPM_HIGH, 0)
+    clarity -= min(pace_gap * 0.5, 30)
+    clarity -= min(metrics['pauses']['long_pauses'] * 2, 15)
+
+    # Candidates should carry most of the conversation without monologuing
+    talk_ratio = candidate['talk_time_ratio'] or 0.0
+    latency_ms = metrics['answer_latency']['median_ms']
+    latency_penalty = min(max(latency_ms - 1000, 0) / 100, 30) if latency_ms is not None else 0
+    engagement = 100 - abs(talk_ratio - 0.7) * 120 - latency_penalty
+    if metrics['silence_ratio'] is not None:
+        engagement -= min(metrics['silence_ratio'] * 40, 20)
+
+    enthusiasm = 50 + min(max(wpm - 100, -50), 60) * 0.6 - latency_penalty - min(filler_rate * 3, 20)
+
+    scores['engagement_score'] = _clip_score(engagement)
+    scores['communication_clarity'] = _clip_score(clarity)
+    scores['enthusiasm_level'] = _clip_score(enthusiasm)
+    return scores
+
+
+def build_metrics_summary(transcript, phrases=None, total_duration_ms=None):
+    """Metrics block for an analysis, preferring timing data when present"""
+    metrics = compute_conversation_metrics(phrases, total_duration_ms) if phrases else None
+    source = 'timings'
+    if metrics is None:
+        metrics = compute_text_metrics(transcript)
+        source = 'text'
+    summary = score_engagement_metrics(metrics)
+    summary['source'] = source
+    summary['details'] = metrics
+    return summary
@@ -0,0 +1,247 @@
+"""Materialized dashboard analytics maintained on write.
+
+Writes of matches, interviews and Q&A sessions emit small events; each batch
+of events is folded into a single aggregate document in one transaction.
+The dashboards read that document alone, so their cost does not depend on
+how much data has been stored.
+
+Usage (one-off backfill from the raw collections):
+    python dashboard_aggregates.py --rebuild
+"""
+import argparse
+import sys
+from datetime import datetime
+
+DASHBOARD_COLLECTION = 'analytics'
+DASHBOARD_DOCUMENT = 'dashboard'
+# IDs of applied events live in their own document, so dashboard reads do not load them
+APPLIED_EVENTS_DOCUMENT = 'dashboard_events'
+RECENT_MATCHES = 10
+DAILY_RETENTION_DAYS = 90
+# IDs of the most recently applied events, so a replayed event is not counted twice
+APPLIED_EVENT_IDS = 2000
+
+
+def empty_dashboard():
+    return {
+        'totals': {'matches': 0, 'interviews': 0, 'qa_sessions': 0},
+        'match_score_sum': 0,
+        'interviews': {'in_progress': 0, 'completed': 0, 'score_sum': 0, 'sentiment_sum': 0, 'sentiment_count': 0},
+        'role_distribution': {},
+        'recent_matches': [],
+        'daily': {},
+        'updated_at': None
+    }
+
+
+def _iso(timestamp):
+    if isinstance(timestamp, datetime):
+        return timestamp.isoformat()
+    return timestamp or datetime.now().isoformat()
+
+
+def match_event(data):
+    return {
+        'type': 'match',
+        'filename': data.get('filename', 'Unknown'),
+        'score': (data.get('result') or {}).get('score', 0),
+        'timestamp': _iso(data.get('timestamp'))
+    }
+
+
+def qa_session_event(data):
+    return {'type': 'qa_session', 'role': data.get('role') or 'Unknown', 'timestamp': _iso(data.get('timestamp'))}
+
+
+def interview_started_event(data):
+    return {'type': 'interview_started', 'role': data.get('role') or 'Unknown', 'timestamp': _iso(data.get('timestamp'))}
+
+
+def interview_analyzed_event(results, analysis=None, timestamp=None):
+    sentiment = ((analysis or {}).get('sentiment_analysis') or {}).get('overall_score')
+    return {
+        'type': 'interview_analyzed',
+        'score': (results or {}).get('overall_score', 0),
+        'sentiment': sentiment,
+        'timestamp': _iso(timestamp)
+    }
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) else 0
+
+
+def _day(dashboard, timestamp):
+    day = str(timestamp)[:10]
+    return dashboard['daily'].setdefault(day, {
+        'matches': 0, 'match_score_sum': 0, 'interviews_started': 0, 'interviews_completed': 0, 'qa_sessions': 0
+    })
+
+
+def empty_applied_events():
+    # Event ID -> order applied, so the oldest can be trimmed
+    return {'events': {}, 'next': 0}
+
+
+def apply_events(dashboard, events, applied=None):
+    """Fold events into the aggregate document in place
+
+    ``applied`` is the applied-events document; events whose ``event_id`` it
+    already holds are skipped, and the IDs of newly applied events are added.
+    """
+    totals = dashboard['totals']
+    interviews = dashboard['interviews']
+    interviews.setdefault('by_role', {})
+    if applied is None:
+        applied = empty_applied_events()
+    seen = applied['events']
+    for event in events:
+        # Write-behind jobs are replayed after a crash, so an event may arrive again
+        event_id = event.get('event_id')
+        if event_id:
+            if event_id in seen:
+                continue
+            seen[event_id] = applied['next']
+            applied['next'] += 1
+        day = _day(dashboard, event['timestamp'])
+        if event['type'] == 'match':
+            score = _number(event['score'])
+            totals['matches'] += 1
+            dashboard['match_score_sum'] += score
+            day['matches'] += 1
+            day['match_score_sum'] += score
+            recent = {k: event[k] for k in ('filename', 'score', 'timestamp')}
+            dashboard['recent_matches'] = ([recent] + dashboard['recent_matches'])[:RECENT_MATCHES]
+        elif event['type'] == 'qa_session':
+            totals['qa_sessions'] += 1
+            day['qa_sessions'] += 1
+            role = event.get('role') or 'Unknown'
+            dashboard['role_distribution'][role] = dashboard['role_distribution'].get(role, 0) + 1
+        elif event['type'] == 'interview_started':
+            totals['interviews'] += 1
+            interviews['in_progress'] += 1
+            day['interviews_started'] += 1
+            role = event.get('role') or 'Unknown'
+            interviews['by_role'][role] = interviews['by_role'].get(role, 0) + 1
+        elif event['type'] == 'interview_analyzed':
+            interviews['in_progress'] = max(0, interviews['in_progress'] - 1)
+            interviews['completed'] += 1
+            interviews['score_sum'] += _number(event.get('score'))
+            if event.get('sentiment') is not None:
+                interviews['sentiment_sum'] += _number(event['sentiment'])
+                interviews['sentiment_count'] += 1
+            day['interviews_completed'] += 1
+
+    # Keep the document bounded: only recent days are rolled up
+    for old_day in sorted(dashboard['daily'])[:-DAILY_RETENTION_DAYS]:
+        del dashboard['daily'][old_day]
+    if len(seen) > APPLIED_EVENT_IDS:
+        for event_id in sorted(seen, key=seen.get)[:len(seen) - APPLIED_EVENT_IDS]:
+            del seen[event_id]
+    dashboard['updated_at'] = datetime.now().isoformat()
+    return dashboard
+
+
+def _average(total, count):
+    return total / count if count else 0
+
+
+class DashboardAggregates:
+    """Reads and incrementally updates the aggregate document"""
+
+    def __init__(self, document_store):
+        self.document_store = document_store
+
+    def record(self, events):
+        """Apply a batch of events in a single transaction"""
+        def apply(documents):
+            dashboard, applied = documents
+            dashboard = dashboard or empty_dashboard()
+            applied = applied or empty_applied_events()
+            # Documents written before the IDs moved out kept them in a list
+            for event_id in dashboard.pop('applied_events', None) or []:
+                applied['events'].setdefault(event_id, applied['next'])
+                applied['next'] += 1
+            return [apply_events(dashboard, events, applied), applied]
+
+        self.document_store.transform_many(
+            [(DASHBOARD_COLLECTION, DASHBOARD_DOCUMENT), (DASHBOARD_COLLECTION, APPLIED_EVENTS_DOCUMENT)], apply
+        )
+
+    def read(self):
+        return self.document_store.get(DASHBOARD_COLLECTION, DASHBOARD_DOCUMENT) or empty_dashboard()
+
+    def stats(self):
+        """Payload of /api/dashboard-stats"""
+        dashboard = self.read()
+        return {
+            'total_matches': dashboard['totals']['matches'],
+            'avg_score': _average(dashboard['match_score_sum'], dashboard['totals']['matches']),
+            'recent_matches': dashboard['recent_matches']
+        }
+
+    def summary(self):
+        """Payload of /api/dashboard-data"""
+        dashboard = self.read()
+        totals = dashboard['totals']
+        interviews = dashboard['interviews']
+        return {
+            'overview': {
+                'total_matches': totals['matches'],
+                'total_interviews': totals['interviews'],
+                'total_qa_sessions': totals['qa_sessions'],
+                'avg_match_score': _average(dashboard['match_score_sum'], totals['matches'])
+            },
+            'recent_activity': [dict(match, type='match') for match in dashboard['recent_matches']],
+            'interview_analytics': {
+                'completed': interviews['completed'],
+                'in_progress': interviews['in_progress'],
+                'avg_score': _average(interviews['score_sum'], interviews['completed']),
+                'avg_sentiment': _average(interviews['sentiment_sum'], interviews['sentiment_count']),
+                'by_role': interviews.get('by_role', {})
+            },
+            'role_distribution': dashboard['role_distribution'],
+            'daily': dashboard['daily'],
+            'updated_at': dashboard['updated_at']
+        }
+
+    def rebuild(self):
+        """Recompute the aggregate from the raw collections; for backfills and repairs"""
+        events = []
+        for _, data in self.document_store.query('matches'):
+            events.append(match_event(data))
+        for _, data in self.document_store.query('qa_sessions'):
+            events.append(qa_session_event(data))
+        for _, data in self.document_store.query('interviews'):
+            events.append(interview_started_event(data))
+            if data.get('status') == 'analyzed':
+                events.append(interview_analyzed_event(data.get('results'), data.get('analysis'), data.get('analyzed_at')))
+        events.sort(key=lambda event: str(event['timestamp']))
+
+        dashboard = apply_events(empty_dashboard(), events)
+        self.document_store.set(DASHBOARD_COLLECTION, DASHBOARD_DOCUMENT, dashboard)
+        return dashboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help='recompute the aggregates from all stored documents')
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return 0
+
+    from dotenv import load_dotenv
+    from storage_backends import create_document_store
+
+    load_dotenv()
+    document_store = create_document_store()
+    if not document_store:
+        return 1
+    dashboard = DashboardAggregates(document_store).rebuild()
+    print(f"Rebuilt dashboard aggregates: {dashboard['totals']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""One deadline per request, honoured by every call made while serving it.
+
+Each request gets ``REQUEST_TIMEOUT`` seconds (default 110, under gunicorn's
+120 s kill), or less if the client sends ``X-Request-Timeout``.  Downstream
+calls take their timeouts from what is left via ``timeout(cap)``, retries
+sleep through ``sleep`` and give up once the deadline would pass, and
+``check()`` raises between steps.  ``check()`` also notices when the client
+has closed its connection, so no more upstream capacity is spent on a
+response nobody will read.
+
+Outside a request (write-behind flushes, background scoring) there is no
+deadline: ``timeout(cap)`` returns ``cap`` and ``check()`` does nothing, unless
+the work runs inside ``bounded(seconds)``.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import selectors
+import socket
+import time
+
+from flask import jsonify, request
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUEST_TIMEOUT = 110
+# Seconds between checks of the client connection
+DISCONNECT_PROBE_INTERVAL = 1.0
+# Sleeps are sliced so a disconnect is noticed while waiting between retries
+SLEEP_SLICE = 0.5
+
+_current = contextvars.ContextVar('talentcore_deadline', default=None)
+
+
+class RequestCancelled(Exception):
+    status_code = 500
+    reason = 'cancelled'
+    message = 'Request cancelled'
+
+
+class DeadlineExceeded(RequestCancelled):
+    status_code = 504
+    reason = 'deadline'
+    message = 'Request deadline exceeded'
+
+
+class ClientDisconnected(RequestCancelled):
+    # nginx's "client closed request"; nobody reads it, but logs and metrics do
+    status_code = 499
+    reason = 'disconnected'
+    message = 'Client disconnected'
+
+
+def _client_gone(sock):
+    """True only if the peer has closed ``sock``; a probe that fails proves nothing"""
+    try:
+        # select.select cannot take descriptors past FD_SETSIZE, and gevent removes select.poll
+        with selectors.DefaultSelector() as selector:
+            selector.register(sock, selectors.EVENT_READ)
+            readable = selector.select(0)
+        # A readable socket with nothing to read has been closed by the peer
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return False
+
+
+class Deadline:
+    def __init__(self, seconds, sock=None):
+        self.expires_at = time.monotonic() + seconds
+        self.sock = sock
+        # The RequestCancelled subclass once cancelled, and whether it was answered
+        self.cancelled = None
+        self.reported = False
+        self.next_probe = 0.0
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """Raise if the deadline has passed or the client has gone away"""
+        if self.cancelled is None:
+            now = time.monotonic()
+            if now >= self.expires_at:
+                self.cancelled = DeadlineExceeded
+            elif self.sock is not None and now >= self.next_probe:
+                self.next_probe = now + DISCONNECT_PROBE_INTERVAL
+                if _client_gone(self.sock):
+                    self.cancelled = ClientDisconnected
+        if self.cancelled is not None:
+            raise self.cancelled(self.cancelled.message)
+
+
+def current():
+    return _current.get()
+
+
+def check():
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def timeout(cap=None):
+    """Timeout for a downstream call: what is left of the deadline, at most ``cap``"""
+    deadline = _current.get()
+    if deadline is None:
+        return cap
+    deadline.check()
+    remaining = deadline.remaining()
+    return min(remaining, cap) if cap is not None else remaining
+
+
+def sleep(seconds):
+    """``time.sleep`` that fails fast when the deadline would pass before it ends"""
+    deadline = _current.get()
+    if deadline is None:
+        time.sleep(seconds)
+        return
+    deadline.check()
+    if seconds >= deadline.remaining():
+        deadline.cancelled = DeadlineExceeded
+        deadline.check()
+    finish = time.monotonic() + seconds
+    while True:
+        left = finish - time.monotonic()
+        if left <= 0:
+            return
+        time.sleep(min(left, SLEEP_SLICE))
+        deadline.check()
+
+
+@contextlib.contextmanager
+def bounded(seconds):
+    """Run background work under its own deadline, so its calls and retries end in time"""
+    token = _current.set(Deadline(seconds))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def cancelled_response(error):
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.reported = True
+    metrics.record_cancelled(error.reason)
+    logger.info("%s %s cancelled: %s", request.method, request.path, error)
+    response = jsonify({'error': str(error), 'reason': error.reason})
+    response.status_code = error.status_code
+    return response
+
+
+def install(app):
+    """Give each request a deadline and answer cancelled requests with 504 or 499"""
+    default_timeout = float(os.getenv('REQUEST_TIMEOUT', str(DEFAULT_REQUEST_TIMEOUT)))
+
+    @app.before_request
+    def start_deadline():
+        seconds = default_timeout
+        requested = request.headers.get('X-Request-Timeout')
+        if requested:
+            try:
+                seconds = min(seconds, max(0.0, float(requested)))
+            except ValueError:
+                pass
+        sock = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+        _current.set(Deadline(seconds, sock))
+
+    @app.after_request
+    def report_cancelled(response):
+        # Handlers turn most exceptions into a 500; report the real cause instead
+        deadline = _current.get()
+        if deadline is None or deadline.cancelled is None or deadline.reported:
+            return response
+        if response.status_code >= 500:
+            return cancelled_response(deadline.cancelled(deadline.cancelled.message))
+        return response
+
+    @app.teardown_request
+    def clear_deadline(exc):
+        _current.set(None)
+
+    app.register_error_handler(RequestCancelled, cancelled_response)
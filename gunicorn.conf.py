@@ -0,0 +1,48 @@
+"""Gunicorn settings, picked up automatically from the working directory.
+
+Most requests spend their time waiting on Azure OpenAI, Speech or storage.
+With sync workers every such wait occupies a whole process, so two workers
+meant two requests in flight.  SERVING_MODE chooses how a worker process
+overlaps those waits:
+
+    sync      one request per worker (previous behaviour)
+    threaded  a thread per request, GUNICORN_THREADS per worker (default)
+    gevent    a greenlet per request, GEVENT_CONNECTIONS per worker
+
+See docs/serving-modes.md for measured throughput of each mode.
+"""
+import os
+
+SERVING_MODE = os.getenv('SERVING_MODE', 'threaded').lower()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+# LLM completions and transcriptions can take well over 30 seconds
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+if SERVING_MODE == 'threaded':
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', '128'))
+elif SERVING_MODE == 'gevent':
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('GEVENT_CONNECTIONS', '1000'))
+elif SERVING_MODE == 'sync':
+    worker_class = 'sync'
+else:
+    raise ValueError(f"Unknown SERVING_MODE {SERVING_MODE}; expected sync, threaded or gevent")
+
+
+def post_fork(server, worker):
+    if SERVING_MODE != 'gevent':
+        return
+    # Patch before the app is imported, and make gRPC (Firestore) cooperative
+    # too; otherwise one Firestore call would block every greenlet in the worker
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from grpc.experimental import gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    except ImportError:
+        pass
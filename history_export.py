@@ -0,0 +1,156 @@
+"""Streaming export of Q&A sessions, matches and call analyses.
+
+Records are produced by generators one page at a time while the next page
+is fetched in the background, so an export holds at most two pages in
+memory however much history exists.  Output is NDJSON or CSV, written row
+by row.
+
+Usage:
+    python history_export.py qa_sessions|matches|call_analyses [--format ndjson|csv]
+                             [--from DATE] [--to DATE] [--output FILE]
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis_store import ANALYSIS_CONTAINER, analysis_blob_name
+from history_index import MAX_PAGE_SIZE, build_range_conditions, page_index_entries
+from qa_store import QA_CONTAINER
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# CSV columns per dataset; nested values are written as JSON
+CSV_COLUMNS = {
+    'qa_sessions': ['session_id', 'timestamp', 'experience_level', 'skill_level', 'question_type',
+                    'job_description', 'questions'],
+    'matches': ['match_id', 'timestamp', 'filename', 'score', 'cultural_fit', 'jd_text', 'result'],
+    'call_analyses': ['interview_id', 'timestamp', 'recommendation', 'jd_text', 'transcript', 'analysis']
+}
+EXPORT_DATASETS = tuple(CSV_COLUMNS)
+
+
+def prefetched_pages(fetch_page):
+    """Yield the records of successive pages, fetching page n+1 while page n is consumed.
+
+    ``fetch_page(cursor)`` returns ``(records, next_cursor)``.
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='export-prefetch') as executor:
+        pending = executor.submit(fetch_page, None)
+        while pending is not None:
+            records, cursor = pending.result()
+            pending = executor.submit(fetch_page, cursor) if cursor else None
+            yield from records
+
+
+def _blob_pages(store, container_name, key_to_blob, id_field, date_from, date_to):
+    def fetch_page(cursor):
+        entries, next_cursor = page_index_entries(
+            store, container_name, MAX_PAGE_SIZE, cursor, date_from=date_from, date_to=date_to
+        )
+        keys = [entry['key'] for entry in entries]
+        records = store.get_json_many(container_name, [key_to_blob(key) for key in keys])
+        # Entries whose blob has since been deleted are skipped
+        return [dict(record, **{id_field: key}) for key, record in zip(keys, records) if record is not None], next_cursor
+    return fetch_page
+
+
+def _document_pages(document_store, collection, id_field, date_from, date_to):
+    conditions = build_range_conditions(date_from, date_to)
+
+    def fetch_page(cursor):
+        docs = document_store.query(
+            collection, conditions, order_by='timestamp', descending=True,
+            limit=MAX_PAGE_SIZE, start_after=cursor
+        )
+        next_cursor = docs[-1][0] if len(docs) == MAX_PAGE_SIZE else None
+        return [dict(data, **{id_field: doc_id}) for doc_id, data in docs], next_cursor
+    return fetch_page
+
+
+def iter_records(dataset, blob_store=None, document_store=None, date_from=None, date_to=None):
+    """Newest-first records of a dataset; ValueError when it cannot be exported"""
+    if dataset == 'qa_sessions' and blob_store:
+        fetch_page = _blob_pages(blob_store, QA_CONTAINER, lambda key: key, 'session_id', date_from, date_to)
+    elif dataset == 'call_analyses' and blob_store:
+        fetch_page = _blob_pages(blob_store, ANALYSIS_CONTAINER, analysis_blob_name, 'interview_id', date_from, date_to)
+    elif dataset in EXPORT_DATASETS and document_store:
+        # Without blob storage every dataset still lives in the document store
+        id_field = {'qa_sessions': 'session_id', 'matches': 'match_id', 'call_analyses': 'interview_id'}[dataset]
+        fetch_page = _document_pages(document_store, dataset, id_field, date_from, date_to)
+    elif dataset in EXPORT_DATASETS:
+        raise ValueError(f"No storage available for {dataset}")
+    else:
+        raise ValueError(f"Unknown dataset {dataset}; expected one of {', '.join(EXPORT_DATASETS)}")
+    return prefetched_pages(fetch_page)
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return '' if value is None else value
+
+
+def _csv_row(dataset, record):
+    if dataset == 'matches':
+        result = record.get('result') or {}
+        record = dict(record, score=result.get('score'), cultural_fit=result.get('cultural_fit'))
+    return [_csv_value(record.get(column)) for column in CSV_COLUMNS[dataset]]
+
+
+def render(records, dataset, export_format='ndjson'):
+    """Serialise records lazily, one line at a time"""
+    if export_format == 'ndjson':
+        for record in records:
+            yield json.dumps(record, default=str) + '\n'
+    elif export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS[dataset])
+        for record in records:
+            writer.writerow(_csv_row(dataset, record))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        raise ValueError(f"Unknown format {export_format}; expected ndjson or csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset', choices=EXPORT_DATASETS)
+    parser.add_argument('--format', dest='export_format', choices=tuple(EXPORT_FORMATS), default='ndjson')
+    parser.add_argument('--from', dest='date_from', help='only records on or after this ISO date')
+    parser.add_argument('--to', dest='date_to', help='only records on or before this ISO date')
+    parser.add_argument('--output', help='file to write; defaults to stdout')
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from storage_backends import create_blob_store, create_document_store
+
+    load_dotenv()
+    # Storage start-up messages are logged to stderr, so stdout only carries the export
+    blob_store = create_blob_store() if args.dataset != 'matches' else None
+    document_store = create_document_store() if args.dataset == 'matches' or not blob_store else None
+    try:
+        records = iter_records(args.dataset, blob_store, document_store, args.date_from, args.date_to)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for chunk in render(records, args.dataset, args.export_format):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+    print(f"Exported {args.dataset}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
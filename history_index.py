@@ -0,0 +1,146 @@
+"""Newest-first summary index for history containers in a blob store.
+
+Every stored item gets an empty index blob named by inverted timestamp whose
+metadata carries the handful of fields list views need.  Listing history is
+then a paged prefix listing over the index: no item is downloaded, and the
+cost of a page does not depend on history size.
+
+Filterable fields are also written as tags, so filtered listings are answered
+by the store's tag index (blob index tags on Azure) rather than by reading
+everything and filtering in Python.  Both listings return blobs in name
+order, i.e. newest first, and page with the store's continuation token,
+which is handed to clients as an opaque cursor.
+"""
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+
+logger = logging.getLogger(__name__)
+
+TIME_INDEX_PREFIX = "index/by-time/"
+TIMESTAMP_TAG = "ts"
+MAX_PAGE_SIZE = 100
+
+# Inverted millisecond timestamps sort newest first in blob listings
+_TIME_INDEX_BASE = 10 ** 13
+_TAG_DISALLOWED = re.compile(r"[^a-z0-9 +\-.:=_/]")
+
+
+def timestamp_seconds(iso_timestamp):
+    try:
+        return datetime.fromisoformat(iso_timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def index_blob_name(key, timestamp):
+    inverted = _TIME_INDEX_BASE - int(timestamp * 1000)
+    return f"{TIME_INDEX_PREFIX}{inverted:013d}-{quote(key, safe='')}"
+
+
+def key_from_index_name(blob_name):
+    return unquote(blob_name[len(TIME_INDEX_PREFIX):].split('-', 1)[1])
+
+
+def _encode_metadata(summary):
+    # Blob metadata values must be ASCII, so everything is percent-encoded
+    return {name: quote(str(value), safe='') for name, value in summary.items() if value is not None}
+
+
+def _decode_metadata(metadata):
+    return {name: unquote(value) for name, value in (metadata or {}).items()}
+
+
+def tag_value(value):
+    """Normalise a value to the character set blob index tags accept"""
+    return _TAG_DISALLOWED.sub('_', str(value).strip().lower())[:256]
+
+
+def _timestamp_tag(iso_timestamp):
+    return datetime.fromtimestamp(timestamp_seconds(iso_timestamp)).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def add_index_entry(store, container_name, key, iso_timestamp, summary, filter_fields=()):
+    """Record one item's summary in the index, tagging ``filter_fields`` for queries"""
+    entry = dict(summary, key=key, timestamp=iso_timestamp)
+    tags = {name: tag_value(summary[name]) for name in filter_fields if summary.get(name)}
+    tags[TIMESTAMP_TAG] = _timestamp_tag(iso_timestamp)
+
+    blob_name = index_blob_name(key, timestamp_seconds(iso_timestamp))
+    store.put(container_name, blob_name, b'', metadata=_encode_metadata(entry), tags=tags)
+    return blob_name
+
+
+def delete_index_entry(store, container_name, blob_name):
+    try:
+        store.delete(container_name, blob_name)
+    except Exception as e:
+        logger.warning("Could not delete index entry %s: %s", blob_name, e)
+
+
+def _end_of_range(value):
+    """Upper bound and its operator; a bare date includes the whole day"""
+    if len(value) == 10:
+        return datetime.fromisoformat(value) + timedelta(days=1), '<'
+    return datetime.fromisoformat(value), '<='
+
+
+def build_tag_conditions(filters=None, date_from=None, date_to=None):
+    """Tag conditions for equality filters and a timestamp range; empty if unfiltered"""
+    conditions = [(name, '==', tag_value(value)) for name, value in sorted((filters or {}).items()) if value]
+    if date_from:
+        conditions.append((TIMESTAMP_TAG, '>=', datetime.fromisoformat(date_from).strftime('%Y-%m-%dT%H:%M:%S')))
+    if date_to:
+        bound, operator = _end_of_range(date_to)
+        conditions.append((TIMESTAMP_TAG, operator, bound.strftime('%Y-%m-%dT%H:%M:%S')))
+    return conditions
+
+
+def build_range_conditions(date_from=None, date_to=None, field='timestamp'):
+    """Document-store conditions for the same timestamp range as ``build_tag_conditions``"""
+    conditions = []
+    if date_from:
+        conditions.append((field, '>=', datetime.fromisoformat(date_from)))
+    if date_to:
+        bound, operator = _end_of_range(date_to)
+        conditions.append((field, operator, bound))
+    return conditions
+
+
+def _entry_from_blob(name, metadata):
+    entry = _decode_metadata(metadata)
+    entry.setdefault('key', key_from_index_name(name))
+    return entry
+
+
+def page_index_entries(store, container_name, limit=20, cursor=None,
+                       filters=None, date_from=None, date_to=None):
+    """One page of summaries, newest first, and the cursor for the next page"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    conditions = build_tag_conditions(filters, date_from, date_to)
+
+    if conditions:
+        objects, next_cursor = store.query_page(container_name, conditions, limit, cursor)
+    else:
+        objects, next_cursor = store.list_page(container_name, TIME_INDEX_PREFIX, limit, cursor)
+
+    # Stores whose tag queries return names only: summaries are fetched for this page alone
+    missing = [o.name for o in objects if o.metadata is None]
+    fetched = dict(zip(missing, store.get_metadata_many(container_name, missing))) if missing else {}
+    entries = [
+        _entry_from_blob(o.name, o.metadata if o.metadata is not None else fetched[o.name])
+        for o in objects
+    ]
+    return entries, next_cursor
+
+
+def list_index_entries(store, container_name, limit=20):
+    """Summaries of the newest items, read from index metadata only"""
+    entries, _ = page_index_entries(store, container_name, limit)
+    return entries
+
+
+def is_index_blob(blob_name):
+    return blob_name.startswith(TIME_INDEX_PREFIX)
@@ -0,0 +1,225 @@
+"""``Idempotency-Key`` support for the expensive POST endpoints.
+
+A client that sends ``Idempotency-Key`` with a request gets the same response
+for every retry with that key within ``IDEMPOTENCY_TTL`` seconds, and the
+LLM call, transcription and storage writes happen once.  Keys are scoped to
+the client (a configured ``X-API-Key`` or its address) and the endpoint.
+
+The first request claims the key and runs; retries that arrive meanwhile
+wait for it and then replay its response.  A key reused with a different
+request body is refused with ``422``.  Responses are stored in a SQLite file
+under ``IDEMPOTENCY_DIR`` shared by the workers of a host.  Only final
+answers are kept: a 5xx, 429 or 409 releases the key so the retry runs again.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+import deadlines
+from admission_control import client_id
+from storage_backends import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+# Statuses a retry should not be answered with from the store
+RETRYABLE_STATUSES = {408, 409, 429}
+# How often a retry waiting on another worker looks at the store
+POLL_INTERVAL = 0.2
+# Longest a retry waits for the original before answering 409
+MAX_WAIT = 120
+# Response headers stored with the body and sent again on replay
+REPLAYED_HEADERS = {'etag', 'last-modified', 'location', 'retry-after', 'cache-control', 'content-disposition',
+                    'content-encoding', 'content-language'}
+
+
+def request_fingerprint():
+    """Hash of what the request asks for, independent of multipart boundaries"""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode('utf-8'))
+    if request.is_json:
+        body = request.get_json(silent=True)
+        digest.update(json.dumps(body, sort_keys=True, default=str).encode('utf-8'))
+    else:
+        for name in sorted(request.form):
+            digest.update(json.dumps([name, request.form.getlist(name)]).encode('utf-8'))
+        for name in sorted(request.files):
+            for upload in request.files.getlist(name):
+                digest.update(json.dumps([name, upload.filename]).encode('utf-8'))
+                for chunk in iter(lambda: upload.stream.read(1 << 16), b''):
+                    digest.update(chunk)
+                upload.stream.seek(0)
+    return digest.hexdigest()
+
+
+def _error(status, message, retry_after=None):
+    response = jsonify({'error': message})
+    response.status_code = status
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+class IdempotencyStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            state TEXT NOT NULL,
+            status INTEGER,
+            mimetype TEXT,
+            headers TEXT,
+            body BLOB,
+            lease_until REAL NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS responses_by_expiry ON responses (expires_at);
+    """
+
+    def __init__(self, directory=None, ttl=None):
+        self.directory = directory or os.getenv(
+            'IDEMPOTENCY_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-idempotency')
+        )
+        self.ttl = float(ttl or os.getenv('IDEMPOTENCY_TTL', str(24 * 3600)))
+        self._database = None
+        self.lock = threading.Lock()
+        # Requests of this worker in progress, so retries here wait without polling
+        self.running = {}
+        self.stats = {'claimed': 0, 'replayed': 0, 'waited': 0, 'mismatched': 0, 'released': 0}
+
+    @property
+    def database(self):
+        # Opened on first use so importing the app creates no files
+        if self._database is None:
+            with self.lock:
+                if self._database is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    database = SQLiteDatabase(os.path.join(self.directory, 'idempotency.db'), self.SCHEMA)
+                    with database.connect() as connection:
+                        columns = {row[1] for row in connection.execute('PRAGMA table_info(responses)')}
+                        # Files created before headers were stored
+                        if 'headers' not in columns:
+                            connection.execute('ALTER TABLE responses ADD COLUMN headers TEXT')
+                    self._database = database
+        return self._database
+
+    def idempotent(self, view):
+        """Decorator replaying the stored response when a request repeats its ``Idempotency-Key``"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error(400, f"Idempotency-Key is longer than {MAX_KEY_LENGTH} characters")
+
+            scoped_key = hashlib.sha256(f"{client_id()}|{request.endpoint}|{key}".encode('utf-8')).hexdigest()
+            fingerprint = request_fingerprint()
+            waited_until = time.monotonic() + deadlines.timeout(MAX_WAIT)
+            while True:
+                outcome, row = self._claim(scoped_key, fingerprint)
+                if outcome == 'claimed':
+                    return self._run(scoped_key, view, args, kwargs)
+                if outcome == 'mismatch':
+                    self._count('mismatched')
+                    return _error(422, 'Idempotency-Key was already used with a different request')
+                if outcome == 'done':
+                    self._count('replayed')
+                    return self._replay(row)
+                # Another request with this key is running: wait for it, then look again
+                self._count('waited')
+                if not self._wait(scoped_key, waited_until):
+                    return _error(409, 'A request with this Idempotency-Key is still in progress', retry_after=5)
+        return wrapper
+
+    def _claim(self, key, fingerprint):
+        """``('claimed' | 'done' | 'running' | 'mismatch', row)`` for ``key``"""
+        now = time.time()
+        connection = self.database.connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM responses WHERE expires_at < ?', (now,))
+            row = connection.execute(
+                'SELECT fingerprint, state, status, mimetype, headers, body, lease_until FROM responses WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if row is not None:
+                if row[0] != fingerprint:
+                    return 'mismatch', row
+                if row[1] == 'done':
+                    return 'done', row
+                if row[6] > now:
+                    return 'running', row
+                # The worker running it died; take the key over
+            # Past the request's deadline the claimant is gone, even if its worker is not
+            lease = deadlines.timeout(MAX_WAIT)
+            connection.execute(
+                'INSERT OR REPLACE INTO responses (key, fingerprint, state, lease_until, expires_at) '
+                "VALUES (?, ?, 'pending', ?, ?)",
+                (key, fingerprint, now + lease, now + self.ttl)
+            )
+        with self.lock:
+            self.running[key] = threading.Event()
+            self.stats['claimed'] += 1
+        return 'claimed', None
+
+    def _run(self, key, view, args, kwargs):
+        response = None
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+            return response
+        finally:
+            final = (response is not None and not response.is_streamed and response.status_code < 500
+                     and response.status_code not in RETRYABLE_STATUSES)
+            with self.database.connect() as connection:
+                if final:
+                    headers = [(name, value) for name, value in response.headers.items()
+                               if name.lower() in REPLAYED_HEADERS]
+                    connection.execute(
+                        "UPDATE responses SET state = 'done', status = ?, mimetype = ?, headers = ?, body = ? "
+                        'WHERE key = ?',
+                        (response.status_code, response.mimetype, json.dumps(headers), response.get_data(), key)
+                    )
+                else:
+                    connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+            with self.lock:
+                event = self.running.pop(key, None)
+                if not final:
+                    self.stats['released'] += 1
+            if event:
+                event.set()
+
+    def _wait(self, key, until):
+        """Wait for the request holding ``key`` to finish; False once ``until`` has passed"""
+        with self.lock:
+            event = self.running.get(key)
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            return False
+        if event is not None:
+            event.wait(remaining)
+        else:
+            time.sleep(min(POLL_INTERVAL, remaining))
+        return True
+
+    def _replay(self, row):
+        _, _, status, mimetype, headers, body, _ = row
+        response = current_app.response_class(body, status=status, mimetype=mimetype)
+        for name, value in json.loads(headers or '[]'):
+            response.headers[name] = value
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.stats, in_progress=len(self.running))
@@ -0,0 +1,165 @@
+"""Append-only interview history for the call analysis app.
+
+Every analysis is appended as one row of an SQLite log in WAL mode, so a
+write costs the same no matter how much history exists and readers never
+block writers.  Re-analysing an interview appends a newer version; reads
+return the latest one, located through the ``interview_id`` index.
+``compact`` drops superseded versions and returns the space to the disk.
+
+Usage:
+    python interview_history.py [--db history.db] [--migrate history.json] [--compact]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+from storage_backends import SQLiteDatabase
+
+DEFAULT_HISTORY_DB = 'history.db'
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS history (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        interview_id TEXT,
+        recorded_at TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS history_by_interview ON history (interview_id, seq);
+    CREATE TABLE IF NOT EXISTS imports (
+        sha256 TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        entries INTEGER NOT NULL,
+        imported_at TEXT NOT NULL
+    ) WITHOUT ROWID;
+"""
+
+# Latest version of each interview; rows without an ID are never superseded
+_LATEST = """
+    (interview_id IS NULL OR seq = (
+        SELECT MAX(h.seq) FROM history h WHERE h.interview_id = history.interview_id
+    ))
+"""
+
+
+class InterviewHistory:
+    """Log of analysed interviews with indexed point reads and newest-first paging"""
+
+    def __init__(self, path=DEFAULT_HISTORY_DB):
+        self.path = path
+        self.database = SQLiteDatabase(path, SCHEMA)
+
+    def append(self, interview):
+        self.append_many([interview])
+
+    def append_many(self, interviews):
+        """Append in order, so the last item becomes the newest"""
+        with self.database.connect() as connection:
+            self._insert(connection, interviews)
+
+    def _insert(self, connection, interviews):
+        connection.executemany(
+            'INSERT INTO history (interview_id, recorded_at, data) VALUES (?, ?, ?)',
+            [
+                (item.get('interview_id'), item.get('timestamp') or datetime.now().isoformat(),
+                 json.dumps(item, ensure_ascii=False))
+                for item in interviews
+            ]
+        )
+
+    def get(self, interview_id):
+        """Latest analysis of an interview, or None"""
+        row = self.database.connect().execute(
+            'SELECT data FROM history WHERE interview_id = ? ORDER BY seq DESC LIMIT 1', (interview_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def page(self, limit=20, cursor=None):
+        """Newest-first page of interviews and the cursor of the next page"""
+        sql = f'SELECT seq, data FROM history WHERE {_LATEST}'
+        params = []
+        if cursor:
+            sql += ' AND seq < ?'
+            params.append(int(cursor))
+        sql += ' ORDER BY seq DESC LIMIT ?'
+        params.append(limit + 1)
+        rows = self.database.connect().execute(sql, params).fetchall()
+
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return [json.loads(data) for _, data in rows[:limit]], next_cursor
+
+    def iter_newest_first(self, batch_size=100):
+        cursor = None
+        while True:
+            interviews, cursor = self.page(batch_size, cursor)
+            yield from interviews
+            if not cursor:
+                return
+
+    def count(self):
+        return self.database.connect().execute(f'SELECT COUNT(*) FROM history WHERE {_LATEST}').fetchone()[0]
+
+    def compact(self):
+        """Drop superseded versions and reclaim their space; returns rows removed"""
+        with self.database.connect() as connection:
+            removed = connection.execute(f'DELETE FROM history WHERE NOT {_LATEST}').rowcount
+        connection.execute('VACUUM')
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return removed
+
+    def import_json_file(self, path):
+        """Import a legacy history.json (newest first) once, then rename it
+
+        Every worker tries this at start-up.  The import holds the write lock
+        and records the file's hash in ``imports`` in the same transaction,
+        so only the first worker imports it; the rest find the marker.
+        """
+        connection = self.database.connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                # Renamed by the worker that imported it
+                return 0
+            digest = hashlib.sha256(content).hexdigest()
+            if connection.execute('SELECT 1 FROM imports WHERE sha256 = ?', (digest,)).fetchone():
+                imported = 0
+            else:
+                interviews = json.loads(content)
+                self._insert(connection, reversed(interviews))
+                connection.execute(
+                    'INSERT INTO imports (sha256, path, entries, imported_at) VALUES (?, ?, ?, ?)',
+                    (digest, os.path.abspath(path), len(interviews), datetime.now().isoformat())
+                )
+                imported = len(interviews)
+        try:
+            os.replace(path, f"{path}.migrated")
+        except FileNotFoundError:
+            pass
+        if imported:
+            print(f"Imported {imported} interviews from {path}")
+        return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('CALL_HISTORY_DB', DEFAULT_HISTORY_DB), help='history database path')
+    parser.add_argument('--migrate', metavar='JSON', help='import a legacy history.json file')
+    parser.add_argument('--compact', action='store_true', help='drop superseded versions of re-analysed interviews')
+    args = parser.parse_args()
+
+    history = InterviewHistory(args.db)
+    if args.migrate:
+        history.import_json_file(args.migrate)
+    if args.compact:
+        print(f"Removed {history.compact()} superseded entries")
+    print(f"{history.count()} interviews in {args.db}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
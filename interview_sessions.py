@@ -0,0 +1,232 @@
+"""Server-side state of live interviews.
+
+The signed session cookie used to carry the whole question list and the
+growing transcript, which was re-sent and re-signed on every answer and
+broke once it outgrew the browser's cookie limit.  Now the cookie holds only
+a session ID and the state lives in a SQLite database under
+``INTERVIEW_SESSION_DIR``, which every gunicorn worker on the host shares.
+
+Questions and answers are stored one row each, so recording an answer is a
+constant-size write however long the interview runs.  Each worker keeps
+recently used sessions in memory and reloads one only when its version row
+shows another worker changed it.  Sessions idle for longer than
+``INTERVIEW_SESSION_TTL`` seconds expire.
+"""
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from storage_backends import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class InterviewSession:
+    """One interview: questions as asked, answers as ``(position, answer, timestamp)``"""
+
+    __slots__ = ('session_id', 'interview_id', 'role', 'adaptive', 'current_question', 'questions', 'answers',
+                 'version')
+
+    def __init__(self, session_id, interview_id, role, adaptive, current_question, questions, answers, version):
+        self.session_id = session_id
+        self.interview_id = interview_id
+        self.role = role
+        self.adaptive = adaptive
+        self.current_question = current_question
+        self.questions = questions
+        self.answers = answers
+        self.version = version
+
+    def question_text(self, position):
+        return self.questions[position]['question'] if position < len(self.questions) else ''
+
+    def transcript(self):
+        return [
+            {'question': self.question_text(position), 'answer': answer, 'timestamp': timestamp}
+            for position, answer, timestamp in self.answers
+        ]
+
+
+class InterviewSessionStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            interview_id TEXT NOT NULL,
+            role TEXT,
+            adaptive INTEGER NOT NULL,
+            current_question INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS sessions_by_age ON sessions (updated_at);
+        CREATE TABLE IF NOT EXISTS session_questions (
+            session_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            PRIMARY KEY (session_id, position)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS session_answers (
+            session_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            answer TEXT NOT NULL,
+            answered_at TEXT NOT NULL,
+            PRIMARY KEY (session_id, position)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, directory=None, ttl=None, max_cached=1024):
+        directory = directory or os.getenv(
+            'INTERVIEW_SESSION_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-sessions')
+        )
+        os.makedirs(directory, exist_ok=True)
+        self.database = SQLiteDatabase(os.path.join(directory, 'interview_sessions.db'), self.SCHEMA)
+        self.ttl = float(ttl or os.getenv('INTERVIEW_SESSION_TTL', str(24 * 3600)))
+        self.max_cached = max_cached
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self, interview_id, role, questions, adaptive):
+        session_id = secrets.token_urlsafe(18)
+        now = time.time()
+        with self.database.connect() as connection:
+            self._purge_expired(connection, now)
+            connection.execute(
+                'INSERT INTO sessions (session_id, interview_id, role, adaptive, current_question, version, updated_at) '
+                'VALUES (?, ?, ?, ?, 0, 0, ?)',
+                (session_id, interview_id, role, int(adaptive), now)
+            )
+            connection.executemany(
+                'INSERT INTO session_questions (session_id, position, question) VALUES (?, ?, ?)',
+                [(session_id, position, json.dumps(question)) for position, question in enumerate(questions)]
+            )
+        session = InterviewSession(session_id, interview_id, role, adaptive, 0, list(questions), [], 0)
+        self._cache(session)
+        return session
+
+    def get(self, session_id):
+        """The session, or None if it does not exist or has expired"""
+        connection = self.database.connect()
+        row = connection.execute(
+            'SELECT interview_id, role, adaptive, current_question, version FROM sessions '
+            'WHERE session_id = ? AND updated_at >= ?',
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            with self.lock:
+                self.cache.pop(session_id, None)
+            return None
+
+        interview_id, role, adaptive, current_question, version = row
+        with self.lock:
+            cached = self.cache.get(session_id)
+            if cached is not None and cached.version == version:
+                self.cache.move_to_end(session_id)
+                return cached
+
+        questions = [json.loads(question) for (question,) in connection.execute(
+            'SELECT question FROM session_questions WHERE session_id = ? ORDER BY position', (session_id,)
+        )]
+        answers = [tuple(answer) for answer in connection.execute(
+            'SELECT position, answer, answered_at FROM session_answers WHERE session_id = ? ORDER BY position',
+            (session_id,)
+        )]
+        session = InterviewSession(session_id, interview_id, role, bool(adaptive), current_question, questions,
+                                   answers, version)
+        self._cache(session)
+        return session
+
+    def record_answer(self, session, answer):
+        """Store the answer to the current question and move on; returns the updated session.
+
+        The position comes from the database, so a repeated submission from
+        another worker cannot overwrite an earlier answer.
+        """
+        timestamp = datetime.now().isoformat()
+        connection = self.database.connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT current_question, version FROM sessions WHERE session_id = ?', (session.session_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"No interview session {session.session_id}")
+            position, version = row
+            connection.execute(
+                'INSERT OR REPLACE INTO session_answers (session_id, position, answer, answered_at) VALUES (?, ?, ?, ?)',
+                (session.session_id, position, answer, timestamp)
+            )
+            connection.execute(
+                'UPDATE sessions SET current_question = ?, version = ?, updated_at = ? WHERE session_id = ?',
+                (position + 1, version + 1, time.time(), session.session_id)
+            )
+
+        def apply(cached):
+            cached.answers.append((position, answer, timestamp))
+            cached.current_question = position + 1
+
+        return self._apply(session, version, apply)
+
+    def replace_question(self, session, position, question):
+        """Swap in an adapted question before it is asked; returns the updated session"""
+        connection = self.database.connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT version FROM sessions WHERE session_id = ?', (session.session_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"No interview session {session.session_id}")
+            version = row[0]
+            connection.execute(
+                'UPDATE session_questions SET question = ? WHERE session_id = ? AND position = ?',
+                (json.dumps(question), session.session_id, position)
+            )
+            connection.execute(
+                'UPDATE sessions SET version = ?, updated_at = ? WHERE session_id = ?',
+                (version + 1, time.time(), session.session_id)
+            )
+
+        def apply(cached):
+            cached.questions[position] = question
+
+        return self._apply(session, version, apply)
+
+    def delete(self, session_id):
+        with self.database.connect() as connection:
+            for table in ('sessions', 'session_questions', 'session_answers'):
+                connection.execute(f'DELETE FROM {table} WHERE session_id = ?', (session_id,))
+        with self.lock:
+            self.cache.pop(session_id, None)
+
+    def _apply(self, session, version, change):
+        """Apply a committed change to the cached copy if it was current, else reload"""
+        with self.lock:
+            cached = self.cache.get(session.session_id)
+            if cached is not None and cached.version == version:
+                change(cached)
+                cached.version = version + 1
+                return cached
+            self.cache.pop(session.session_id, None)
+        return self.get(session.session_id)
+
+    def _cache(self, session):
+        with self.lock:
+            self.cache[session.session_id] = session
+            self.cache.move_to_end(session.session_id)
+            while len(self.cache) > self.max_cached:
+                self.cache.popitem(last=False)
+
+    def _purge_expired(self, connection, now):
+        expired = [session_id for (session_id,) in connection.execute(
+            'SELECT session_id FROM sessions WHERE updated_at < ?', (now - self.ttl,)
+        )]
+        for table in ('sessions', 'session_questions', 'session_answers'):
+            connection.executemany(f'DELETE FROM {table} WHERE session_id = ?', [(s,) for s in expired])
+        if expired:
+            logger.info("Expired %d interview sessions", len(expired))
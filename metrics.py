@@ -0,0 +1,216 @@
+"""Request and stage latency metrics in the Prometheus text format.
+
+Metrics live in process memory and are rendered by ``render()`` for the
+``/metrics`` endpoint.  Every sample carries a ``worker`` label with the
+process ID: each gunicorn worker counts its own requests, and a scrape reaches
+only one of them, so queries should aggregate over ``worker``, e.g.
+``sum by (endpoint) (rate(talentcore_request_duration_seconds_count[5m]))``.
+
+Handlers time their stages with ``stage``; the endpoint label is taken from
+the current Flask request, or is ``background`` outside of one.  Components
+that already keep counters (response cache, write-behind queue, TTS cache)
+are exported by registering a collector instead of being instrumented twice.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import has_request_context, request
+
+# Seconds; LLM calls dominate, so the buckets reach well past a minute
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """``(name, [(label, value)], value)`` tuples for rendering"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for key, value in values.items():
+            yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        with self.lock:
+            values = {key: dict(state, counts=list(state['counts'])) for key, state in self.values.items()}
+        for key, state in values.items():
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + [('le', _format_value(bound))], cumulative
+            yield f"{self.name}_bucket", labels + [('le', '+Inf')], state['count']
+            yield f"{self.name}_sum", labels, state['sum']
+            yield f"{self.name}_count", labels, state['count']
+
+
+REQUEST_LATENCY = Histogram(
+    'talentcore_request_duration_seconds', 'HTTP request latency', ('endpoint', 'method', 'status')
+)
+STAGE_LATENCY = Histogram(
+    'talentcore_stage_duration_seconds', 'Latency of one stage of a request', ('endpoint', 'stage')
+)
+RETRIES = Counter('talentcore_retries_total', 'Upstream calls retried after a failure', ('endpoint',))
+FALLBACKS = Counter(
+    'talentcore_fallbacks_total', 'Requests answered from a fallback source', ('endpoint', 'fallback')
+)
+LLM_TOKENS = Counter('talentcore_llm_tokens_total', 'Azure OpenAI tokens used', ('endpoint', 'kind'))
+CANCELLED = Counter(
+    'talentcore_requests_cancelled_total', 'Requests abandoned at their deadline or on client disconnect',
+    ('endpoint', 'reason')
+)
+
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'background'
+
+
+@contextmanager
+def stage(name, endpoint=None):
+    """Time the enclosed block as stage ``name`` of the current endpoint"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint or current_endpoint(), stage=name)
+
+
+def record_retry():
+    RETRIES.inc(endpoint=current_endpoint())
+
+
+def record_fallback(fallback):
+    FALLBACKS.inc(endpoint=current_endpoint(), fallback=fallback)
+
+
+def record_cancelled(reason):
+    CANCELLED.inc(endpoint=current_endpoint(), reason=reason)
+
+
+def record_token_usage(usage):
+    """Count the tokens of an OpenAI ``usage`` object; responses without one are skipped"""
+    if usage is None:
+        return
+    endpoint = current_endpoint()
+    LLM_TOKENS.inc(getattr(usage, 'prompt_tokens', 0) or 0, endpoint=endpoint, kind='prompt')
+    LLM_TOKENS.inc(getattr(usage, 'completion_tokens', 0) or 0, endpoint=endpoint, kind='completion')
+
+
+def register_collector(collect):
+    """Export values kept elsewhere.
+
+    ``collect()`` returns ``(name, kind, documentation, [(labels_dict, value)])``
+    tuples and is called on every scrape.
+    """
+    _collectors.append(collect)
+
+
+def instrument_app(app):
+    """Record the latency of every request by endpoint, method and status"""
+    @app.before_request
+    def start_timer():
+        request.environ['talentcore.started'] = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        started = request.environ.get('talentcore.started')
+        if started is not None:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started, endpoint=request.endpoint or 'unmatched',
+                method=request.method, status=response.status_code
+            )
+        return response
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    worker = [('worker', str(os.getpid()))]
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels + worker)} {_format_value(value)}")
+    for collect in _collectors:
+        try:
+            families = list(collect())
+        except Exception as e:
+            lines.append(f"# collector {getattr(collect, '__name__', collect)} failed: {e}")
+            continue
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(sorted(labels.items()) + worker)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,114 @@
+"""One-time migration of stored history to deterministic keys and summary indexes.
+
+Older analyses were stored as ``call-analysis-<time>-<uuid>.json``, so
+finding one meant scanning the whole container.  This rewrites each of them
+under ``analyses/<interview_id>.json`` and adds its summary index entry.
+Q&A sessions keep their blob names; any session missing from the summary
+index gets an entry.
+
+Usage:
+    python migrate_analysis_index.py [--dry-run] [--delete-legacy]
+"""
+import argparse
+import sys
+from dotenv import load_dotenv
+
+from analysis_store import (
+    ANALYSIS_CONTAINER, is_legacy_blob, load_analysis, save_analysis
+)
+from history_index import TIME_INDEX_PREFIX, add_index_entry, key_from_index_name
+from qa_store import QA_CONTAINER, QA_FILTER_FIELDS, is_session_blob, qa_session_summary
+from storage_backends import create_blob_store, decode_json
+
+READ_CHUNK = 64
+
+
+def _with_contents(store, container_name, blobs):
+    """Pair each blob with its decoded contents, reading a chunk at a time in parallel"""
+    for start in range(0, len(blobs), READ_CHUNK):
+        chunk = blobs[start:start + READ_CHUNK]
+        for blob, body in zip(chunk, store.get_many(container_name, [b.name for b in chunk])):
+            yield blob, body
+
+
+def migrate(store, dry_run=False, delete_legacy=False, container_name=ANALYSIS_CONTAINER):
+    migrated = skipped = failed = 0
+
+    # Oldest first, so the newest analysis of a re-analysed interview wins
+    legacy_blobs = sorted(
+        (b for b in store.list(container_name) if is_legacy_blob(b.name)),
+        key=lambda b: b.last_modified
+    )
+    for blob, body in _with_contents(store, container_name, legacy_blobs):
+        try:
+            if body is None:
+                raise ValueError('blob disappeared')
+            data = decode_json(body)
+            interview_id = data.get('interview_id')
+            if not interview_id:
+                print(f"Skipping {blob.name}: no interview_id")
+                skipped += 1
+                continue
+            data.setdefault('timestamp', blob.last_modified.isoformat())
+
+            existing = None if dry_run else load_analysis(store, interview_id, container_name)
+            if existing and existing.get('timestamp', '') > data['timestamp']:
+                print(f"Skipping {blob.name}: newer analysis already stored for {interview_id}")
+                skipped += 1
+            else:
+                print(f"{'Would migrate' if dry_run else 'Migrating'} {blob.name} -> {interview_id}")
+                if not dry_run:
+                    save_analysis(store, data, container_name)
+                migrated += 1
+
+            if delete_legacy and not dry_run:
+                store.delete(container_name, blob.name)
+        except Exception as e:
+            print(f"Error migrating {blob.name}: {e}")
+            failed += 1
+
+    print(f"Migrated {migrated}, skipped {skipped}, failed {failed}")
+    return failed == 0
+
+
+def backfill_qa_index(store, dry_run=False, container_name=QA_CONTAINER):
+    """Add summary index entries for Q&A sessions saved before the index existed"""
+    indexed = {key_from_index_name(b.name) for b in store.list(container_name, TIME_INDEX_PREFIX)}
+    unindexed = [b for b in store.list(container_name) if is_session_blob(b.name) and b.name not in indexed]
+    added = failed = 0
+    for blob, body in _with_contents(store, container_name, unindexed):
+        try:
+            if body is None:
+                raise ValueError('blob disappeared')
+            data = decode_json(body)
+            data.setdefault('timestamp', blob.last_modified.isoformat())
+            summary = qa_session_summary(data)
+            print(f"{'Would index' if dry_run else 'Indexing'} {blob.name}")
+            if not dry_run:
+                add_index_entry(store, container_name, blob.name, summary['timestamp'], summary, QA_FILTER_FIELDS)
+            added += 1
+        except Exception as e:
+            print(f"Error indexing {blob.name}: {e}")
+            failed += 1
+
+    print(f"Indexed {added} Q&A sessions, failed {failed}")
+    return failed == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help='report what would be migrated without writing')
+    parser.add_argument('--delete-legacy', action='store_true', help='delete legacy blobs after migrating them')
+    args = parser.parse_args()
+
+    load_dotenv()
+    store = create_blob_store()
+    if not store:
+        return 1
+    analyses_ok = migrate(store, args.dry_run, args.delete_legacy)
+    qa_ok = backfill_qa_index(store, args.dry_run)
+    return 0 if analyses_ok and qa_ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""Write-behind persistence for Azure Blob and Firestore writes.
+
+Requests hand their writes to ``WriteBehindQueue.enqueue`` and return as soon
+as the result is computed.  Every job is first written to a local spool
+directory, so a crash before the flush loses nothing: on start-up the spools
+of dead processes are claimed and replayed.  A process never replays its own
+directory, whose files are still being flushed by its own queue.  A background thread drains the
+bounded in-memory queue in batches, grouping jobs by kind so handlers can use
+batched APIs such as Firestore write batches; when a batch fails its jobs are
+written one by one, so a bad payload does not hold back the rest.
+
+Nothing touches the spool until ``start()``, which ``enqueue`` calls on first
+use, so importing the app creates no directories.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot spool value of type {type(value).__name__}")
+
+
+def _decode(obj):
+    if '__datetime__' in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehindQueue:
+    """Bounded queue of persistence jobs flushed by a background thread.
+
+    Handlers are registered per job kind and receive a list of payloads.  When
+    the queue is full the job is written inline instead, so memory stays
+    bounded without dropping anything.
+    """
+
+    def __init__(self, spool_dir=None, maxsize=1000, batch_size=50, flush_interval=0.5):
+        self.spool_root = spool_dir or os.getenv(
+            'PERSISTENCE_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-spool')
+        )
+        self.spool_dir = None
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.handlers = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.stats = {
+            'enqueued': 0,
+            'flushed': 0,
+            'failed': 0,
+            'retried': 0,
+            'inline_writes': 0,
+            'batches': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Create this process's spool, replay orphaned spool files and start the flusher thread"""
+        if self.thread:
+            return
+        with self.lock:
+            if self.thread:
+                return
+            spool_dir = os.path.join(self.spool_root, str(os.getpid()))
+            # A directory already named after this PID was left by an earlier process
+            # that had the same PID; set it aside so recovery replays it
+            if os.path.isdir(spool_dir):
+                os.replace(spool_dir, f"{spool_dir}.{time.time_ns()}")
+            os.makedirs(spool_dir, exist_ok=True)
+            self.spool_dir = spool_dir
+            self.thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self.thread.start()
+        # Recovered jobs may exceed the queue size, so they are fed in while it drains
+        threading.Thread(target=self._recover_spool, name='write-behind-recovery', daemon=True).start()
+        atexit.register(self.stop)
+
+    def enqueue(self, kind, payload):
+        """Durably record a write and return without waiting for it"""
+        if kind not in self.handlers:
+            raise ValueError(f"No persistence handler for {kind}")
+        self.start()
+        job = {'id': uuid.uuid4().hex, 'kind': kind, 'payload': payload, 'attempts': 0}
+        job['path'] = self._spool(job)
+        with self.lock:
+            self.stats['enqueued'] += 1
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            # Backpressure: persist on the caller's thread rather than grow memory
+            with self.lock:
+                self.stats['inline_writes'] += 1
+            self._flush([job])
+        return job['id']
+
+    def _spool(self, job):
+        path = os.path.join(self.spool_dir, f"{time.time_ns()}-{job['id']}.json")
+        tmp_path = path + '.part'
+        record = {k: v for k, v in job.items() if k != 'path'}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, default=_encode)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    def _recover_spool(self):
+        """Claim spool files left behind by dead processes"""
+        recovered = 0
+        for name in sorted(os.listdir(self.spool_root)):
+            directory = os.path.join(self.spool_root, name)
+            pid, _, set_aside = name.partition('.')
+            if not os.path.isdir(directory) or not pid.isdigit() or directory == self.spool_dir:
+                continue
+            if not set_aside and _process_alive(int(pid)):
+                continue
+            try:
+                filenames = sorted(os.listdir(directory))
+            except FileNotFoundError:
+                # Emptied and removed by another worker
+                continue
+            for filename in filenames:
+                if not filename.endswith('.json'):
+                    continue
+                source = os.path.join(directory, filename)
+                target = os.path.join(self.spool_dir, filename)
+                try:
+                    # rename is atomic, so only one worker claims each job
+                    if source != target:
+                        os.replace(source, target)
+                    with open(target, encoding='utf-8') as f:
+                        job = json.load(f, object_hook=_decode)
+                except FileNotFoundError:
+                    # Claimed by another worker first
+                    continue
+                except (OSError, ValueError) as e:
+                    logger.error("Could not recover spooled job %s: %s", filename, e)
+                    continue
+                job['path'] = target
+                self.queue.put(job)
+                recovered += 1
+            try:
+                os.rmdir(directory)
+            except OSError:
+                # Another worker is claiming from it too, or a partial write remains
+                pass
+        if recovered:
+            logger.info("Recovered %d spooled persistence jobs", recovered)
+
+    def _run(self):
+        while not self.stopping.is_set() or not self.queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, jobs):
+        started = time.perf_counter()
+        by_kind = {}
+        for job in jobs:
+            by_kind.setdefault(job['kind'], []).append(job)
+
+        for kind, kind_jobs in by_kind.items():
+            self._write(kind, kind_jobs)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.stats['batches'] += 1
+            self.stats['last_flush_ms'] = elapsed_ms
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed_ms)
+            self.stats['total_flush_ms'] += elapsed_ms
+
+    def _write(self, kind, jobs):
+        try:
+            self.handlers[kind]([job['payload'] for job in jobs])
+        except Exception as e:
+            if len(jobs) > 1:
+                # Handlers are idempotent, so jobs the failed batch did write are safely written again
+                logger.warning("Write-behind flush of %d %s jobs failed, writing them one by one: %s",
+                               len(jobs), kind, e)
+                for job in jobs:
+                    self._write(kind, [job])
+                return
+            logger.warning("Write-behind flush of %s job %s failed: %s", kind, jobs[0]['id'], e)
+            self._retry_later(jobs)
+            return
+        for job in jobs:
+            self._remove_spool(job)
+        with self.lock:
+            self.stats['flushed'] += len(jobs)
+
+    def _retry_later(self, jobs):
+        for job in jobs:
+            job['attempts'] += 1
+            if job['attempts'] >= MAX_ATTEMPTS:
+                # Left in the spool directory; replayed on the next start-up
+                logger.error("Giving up on %s job %s after %d attempts", job['kind'], job['id'], job['attempts'])
+                with self.lock:
+                    self.stats['failed'] += 1
+                continue
+            with self.lock:
+                self.stats['retried'] += 1
+            delay = min(2 ** job['attempts'], 30)
+            timer = threading.Timer(delay, self._requeue, args=(job,))
+            timer.daemon = True
+            timer.start()
+
+    def _requeue(self, job):
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            self._flush([job])
+
+    def _remove_spool(self, job):
+        try:
+            os.remove(job['path'])
+        except OSError:
+            pass
+
+    def metrics(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['queue_capacity'] = self.queue.maxsize
+        stats['avg_flush_ms'] = stats['total_flush_ms'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def stop(self, timeout=10):
+        """Drain the queue before the process exits"""
+        if not self.thread:
+            return
+        self.stopping.set()
+        self.thread.join(timeout)
@@ -0,0 +1,57 @@
+"""Q&A session storage in a blob store with a summary index"""
+import uuid
+from datetime import datetime
+
+from history_index import add_index_entry, is_index_blob, page_index_entries
+
+QA_CONTAINER = "qa-history"
+QA_FILTER_FIELDS = ('experience_level', 'skill_level', 'question_type')
+
+
+def qa_session_summary(data):
+    """Fields shown in the Q&A history list"""
+    return {
+        'experience_level': data.get('experience_level', ''),
+        'skill_level': data.get('skill_level', ''),
+        'question_type': data.get('question_type', ''),
+        'question_count': len(data.get('questions', [])),
+        'timestamp': data.get('timestamp')
+    }
+
+
+def new_qa_blob_name():
+    return f"qa-session-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{str(uuid.uuid4())[:8]}.json"
+
+
+def save_qa_session(store, data, blob_name=None, container_name=QA_CONTAINER):
+    """Upload a Q&A session and add it to the summary index"""
+    blob_name = blob_name or new_qa_blob_name()
+
+    store.ensure_container(container_name)
+    store.put_json(container_name, blob_name, data)
+
+    summary = qa_session_summary(data)
+    add_index_entry(store, container_name, blob_name, summary['timestamp'], summary, QA_FILTER_FIELDS)
+    return blob_name
+
+
+def load_qa_session(store, blob_name, container_name=QA_CONTAINER):
+    """Session data; None when it does not exist"""
+    return store.get_json(container_name, blob_name)
+
+
+def page_qa_summaries(store, limit=20, cursor=None, filters=None,
+                      date_from=None, date_to=None, container_name=QA_CONTAINER):
+    """One page of Q&A session summaries, newest first, read from the index only"""
+    filters = {name: value for name, value in (filters or {}).items() if name in QA_FILTER_FIELDS}
+    entries, next_cursor = page_index_entries(
+        store, container_name, limit, cursor, filters, date_from, date_to
+    )
+    for entry in entries:
+        entry['session_id'] = entry.pop('key')
+        entry['question_count'] = int(entry.get('question_count') or 0)
+    return entries, next_cursor
+
+
+def is_session_blob(blob_name):
+    return not is_index_blob(blob_name)
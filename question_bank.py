@@ -0,0 +1,186 @@
+"""Pre-generated question banks for the roles of the catalog.
+
+``build_question_bank.py`` generates a bank of questions for every catalog
+role, experience band, skill level and question type ahead of time and
+writes each to a SQLite file (``QUESTION_BANK_PATH``) keyed by those four
+fields.  ``/generate-qa`` answers from the bank when the request names a
+catalog role, either with ``role`` or with a job description that is the
+role's title or catalog description; custom job descriptions are still
+generated live.
+
+Experience is free text in the form ("2 years", "Senior"), so it is mapped
+to one of the bands in ``EXPERIENCE_BANDS`` first.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from storage_backends import SQLiteDatabase, decode_json, encode_json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CATALOG = os.path.join(HERE, 'role_catalog.json')
+DEFAULT_BANK_PATH = os.path.join('data', 'question_bank.db')
+
+# Band name and the experience description used in its prompt
+EXPERIENCE_BANDS = {
+    'junior': 'Junior (0-2 years)',
+    'mid': 'Mid-level (2-5 years)',
+    'senior': 'Senior (5-10 years)',
+    'principal': 'Principal / Staff (10+ years)'
+}
+SKILL_LEVELS = ('beginner', 'intermediate', 'advanced', 'expert')
+QUESTION_TYPES = (
+    'technical', 'technical-scenario', 'technical-coding', 'behavioral',
+    'competency-based', 'situational', 'skill-based', 'mixed'
+)
+
+_BAND_WORDS = (
+    ('principal', ('principal', 'staff', 'distinguished', 'architect', 'director', 'head of')),
+    ('senior', ('senior', 'sr', 'lead', 'manager')),
+    ('mid', ('mid', 'intermediate', 'associate')),
+    ('junior', ('junior', 'jr', 'entry', 'graduate', 'fresher', 'intern', 'trainee'))
+)
+
+
+def experience_band(experience_level):
+    """The band for free-text experience such as "5+ years" or "Senior"; None if unclear
+
+    An explicit band word wins over years, and a range is read by its lower bound:
+
+    >>> [experience_band(text) for text in ('2-5 years', '0-2 years', '10+ years', '3 yrs')]
+    ['mid', 'junior', 'principal', 'mid']
+    >>> [experience_band(text) for text in ('Junior (0-2 years)', 'Mid-level (2-5 years)', 'Senior (5-10 years)')]
+    ['junior', 'mid', 'senior']
+    >>> experience_band('some experience') is None
+    True
+    """
+    text = (experience_level or '').lower()
+    if text in EXPERIENCE_BANDS:
+        return text
+    words = set(re.findall(r'[a-z]+', text))
+    for band, markers in _BAND_WORDS:
+        if any((marker in text) if ' ' in marker else (marker in words) for marker in markers):
+            return band
+    years = re.search(r'(\d+(?:\.\d+)?)\s*(?:(?:-|\u2013|to)\s*\d+(?:\.\d+)?)?\s*\+?\s*(?:years?|yrs?)', text)
+    if years:
+        years = float(years.group(1))
+        if years < 2:
+            return 'junior'
+        if years < 5:
+            return 'mid'
+        if years < 10:
+            return 'senior'
+        return 'principal'
+    return None
+
+
+def _normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def load_catalog(path=None):
+    with open(path or os.getenv('QUESTION_BANK_CATALOG', DEFAULT_CATALOG), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class QuestionBank:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS banks (
+            role TEXT NOT NULL,
+            experience TEXT NOT NULL,
+            skill_level TEXT NOT NULL,
+            question_type TEXT NOT NULL,
+            questions BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (role, experience, skill_level, question_type)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path=None, catalog=None):
+        self.path = path or os.getenv('QUESTION_BANK_PATH', DEFAULT_BANK_PATH)
+        self.catalog = catalog if catalog is not None else load_catalog()
+        # Catalog lookups by slug, title and description, all normalised
+        self.roles = {}
+        for role in self.catalog:
+            for text in (role['slug'], role['title'], role['description']):
+                self.roles[_normalize(text)] = role
+        self._database = None
+        self.lock = threading.Lock()
+
+    @property
+    def database(self):
+        """The bank's database, or None until a bank has been built"""
+        if self._database is None:
+            with self.lock:
+                if self._database is None and os.path.exists(self.path):
+                    self._database = SQLiteDatabase(self.path, self.SCHEMA)
+        return self._database
+
+    def create(self):
+        """Open the bank for writing, creating the file if needed"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            if self._database is None:
+                self._database = SQLiteDatabase(self.path, self.SCHEMA)
+        return self
+
+    def catalog_role(self, job_description, role=None):
+        """The catalog role a request asks for; None for a custom job description"""
+        if role:
+            match = self.roles.get(_normalize(role))
+            description = _normalize(job_description)
+            # A JD edited away from the catalog text is custom, even with a role picked
+            if match and (not description or self.roles.get(description) is match):
+                return match
+            return None
+        return self.roles.get(_normalize(job_description))
+
+    def get(self, role_slug, experience, skill_level, question_type):
+        database = self.database
+        if database is None:
+            return None
+        try:
+            row = database.connect().execute(
+                'SELECT questions FROM banks WHERE role = ? AND experience = ? AND skill_level = ? AND question_type = ?',
+                (role_slug, experience, skill_level, question_type)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return decode_json(row[0]) if row else None
+
+    def lookup(self, job_description, experience_level, skill_level, question_type, role=None):
+        """``(catalog role, questions)`` for a request the bank can answer, else None"""
+        match = self.catalog_role(job_description, role)
+        band = experience_band(experience_level)
+        if match is None or band is None:
+            return None
+        questions = self.get(match['slug'], band, (skill_level or '').lower(), (question_type or '').lower())
+        return (match, questions) if questions else None
+
+    def put(self, role_slug, experience, skill_level, question_type, questions):
+        with self.database.connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO banks (role, experience, skill_level, question_type, questions, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (role_slug, experience, skill_level, question_type, encode_json(questions)[0], time.time())
+            )
+
+    def built_keys(self):
+        """Keys already in the bank, so an interrupted build resumes where it stopped"""
+        if self.database is None:
+            return set()
+        return set(self.database.connect().execute(
+            'SELECT role, experience, skill_level, question_type FROM banks'
+        ).fetchall())
+
+    def stats(self):
+        if self.database is None:
+            return {'banks': 0, 'roles': 0}
+        banks, roles = self.database.connect().execute(
+            'SELECT COUNT(*), COUNT(DISTINCT role) FROM banks'
+        ).fetchone()
+        return {'banks': banks, 'roles': roles}
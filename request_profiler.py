@@ -0,0 +1,283 @@
+"""On-demand profiling of individual production requests.
+
+A request is profiled when it carries ``X-Profile: cprofile`` or
+``X-Profile: sample`` together with ``X-Profile-Token`` matching
+``PROFILE_ADMIN_TOKEN``, or when it is picked at random with probability
+``PROFILE_SAMPLE_RATE`` (optionally only for the endpoints listed in
+``PROFILE_ENDPOINTS``).
+
+Two profilers are available:
+
+* ``sample``: a background thread records the request thread's stack every
+  few milliseconds; cheap enough for random sampling.  The output is in the
+  folded-stack format read by flamegraph.pl and speedscope.
+* ``cprofile``: deterministic cProfile, written as a pstats file.  It slows
+  the request down noticeably, so it is only run on explicit request and at
+  most once at a time per process.
+
+Under gevent (``SERVING_MODE=gevent``) requests are greenlets, which the stack
+sampler cannot see, so random sampling is off and an explicit ``sample``
+request runs cProfile instead.
+
+Profiles are written to ``PROFILE_DIR`` under a server-generated ID, returned
+in ``X-Profile-Id``, with a small JSON summary next to each that also records
+the client's ``X-Request-ID``; only the newest ``PROFILE_MAX`` are kept.  The
+directory can be shared by all workers of a host.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import abort, jsonify, request, send_file
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sample', 'cprofile')
+PROFILE_EXTENSIONS = {'sample': 'folded', 'cprofile': 'prof'}
+SAMPLE_INTERVAL = 0.005
+
+
+def _threads_are_greenlets():
+    """True when gevent has monkey-patched threading, so thread idents name greenlets"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a helper thread"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    def __init__(self, profile_dir=None, sample_rate=None, admin_token=None, endpoints=None, max_profiles=None):
+        self.profile_dir = profile_dir or os.getenv(
+            'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-profiles')
+        )
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.sample_rate = float(sample_rate if sample_rate is not None else os.getenv('PROFILE_SAMPLE_RATE', '0'))
+        self.admin_token = admin_token if admin_token is not None else os.getenv('PROFILE_ADMIN_TOKEN', '')
+        if endpoints is None:
+            endpoints = [e for e in os.getenv('PROFILE_ENDPOINTS', '').split(',') if e.strip()]
+        self.endpoints = {e.strip() for e in endpoints}
+        self.max_profiles = int(max_profiles or os.getenv('PROFILE_MAX', '200'))
+        # Only one deterministic profiler may run per process on Python 3.12+
+        self.cprofile_lock = threading.Lock()
+        self.greenlets = _threads_are_greenlets()
+        if self.greenlets and self.sample_rate:
+            logger.warning("Stack sampling does not work under gevent; PROFILE_SAMPLE_RATE is ignored")
+
+    def is_admin(self):
+        token = request.headers.get('X-Profile-Token', '')
+        return bool(self.admin_token) and hmac.compare_digest(token, self.admin_token)
+
+    def _requested_mode(self):
+        mode = (request.headers.get('X-Profile') or '').lower()
+        if mode in PROFILE_MODES and self.is_admin():
+            # The sampler only sees OS threads; a greenlet's stack is never among them
+            return 'cprofile' if self.greenlets else mode
+        if self.greenlets:
+            return None
+        if self.sample_rate and (not self.endpoints or request.endpoint in self.endpoints):
+            if random.random() < self.sample_rate:
+                return 'sample'
+        return None
+
+    def start(self):
+        """Begin profiling the current request if it was asked for or sampled"""
+        mode = self._requested_mode()
+        if mode is None:
+            return
+        if mode == 'cprofile' and not self.cprofile_lock.acquire(blocking=False):
+            if self.greenlets:
+                logger.info("Not profiling %s: another cProfile run is active", request.path)
+                return
+            # Another cProfile run is active; a stack sample is still useful
+            mode = 'sample'
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident())
+            profiler.start()
+        # Client request IDs need not be unique, so profiles get their own
+        request.environ['talentcore.profile'] = {
+            'id': uuid.uuid4().hex[:16],
+            'request_id': request.headers.get('X-Request-ID'),
+            'mode': mode,
+            'profiler': profiler,
+            'started': time.perf_counter()
+        }
+
+    def finish(self, response):
+        """Stop the profiler, write the profile and tag the response with its ID"""
+        state = request.environ.pop('talentcore.profile', None)
+        if state is None:
+            return response
+        profiler = state['profiler']
+        self._stop(state)
+
+        profile_id = state['id']
+        try:
+            path = os.path.join(self.profile_dir, f"{profile_id}.{PROFILE_EXTENSIONS[state['mode']]}")
+            if state['mode'] == 'cprofile':
+                profiler.dump_stats(path)
+            else:
+                profiler.write(path)
+            summary = {
+                'id': profile_id,
+                'request_id': state['request_id'],
+                'mode': state['mode'],
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - state['started']) * 1000, 1),
+                'timestamp': datetime.now().isoformat(),
+                'pid': os.getpid()
+            }
+            with open(os.path.join(self.profile_dir, f"{profile_id}.json"), 'w', encoding='utf-8') as f:
+                json.dump(summary, f)
+            self._prune()
+            response.headers['X-Profile-Id'] = profile_id
+        except OSError as e:
+            logger.error("Could not write profile %s: %s", profile_id, e)
+        return response
+
+    def profile_id(self):
+        """ID of the profile being taken of the current request, for its log lines; None if not profiled"""
+        state = request.environ.get('talentcore.profile')
+        return state['id'] if state else None
+
+    def abandon(self, error=None):
+        """Stop a profiler left running by a request that failed before ``finish``"""
+        state = request.environ.pop('talentcore.profile', None)
+        if state is not None:
+            self._stop(state)
+
+    def _stop(self, state):
+        if state['mode'] == 'cprofile':
+            state['profiler'].disable()
+            self.cprofile_lock.release()
+        else:
+            state['profiler'].stop()
+
+    def _prune(self):
+        summaries = []
+        for entry in os.scandir(self.profile_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    summaries.append((entry.stat().st_mtime, entry.name))
+                except FileNotFoundError:
+                    # Pruned by another worker sharing the directory
+                    continue
+        summaries.sort(reverse=True)
+        for _, name in summaries[self.max_profiles:]:
+            profile_id = name[:-len('.json')]
+            for extension in ('json',) + tuple(PROFILE_EXTENSIONS.values()):
+                try:
+                    os.remove(os.path.join(self.profile_dir, f"{profile_id}.{extension}"))
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, limit=50):
+        """Summaries of the newest profiles"""
+        summaries = []
+        for entry in os.scandir(self.profile_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                with open(entry.path, encoding='utf-8') as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        summaries.sort(key=lambda summary: summary['timestamp'], reverse=True)
+        return summaries[:limit]
+
+    def path_for(self, profile_id):
+        """Profile file of ``profile_id`` and its mode; None when there is none"""
+        if not profile_id.replace('-', '').replace('_', '').isalnum():
+            return None, None
+        for mode, extension in PROFILE_EXTENSIONS.items():
+            path = os.path.join(self.profile_dir, f"{profile_id}.{extension}")
+            if os.path.exists(path):
+                return path, mode
+        return None, None
+
+    def install(self, app):
+        """Hook the profiler into ``app`` and add the admin endpoints"""
+        app.before_request(self.start)
+        app.after_request(self.finish)
+        app.teardown_request(self.abandon)
+
+        @app.route('/api/profiles')
+        def list_profiles():
+            if not self.is_admin():
+                abort(403)
+            limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+            return jsonify({'profiles': self.recent(limit)})
+
+        @app.route('/api/profiles/<profile_id>')
+        def download_profile(profile_id):
+            """The raw profile, or with ``?format=text`` the top functions by cumulative time"""
+            if not self.is_admin():
+                abort(403)
+            path, mode = self.path_for(profile_id)
+            if path is None:
+                abort(404)
+            if mode == 'cprofile' and request.args.get('format') == 'text':
+                import io
+                import pstats
+
+                output = io.StringIO()
+                pstats.Stats(path, stream=output).sort_stats('cumulative').print_stats(
+                    request.args.get('limit', 60, type=int)
+                )
+                return app.response_class(output.getvalue(), mimetype='text/plain')
+            mimetype = 'text/plain' if mode == 'sample' else 'application/octet-stream'
+            return send_file(path, mimetype=mimetype, as_attachment=True, download_name=os.path.basename(path))
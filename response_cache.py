@@ -0,0 +1,182 @@
+"""In-process response cache for read-heavy GET endpoints.
+
+Responses are cached per URL for a short TTL.  Once an entry is older than
+its TTL it is still served for a while (stale-while-revalidate) while a
+background worker regenerates it, so readers never wait on the remote
+store after the first request.  Every cached response carries an ETag and
+``Cache-Control: no-cache``: browsers revalidate on each view and get a 304
+without a body when nothing changed.
+
+Entries are tagged with the data they depend on; writes call ``invalidate``
+with those tags so the next read is fresh.  The write is often flushed by a
+different worker than the one serving the next read, so each tag's
+generation is kept in a SQLite file under ``RESPONSE_CACHE_DIR`` shared by
+the workers of a host, and every lookup checks it: an entry built before
+the latest invalidation on any worker is never served, not even as stale.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from flask import current_app, request
+
+from storage_backends import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    def __init__(self, body, mimetype, tags, generation, ttl, stale_ttl):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.tags = tags
+        self.generation = generation
+        self.created_at = time.monotonic()
+        self.fresh_until = self.created_at + ttl
+        self.stale_until = self.fresh_until + stale_ttl
+
+
+class ResponseCache:
+    """LRU of successful GET responses keyed by path and query string"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS generations (
+            tag TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, max_entries=512, max_workers=2, directory=None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.refreshing = set()
+        self.directory = directory or os.getenv(
+            'RESPONSE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-cache')
+        )
+        self._database = None
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cache-refresh')
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0}
+
+    def cached(self, ttl, stale_ttl=300, tags=()):
+        """Decorator for a GET view whose output only depends on its URL"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = request.full_path
+                generation = self._generation(tags)
+                now = time.monotonic()
+                with self.lock:
+                    entry = self.entries.get(key)
+                    if entry and entry.generation != generation:
+                        # Invalidated since it was built, possibly by another worker
+                        del self.entries[key]
+                        entry = None
+                    if entry and now < entry.stale_until:
+                        self.entries.move_to_end(key)
+                        if now < entry.fresh_until:
+                            self.stats['hits'] += 1
+                            state = 'HIT'
+                        else:
+                            self.stats['stale_hits'] += 1
+                            state = 'STALE'
+                            if key not in self.refreshing:
+                                self.refreshing.add(key)
+                                self.executor.submit(
+                                    self._refresh, current_app._get_current_object(), key, request.path,
+                                    request.query_string, view, args, kwargs, tags, ttl, stale_ttl
+                                )
+                    else:
+                        entry = None
+                        self.stats['misses'] += 1
+                        state = 'MISS'
+
+                if entry is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    entry = self._store(key, response, tags, ttl, stale_ttl, generation)
+                    if entry is None:
+                        return response
+                return self._respond(entry, state)
+            return wrapper
+        return decorator
+
+    @property
+    def database(self):
+        # Opened on first use so importing the app creates no files
+        if self._database is None:
+            with self.lock:
+                if self._database is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._database = SQLiteDatabase(os.path.join(self.directory, 'response_cache.db'), self.SCHEMA)
+        return self._database
+
+    def _generation(self, tags):
+        """Current generation of each tag, shared by every worker"""
+        if not tags:
+            return ()
+        rows = dict(self.database.connect().execute(
+            f"SELECT tag, generation FROM generations WHERE tag IN ({', '.join('?' * len(tags))})", tuple(tags)
+        ).fetchall())
+        return tuple(rows.get(tag, 0) for tag in tags)
+
+    def _store(self, key, response, tags, ttl, stale_ttl, generation):
+        """Cache a successful response unless its tags were invalidated while it was built"""
+        if response.status_code != 200 or response.direct_passthrough:
+            return None
+        entry = CachedResponse(response.get_data(), response.mimetype, tags, generation, ttl, stale_ttl)
+        if self._generation(tags) != generation:
+            return entry
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def _refresh(self, app, key, path, query_string, view, args, kwargs, tags, ttl, stale_ttl):
+        try:
+            generation = self._generation(tags)
+            with app.test_request_context(path, query_string=query_string):
+                response = app.make_response(view(*args, **kwargs))
+            self._store(key, response, tags, ttl, stale_ttl, generation)
+        except Exception as e:
+            logger.warning("Cache refresh of %s failed: %s", key, e)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def _respond(self, entry, state):
+        response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Cache'] = state
+        response.make_conditional(request)
+        if response.status_code == 304:
+            with self.lock:
+                self.stats['not_modified'] += 1
+        return response
+
+    def invalidate(self, *tags):
+        """Drop entries that depend on any of ``tags``, in every worker"""
+        with self.database.connect() as connection:
+            connection.executemany(
+                'INSERT INTO generations (tag, generation) VALUES (?, 1) '
+                'ON CONFLICT (tag) DO UPDATE SET generation = generation + 1',
+                [(tag,) for tag in tags]
+            )
+        with self.lock:
+            stale_keys = [key for key, entry in self.entries.items() if set(entry.tags) & set(tags)]
+            for key in stale_keys:
+                del self.entries[key]
+            self.stats['invalidations'] += 1
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries))
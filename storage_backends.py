@@ -0,0 +1,744 @@
+"""Pluggable storage backends.
+
+The app talks to two kinds of storage:
+
+* a blob store: named objects with small metadata and queryable tags,
+  grouped in containers (Azure Blob Storage in production);
+* a document store: JSON documents grouped in collections, queryable by
+  field (Firestore in production).
+
+Both have a local implementation on SQLite and the filesystem, so the whole
+app runs and can be benchmarked on a single machine.  ``STORAGE_BACKEND``
+selects ``azure`` (default) or ``local``; ``LOCAL_STORAGE_DIR`` sets where the
+local backend keeps its files.
+
+Bulk blob operations run on one bounded thread pool shared by every store
+(``BLOB_IO_WORKERS``), and JSON blobs are gzip-compressed transparently.
+Azure and Firestore calls made while serving a request are bounded by what
+is left of its deadline.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import contextvars
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import deadlines
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCAL_STORAGE_DIR = os.path.join('data', 'storage')
+FIRESTORE_BATCH_LIMIT = 500
+# Longest single storage call while serving a request
+STORAGE_CALL_TIMEOUT = 30
+# Azure Storage backs off 15 s or more before a retry; with less time left there is none
+BLOB_RETRY_HEADROOM = 30
+
+# JSON smaller than this is stored as is; gzip would not pay for itself
+COMPRESSION_THRESHOLD = 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+_io_executor = None
+_io_executor_lock = threading.Lock()
+
+
+def io_executor():
+    """Bounded pool for parallel blob I/O, created on first use"""
+    global _io_executor
+    with _io_executor_lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('BLOB_IO_WORKERS', '16')), thread_name_prefix='blob-io'
+            )
+        return _io_executor
+
+
+def io_map(fn, items):
+    """``[fn(item) for item in items]`` on the blob I/O pool.
+
+    Each call runs in a copy of the caller's context, so the request deadline
+    applies on the pool threads too.  The pool refuses work once the
+    interpreter has begun shutting down; the write-behind queue still flushes
+    then, so the items are handled inline.
+    """
+    items = list(items)
+    try:
+        futures = [io_executor().submit(contextvars.copy_context().run, fn, item) for item in items]
+    except RuntimeError:
+        return [fn(item) for item in items]
+    return [future.result() for future in futures]
+
+
+def encode_json(data):
+    """JSON bytes, gzipped when large enough; returns ``(body, content_encoding)``"""
+    body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    if len(body) < COMPRESSION_THRESHOLD:
+        return body, None
+    return gzip.compress(body, compresslevel=6), 'gzip'
+
+
+def decode_json(body):
+    """Inverse of ``encode_json``; plain JSON blobs written before compression still load"""
+    if body[:2] == GZIP_MAGIC:
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+# ``metadata`` is None when a listing does not include it
+StoredObject = namedtuple('StoredObject', ['name', 'metadata', 'last_modified'])
+
+QUERY_OPERATORS = ('==', '>=', '>', '<=', '<')
+
+
+def _call_options():
+    """``timeout`` for a Firestore call: the rest of the request's deadline, none outside a request"""
+    if deadlines.current() is None:
+        return {}
+    return {'timeout': deadlines.timeout(STORAGE_CALL_TIMEOUT)}
+
+
+def _blob_call_options():
+    """Timeouts for an Azure Storage call from the rest of the request's deadline.
+
+    ``timeout`` is only the server-side operation timeout, so the client's
+    connect and per-read socket timeouts are bounded as well, and the SDK's
+    own retries are skipped when its back-off alone would outlast the deadline.
+    """
+    if deadlines.current() is None:
+        return {}
+    remaining = deadlines.timeout(STORAGE_CALL_TIMEOUT)
+    options = {
+        # The server timeout takes whole seconds
+        'timeout': max(1, int(remaining)),
+        'connection_timeout': remaining,
+        'read_timeout': remaining
+    }
+    if deadlines.current().remaining() < BLOB_RETRY_HEADROOM:
+        options['retry_total'] = 0
+    return options
+
+
+def _check_conditions(conditions):
+    for field, operator, _ in conditions:
+        if operator not in QUERY_OPERATORS:
+            raise ValueError(f"Unsupported operator {operator!r} on {field}")
+
+
+class BlobStore:
+    """Interface of the blob stores.
+
+    Conditions are ``(tag, operator, value)`` tuples using the operators in
+    ``QUERY_OPERATORS``; listings and queries return objects in name order
+    and page with an opaque cursor.
+    """
+
+    def ensure_container(self, container):
+        pass
+
+    def put(self, container, name, data, metadata=None, tags=None, content_encoding=None):
+        raise NotImplementedError
+
+    def get(self, container, name):
+        """Object contents, or None when it does not exist"""
+        raise NotImplementedError
+
+    def put_json(self, container, name, data, metadata=None, tags=None):
+        body, content_encoding = encode_json(data)
+        self.put(container, name, body, metadata, tags, content_encoding)
+
+    def get_json(self, container, name):
+        """Decoded JSON object, or None when it does not exist"""
+        body = self.get(container, name)
+        return decode_json(body) if body is not None else None
+
+    def get_many(self, container, names):
+        """Contents of several objects, read in parallel; None for missing ones"""
+        return io_map(lambda name: self.get(container, name), names)
+
+    def get_json_many(self, container, names):
+        return [decode_json(body) if body is not None else None for body in self.get_many(container, names)]
+
+    def get_metadata_many(self, container, names):
+        return io_map(lambda name: self.get_metadata(container, name), names)
+
+    def get_metadata(self, container, name):
+        """Object metadata, or None when it does not exist"""
+        raise NotImplementedError
+
+    def delete(self, container, name):
+        raise NotImplementedError
+
+    def list_page(self, container, prefix='', limit=100, cursor=None):
+        """One page of objects under ``prefix`` and the cursor of the next page"""
+        raise NotImplementedError
+
+    def query_page(self, container, conditions, limit=100, cursor=None):
+        """One page of objects whose tags match every condition"""
+        raise NotImplementedError
+
+    def list(self, container, prefix=''):
+        cursor = None
+        while True:
+            objects, cursor = self.list_page(container, prefix, cursor=cursor)
+            yield from objects
+            if not cursor:
+                return
+
+    def put_many(self, container, items):
+        """Write ``(name, data, metadata, tags)`` tuples in parallel"""
+        io_map(lambda item: self.put(container, *item), items)
+
+    def delete_many(self, container, names):
+        io_map(lambda name: self.delete(container, name), names)
+
+
+class DocumentStore:
+    """Interface of the document stores.
+
+    Conditions are ``(field, operator, value)`` tuples; ``start_after`` is
+    the ID of the last document of the previous page.
+    """
+
+    def get(self, collection, doc_id):
+        """Document data, or None when it does not exist"""
+        raise NotImplementedError
+
+    def set(self, collection, doc_id, data):
+        raise NotImplementedError
+
+    def add(self, collection, data):
+        import uuid
+
+        doc_id = uuid.uuid4().hex
+        self.set(collection, doc_id, data)
+        return doc_id
+
+    def update(self, collection, doc_id, fields):
+        raise NotImplementedError
+
+    def transform(self, collection, doc_id, fn):
+        """Atomically replace a document with ``fn(current data or None)``; returns the new data"""
+        raise NotImplementedError
+
+    def transform_many(self, refs, fn):
+        """Atomically replace the ``(collection, doc_id)`` documents with ``fn(list of current data)``"""
+        raise NotImplementedError
+
+    def query(self, collection, conditions=(), order_by=None, descending=False, limit=None, start_after=None):
+        """List of ``(doc_id, data)`` matching every condition"""
+        raise NotImplementedError
+
+    def set_many(self, writes):
+        """Write ``(collection, doc_id, data)`` tuples"""
+        for collection, doc_id, data in writes:
+            self.set(collection, doc_id, data)
+
+
+class AzureBlobStore(BlobStore):
+    """Blob store on Azure Blob Storage; tags are blob index tags"""
+
+    def __init__(self, blob_service_client):
+        self.client = blob_service_client
+        self._containers = set()
+        self._container_clients = {}
+
+    def ensure_container(self, container):
+        # Created once per process instead of on every write
+        if container in self._containers:
+            return
+        try:
+            self.client.create_container(container)
+        except Exception:
+            pass  # Container already exists
+        self._containers.add(container)
+
+    def _container(self, container):
+        # Container clients share the service's connection pool and are reused across calls
+        client = self._container_clients.get(container)
+        if client is None:
+            client = self._container_clients[container] = self.client.get_container_client(container)
+        return client
+
+    def put(self, container, name, data, metadata=None, tags=None, content_encoding=None):
+        options = {}
+        if metadata is not None:
+            options['metadata'] = metadata
+        if tags:
+            options['tags'] = tags
+        if content_encoding:
+            from azure.storage.blob import ContentSettings
+
+            options['content_settings'] = ContentSettings(
+                content_type='application/json', content_encoding=content_encoding
+            )
+        options.update(_blob_call_options())
+        self._container(container).get_blob_client(name).upload_blob(data, overwrite=True, **options)
+
+    def get(self, container, name):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            # Compressed blobs are decoded by decode_json, not by the transport
+            return self._container(container).get_blob_client(name).download_blob(
+                decompress=False, **_blob_call_options()
+            ).readall()
+        except ResourceNotFoundError:
+            return None
+
+    def get_metadata(self, container, name):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            return self._container(container).get_blob_client(name).get_blob_properties(**_blob_call_options()).metadata
+        except ResourceNotFoundError:
+            return None
+
+    def delete(self, container, name):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            self._container(container).get_blob_client(name).delete_blob(**_blob_call_options())
+        except ResourceNotFoundError:
+            pass
+
+    def list_page(self, container, prefix='', limit=100, cursor=None):
+        pages = self._container(container).list_blobs(
+            name_starts_with=prefix or None, include=['metadata'], results_per_page=limit, **_blob_call_options()
+        ).by_page(continuation_token=cursor)
+        objects = [StoredObject(b.name, b.metadata or {}, b.last_modified) for b in next(pages, [])]
+        return objects, pages.continuation_token
+
+    def query_page(self, container, conditions, limit=100, cursor=None):
+        _check_conditions(conditions)
+        tag_filter = ' AND '.join(
+            f"\"{field}\" {'=' if operator == '==' else operator} '{value}'"
+            for field, operator, value in conditions
+        )
+        pages = self._container(container).find_blobs_by_tags(
+            tag_filter, results_per_page=limit, **_blob_call_options()
+        ).by_page(continuation_token=cursor)
+        # Tag queries return names only
+        objects = [StoredObject(b.name, None, None) for b in next(pages, [])]
+        return objects, pages.continuation_token
+
+
+class FirestoreStore(DocumentStore):
+    """Document store on Cloud Firestore"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, collection, doc_id):
+        doc = self.db.collection(collection).document(doc_id).get(**_call_options())
+        return doc.to_dict() if doc.exists else None
+
+    def set(self, collection, doc_id, data):
+        self.db.collection(collection).document(doc_id).set(data, **_call_options())
+
+    def add(self, collection, data):
+        _, ref = self.db.collection(collection).add(data, **_call_options())
+        return ref.id
+
+    def update(self, collection, doc_id, fields):
+        self.db.collection(collection).document(doc_id).update(fields, **_call_options())
+
+    def transform(self, collection, doc_id, fn):
+        from firebase_admin import firestore
+
+        ref = self.db.collection(collection).document(doc_id)
+
+        @firestore.transactional
+        def run(transaction):
+            snapshot = ref.get(transaction=transaction)
+            data = fn(snapshot.to_dict() if snapshot.exists else None)
+            transaction.set(ref, data)
+            return data
+
+        return run(self.db.transaction())
+
+    def transform_many(self, refs, fn):
+        from firebase_admin import firestore
+
+        refs = [self.db.collection(collection).document(doc_id) for collection, doc_id in refs]
+
+        @firestore.transactional
+        def run(transaction):
+            # Firestore transactions read everything before writing anything
+            snapshots = [ref.get(transaction=transaction) for ref in refs]
+            documents = fn([snapshot.to_dict() if snapshot.exists else None for snapshot in snapshots])
+            for ref, data in zip(refs, documents):
+                transaction.set(ref, data)
+            return documents
+
+        return run(self.db.transaction())
+
+    def query(self, collection, conditions=(), order_by=None, descending=False, limit=None, start_after=None):
+        from firebase_admin import firestore
+
+        _check_conditions(conditions)
+        query = self.db.collection(collection)
+        for field, operator, value in conditions:
+            query = query.where(field, operator, value)
+        if order_by:
+            direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+            query = query.order_by(order_by, direction=direction)
+        if start_after:
+            query = query.start_after(self.db.collection(collection).document(start_after).get())
+        if limit:
+            query = query.limit(limit)
+        return [(doc.id, doc.to_dict()) for doc in query.get(**_call_options())]
+
+    def set_many(self, writes):
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for collection, doc_id, data in writes[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(self.db.collection(collection).document(doc_id), data)
+            batch.commit()
+
+
+class SQLiteDatabase:
+    """Per-thread SQLite connections to one WAL-mode database file"""
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.local = threading.local()
+        with self.connect() as connection:
+            connection.executescript(schema)
+
+    def connect(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+
+def _next_page(rows, limit, key):
+    """Trim a ``limit + 1`` row fetch and derive the next cursor"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, key(rows[-1])
+    return rows, None
+
+
+class SQLiteBlobStore(BlobStore):
+    """Local blob store: contents on the filesystem, names, metadata and tags in SQLite"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS objects (
+            container TEXT NOT NULL,
+            name TEXT NOT NULL,
+            metadata TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_modified REAL NOT NULL,
+            PRIMARY KEY (container, name)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS object_tags (
+            container TEXT NOT NULL,
+            name TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (container, name, tag)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS object_tags_by_value ON object_tags (container, tag, value);
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        self.database = SQLiteDatabase(os.path.join(root, 'blobs.db'), self.SCHEMA)
+
+    def _path(self, container, name):
+        # Hashed file names keep arbitrary blob names filesystem-safe
+        digest = hashlib.sha256(f"{container}/{name}".encode('utf-8')).hexdigest()
+        return os.path.join(self.root, 'blobs', digest[:2], digest)
+
+    def _write_file(self, container, name, data):
+        path = self._path(container, name)
+        if not data:
+            if os.path.exists(path):
+                os.remove(path)
+            return 0
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def _upsert(self, connection, container, name, size, metadata, tags):
+        connection.execute(
+            'INSERT OR REPLACE INTO objects (container, name, metadata, size, last_modified) VALUES (?, ?, ?, ?, ?)',
+            (container, name, json.dumps(metadata or {}), size, datetime.now(timezone.utc).timestamp())
+        )
+        connection.execute('DELETE FROM object_tags WHERE container = ? AND name = ?', (container, name))
+        connection.executemany(
+            'INSERT INTO object_tags (container, name, tag, value) VALUES (?, ?, ?, ?)',
+            [(container, name, tag, str(value)) for tag, value in (tags or {}).items()]
+        )
+
+    def put(self, container, name, data, metadata=None, tags=None, content_encoding=None):
+        # Compressed contents are recognised by their gzip header when read
+        self.put_many(container, [(name, data, metadata, tags)])
+
+    def put_many(self, container, items):
+        # Contents first, written in parallel, then every row in a single transaction
+        items = list(items)
+        if len(items) > 1:
+            sizes = io_map(lambda item: self._write_file(container, item[0], item[1]), items)
+        else:
+            sizes = [self._write_file(container, name, data) for name, data, _, _ in items]
+        rows = [(name, size, metadata, tags) for (name, _, metadata, tags), size in zip(items, sizes)]
+        with self.database.connect() as connection:
+            for name, size, metadata, tags in rows:
+                self._upsert(connection, container, name, size, metadata, tags)
+
+    def get(self, container, name):
+        row = self.database.connect().execute(
+            'SELECT size FROM objects WHERE container = ? AND name = ?', (container, name)
+        ).fetchone()
+        if row is None:
+            return None
+        if not row[0]:
+            return b''
+        try:
+            with open(self._path(container, name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def get_metadata(self, container, name):
+        row = self.database.connect().execute(
+            'SELECT metadata FROM objects WHERE container = ? AND name = ?', (container, name)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, container, name):
+        self.delete_many(container, [name])
+
+    def delete_many(self, container, names):
+        with self.database.connect() as connection:
+            for name in names:
+                connection.execute('DELETE FROM objects WHERE container = ? AND name = ?', (container, name))
+                connection.execute('DELETE FROM object_tags WHERE container = ? AND name = ?', (container, name))
+        for name in names:
+            try:
+                os.remove(self._path(container, name))
+            except FileNotFoundError:
+                pass
+
+    def _objects(self, rows):
+        return [
+            StoredObject(name, json.loads(metadata), datetime.fromtimestamp(modified, timezone.utc))
+            for name, metadata, modified in rows
+        ]
+
+    def list_page(self, container, prefix='', limit=100, cursor=None):
+        sql = 'SELECT name, metadata, last_modified FROM objects WHERE container = ? AND name >= ?'
+        params = [container, prefix]
+        if cursor:
+            sql += ' AND name > ?'
+            params.append(cursor)
+        if prefix:
+            # Upper bound of the prefix range keeps this an index seek
+            sql += ' AND name < ?'
+            params.append(prefix + '\U0010ffff')
+        sql += ' ORDER BY name LIMIT ?'
+        params.append(limit + 1)
+        rows, next_cursor = _next_page(self.database.connect().execute(sql, params).fetchall(), limit, lambda r: r[0])
+        return self._objects(rows), next_cursor
+
+    def query_page(self, container, conditions, limit=100, cursor=None):
+        _check_conditions(conditions)
+        sql = 'SELECT o.name, o.metadata, o.last_modified FROM objects o WHERE o.container = ?'
+        params = [container]
+        for tag, operator, value in conditions:
+            sql += (
+                ' AND EXISTS (SELECT 1 FROM object_tags t WHERE t.container = o.container'
+                f" AND t.name = o.name AND t.tag = ? AND t.value {'=' if operator == '==' else operator} ?)"
+            )
+            params.extend([tag, str(value)])
+        if cursor:
+            sql += ' AND o.name > ?'
+            params.append(cursor)
+        sql += ' ORDER BY o.name LIMIT ?'
+        params.append(limit + 1)
+        rows, next_cursor = _next_page(self.database.connect().execute(sql, params).fetchall(), limit, lambda r: r[0])
+        return self._objects(rows), next_cursor
+
+
+def _encode_document(value):
+    # Datetimes are stored as ISO strings, which sort chronologically
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot store value of type {type(value).__name__}")
+
+
+def _query_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class SQLiteDocumentStore(DocumentStore):
+    """Local document store: JSON documents in SQLite, queried with json_extract"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            collection TEXT NOT NULL,
+            doc_id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (collection, doc_id)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, root):
+        os.makedirs(root, exist_ok=True)
+        self.database = SQLiteDatabase(os.path.join(root, 'documents.db'), self.SCHEMA)
+
+    def get(self, collection, doc_id):
+        row = self.database.connect().execute(
+            'SELECT data FROM documents WHERE collection = ? AND doc_id = ?', (collection, doc_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, collection, doc_id, data):
+        self.set_many([(collection, doc_id, data)])
+
+    def set_many(self, writes):
+        with self.database.connect() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO documents (collection, doc_id, data) VALUES (?, ?, ?)',
+                [(collection, doc_id, json.dumps(data, default=_encode_document)) for collection, doc_id, data in writes]
+            )
+
+    def update(self, collection, doc_id, fields):
+        def apply(data):
+            if data is None:
+                raise KeyError(f"No document {collection}/{doc_id}")
+            data.update(fields)
+            return data
+
+        self.transform(collection, doc_id, apply)
+
+    def transform(self, collection, doc_id, fn):
+        connection = self.database.connect()
+        with connection:
+            # Take the write lock before reading so concurrent transforms serialise
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT data FROM documents WHERE collection = ? AND doc_id = ?', (collection, doc_id)
+            ).fetchone()
+            data = fn(json.loads(row[0]) if row else None)
+            connection.execute(
+                'INSERT OR REPLACE INTO documents (collection, doc_id, data) VALUES (?, ?, ?)',
+                (collection, doc_id, json.dumps(data, default=_encode_document))
+            )
+        return data
+
+    def transform_many(self, refs, fn):
+        connection = self.database.connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            current = []
+            for collection, doc_id in refs:
+                row = connection.execute(
+                    'SELECT data FROM documents WHERE collection = ? AND doc_id = ?', (collection, doc_id)
+                ).fetchone()
+                current.append(json.loads(row[0]) if row else None)
+            documents = fn(current)
+            connection.executemany(
+                'INSERT OR REPLACE INTO documents (collection, doc_id, data) VALUES (?, ?, ?)',
+                [(collection, doc_id, json.dumps(data, default=_encode_document))
+                 for (collection, doc_id), data in zip(refs, documents)]
+            )
+        return documents
+
+    def query(self, collection, conditions=(), order_by=None, descending=False, limit=None, start_after=None):
+        _check_conditions(conditions)
+        sql = 'SELECT doc_id, data FROM documents WHERE collection = ?'
+        params = [collection]
+        for field, operator, value in conditions:
+            sql += f" AND json_extract(data, ?) {'=' if operator == '==' else operator} ?"
+            params.extend([f'$.{field}', _query_value(value)])
+
+        if order_by:
+            path = f'$.{order_by}'
+            if start_after:
+                anchor = self.get(collection, start_after)
+                if anchor is not None:
+                    after = '<' if descending else '>'
+                    sql += f" AND (json_extract(data, ?) {after} ? OR (json_extract(data, ?) = ? AND doc_id {after} ?))"
+                    params.extend([path, anchor.get(order_by), path, anchor.get(order_by), start_after])
+            direction = 'DESC' if descending else 'ASC'
+            sql += f" ORDER BY json_extract(data, ?) {direction}, doc_id {direction}"
+            params.append(path)
+        elif start_after:
+            sql += ' AND doc_id > ?'
+            params.append(start_after)
+            sql += ' ORDER BY doc_id'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        rows = self.database.connect().execute(sql, params).fetchall()
+        return [(doc_id, json.loads(data)) for doc_id, data in rows]
+
+
+def _local_storage_dir():
+    return os.getenv('LOCAL_STORAGE_DIR', DEFAULT_LOCAL_STORAGE_DIR)
+
+
+def storage_backend():
+    return os.getenv('STORAGE_BACKEND', 'azure').lower()
+
+
+def create_blob_store():
+    """Blob store for STORAGE_BACKEND; None when Azure is selected but not configured"""
+    if storage_backend() == 'local':
+        logger.info("Using local blob storage in %s", _local_storage_dir())
+        return SQLiteBlobStore(_local_storage_dir())
+
+    try:
+        from azure.storage.blob import BlobServiceClient
+
+        account_key = os.getenv('AZURE_STORAGE_ACCOUNT_KEY')
+        if not account_key:
+            logger.warning("Azure Storage credentials not provided")
+            return None
+        account_name = os.getenv('AZURE_STORAGE_ACCOUNT_NAME', 'qageneratorhistory')
+        blob_service_client = BlobServiceClient(
+            account_url=f"https://{account_name}.blob.core.windows.net",
+            credential=account_key
+        )
+        logger.info("Azure Storage initialized successfully")
+        return AzureBlobStore(blob_service_client)
+    except Exception as e:
+        logger.error("Azure Storage initialization failed: %s", e)
+        return None
+
+
+def create_document_store():
+    """Document store for STORAGE_BACKEND; None when Firestore is selected but unavailable"""
+    if storage_backend() == 'local':
+        logger.info("Using local document storage in %s", _local_storage_dir())
+        return SQLiteDocumentStore(_local_storage_dir())
+
+    try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_PATH', 'firebase-key.json'))
+            firebase_admin.initialize_app(cred)
+        return FirestoreStore(firestore.client())
+    except Exception as e:
+        logger.error("Firestore initialization failed: %s", e)
+        return None
@@ -0,0 +1,251 @@
+"""Incremental transcription of interview audio uploaded in segments while recording.
+
+Requests for one stream are not sticky, so chunk, status and finish calls can
+reach any gunicorn worker.  Streams and segment results are therefore kept in
+a SQLite file under ``TRANSCRIPTION_STREAM_DIR`` that the workers of a host
+share; the worker that receives a segment transcribes it and stores the
+result there.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import deadlines
+from storage_backends import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# How often finish() looks for segments transcribed by another worker
+POLL_INTERVAL = 0.2
+
+
+class StreamingTranscriber:
+    """Transcribe audio segments in the background as soon as they arrive.
+
+    The browser stops and restarts its MediaRecorder every few seconds so each
+    uploaded segment is a standalone, decodable file.  Segments are handed to a
+    thread pool immediately, so by the time the candidate stops talking only the
+    last segment is still being transcribed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS streams (
+            stream_id TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            last_activity REAL NOT NULL,
+            finished INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS streams_by_activity ON streams (last_activity);
+        CREATE TABLE IF NOT EXISTS stream_segments (
+            stream_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            audio_ms INTEGER,
+            started_at REAL NOT NULL,
+            PRIMARY KEY (stream_id, seq)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, transcribe_fn, max_workers=4, idle_timeout=1800, segment_timeout=90, directory=None):
+        self.transcribe_fn = transcribe_fn
+        self.idle_timeout = idle_timeout
+        # Each segment is transcribed within this deadline, so one still pending
+        # after it belonged to a worker that died; finish() waits no longer
+        self.segment_timeout = segment_timeout
+        self.directory = directory or os.getenv(
+            'TRANSCRIPTION_STREAM_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-transcription')
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stt-stream')
+        self._database = None
+        # Segments this worker is transcribing, so finish() here can wait without polling
+        self.running = {}
+        self.lock = threading.Lock()
+
+    @property
+    def database(self):
+        # Opened on first use so importing the app creates no files
+        if self._database is None:
+            with self.lock:
+                if self._database is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    database = SQLiteDatabase(os.path.join(self.directory, 'transcription_streams.db'), self.SCHEMA)
+                    with database.connect() as connection:
+                        columns = {row[1] for row in connection.execute('PRAGMA table_info(stream_segments)')}
+                        # Files created before segment lengths were recorded
+                        if 'audio_ms' not in columns:
+                            connection.execute('ALTER TABLE stream_segments ADD COLUMN audio_ms INTEGER')
+                    self._database = database
+        return self._database
+
+    def open_stream(self):
+        self._expire_idle_streams()
+        stream_id = uuid.uuid4().hex
+        now = time.time()
+        with self.database.connect() as connection:
+            connection.execute(
+                'INSERT INTO streams (stream_id, created_at, last_activity) VALUES (?, ?, ?)',
+                (stream_id, now, now)
+            )
+        return stream_id
+
+    def _stream(self, connection, stream_id):
+        row = connection.execute('SELECT finished FROM streams WHERE stream_id = ?', (stream_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown transcription stream: {stream_id}")
+        return row
+
+    def add_segment(self, stream_id, seq, filename, audio_data, audio_ms=None):
+        """Queue one audio segment for transcription and return immediately
+
+        ``audio_ms`` is the recorded length the browser reports; it keeps later
+        segments on the right timeline if this one cannot be transcribed.
+        """
+        connection = self.database.connect()
+        with connection:
+            (finished,) = self._stream(connection, stream_id)
+            if finished:
+                raise ValueError('Transcription stream already finished')
+            if not audio_data:
+                return
+            now = time.time()
+            connection.execute('UPDATE streams SET last_activity = ? WHERE stream_id = ?', (now, stream_id))
+            connection.execute(
+                'INSERT OR REPLACE INTO stream_segments (stream_id, seq, state, audio_ms, started_at) '
+                "VALUES (?, ?, 'pending', ?, ?)",
+                (stream_id, seq, audio_ms, now)
+            )
+        with self.lock:
+            future = self.executor.submit(self._transcribe_segment, stream_id, seq, filename, audio_data)
+            self.running[(stream_id, seq)] = future
+        future.add_done_callback(lambda _: self._forget(stream_id, seq, future))
+
+    def _forget(self, stream_id, seq, future):
+        with self.lock:
+            if self.running.get((stream_id, seq)) is future:
+                del self.running[(stream_id, seq)]
+
+    def _transcribe_segment(self, stream_id, seq, filename, audio_data):
+        error = None
+        try:
+            with deadlines.bounded(self.segment_timeout):
+                result = self.transcribe_fn(filename, audio_data)
+        except Exception as e:
+            # A silent segment has no phrases; keep the rest of the transcript usable
+            logger.warning("Stream %s segment %s failed: %s", stream_id, seq, e)
+            error = str(e)
+            result = ''
+        if isinstance(result, str):
+            result = {'text': result, 'phrases': [], 'duration_ms': None}
+        with self.database.connect() as connection:
+            connection.execute(
+                'UPDATE stream_segments SET state = ?, result = ?, error = ? WHERE stream_id = ? AND seq = ?',
+                ('failed' if error else 'done', json.dumps(result), error, stream_id, seq)
+            )
+
+    def status(self, stream_id):
+        """Transcript of the segments completed so far, in recording order"""
+        connection = self.database.connect()
+        (finished,) = self._stream(connection, stream_id)
+        rows = connection.execute(
+            'SELECT seq, state, result, audio_ms, started_at FROM stream_segments WHERE stream_id = ? ORDER BY seq',
+            (stream_id,)
+        ).fetchall()
+        abandoned_before = time.time() - self.segment_timeout
+        segments = []
+        failed = []
+        pending = 0
+        for seq, state, result, audio_ms, started_at in rows:
+            if state == 'pending' and started_at >= abandoned_before:
+                pending += 1
+                continue
+            if state != 'done':
+                failed.append(seq)
+            result = json.loads(result) if result else {'text': '', 'phrases': [], 'duration_ms': None}
+            segments.append((seq, result, audio_ms, state != 'done'))
+        # Sequence numbers start at 0; a hole is a segment whose upload never arrived
+        missing = sorted(set(range(rows[-1][0] + 1)) - {row[0] for row in rows}) if rows else []
+        status = {
+            'stream_id': stream_id,
+            'transcript': ' '.join(result['text'] for _, result, _, _ in segments if result['text']).strip(),
+            'segments': len(rows),
+            'pending': pending,
+            'failed': failed,
+            'missing': missing,
+            'incomplete': bool(failed or missing),
+            'finished': bool(finished)
+        }
+        # Segment offsets are only known once every earlier segment is done
+        if not pending:
+            status['phrases'], status['duration_ms'], status['gaps'] = self._merge_phrases(segments)
+        return status
+
+    def _merge_phrases(self, segments):
+        """Shift each segment's phrase offsets onto the whole recording's timeline
+
+        A failed segment still advances the timeline by its recorded length and
+        is returned as a gap, so later phrases keep their real offsets.
+        """
+        phrases = []
+        gaps = []
+        elapsed_ms = 0
+        for seq, result, audio_ms, failed in segments:
+            segment_end = 0
+            for phrase in result['phrases']:
+                shifted = dict(phrase)
+                shifted['offsetMilliseconds'] = phrase.get('offsetMilliseconds', 0) + elapsed_ms
+                # Diarization numbers speakers per segment, so labels only compare within one
+                shifted['segment'] = seq
+                phrases.append(shifted)
+                segment_end = max(segment_end, phrase.get('offsetMilliseconds', 0) + phrase.get('durationMilliseconds', 0))
+            length_ms = result['duration_ms'] or audio_ms or segment_end
+            if failed:
+                gaps.append({'segment': seq, 'offset_ms': elapsed_ms, 'duration_ms': length_ms})
+            elapsed_ms += length_ms
+        return phrases, elapsed_ms, gaps
+
+    def finish(self, stream_id, timeout=None):
+        """Wait for outstanding segments and return the full transcript
+
+        Waiting ``segment_timeout`` (the default) is enough for every segment to
+        be done or abandoned; a shorter ``timeout`` may leave some pending.
+        """
+        if timeout is None:
+            timeout = self.segment_timeout
+        with self.database.connect() as connection:
+            self._stream(connection, stream_id)
+            connection.execute(
+                'UPDATE streams SET finished = 1, last_activity = ? WHERE stream_id = ?', (time.time(), stream_id)
+            )
+        until = time.monotonic() + timeout
+        with self.lock:
+            local = [future for (sid, _), future in self.running.items() if sid == stream_id]
+        wait(local, timeout=timeout)
+        # Segments uploaded to other workers finish there
+        status = self.status(stream_id)
+        while status['pending'] and time.monotonic() < until:
+            time.sleep(min(POLL_INTERVAL, max(0.0, until - time.monotonic())))
+            status = self.status(stream_id)
+        return status
+
+    def close_stream(self, stream_id):
+        with self.lock:
+            for key in [key for key in self.running if key[0] == stream_id]:
+                self.running.pop(key).cancel()
+        with self.database.connect() as connection:
+            connection.execute('DELETE FROM stream_segments WHERE stream_id = ?', (stream_id,))
+            connection.execute('DELETE FROM streams WHERE stream_id = ?', (stream_id,))
+
+    def _expire_idle_streams(self):
+        cutoff = time.time() - self.idle_timeout
+        expired = [stream_id for (stream_id,) in self.database.connect().execute(
+            'SELECT stream_id FROM streams WHERE last_activity < ?', (cutoff,)
+        )]
+        for stream_id in expired:
+            self.close_stream(stream_id)
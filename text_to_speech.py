@@ -0,0 +1,301 @@
+"""Text-to-speech synthesis with a content-addressed audio cache"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+DEFAULT_VOICE = os.getenv('AZURE_TTS_VOICE', 'en-US-JennyNeural')
+CACHE_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# Azure neural voice names such as en-US-JennyNeural; anything else could break out of the SSML
+VOICE_PATTERN = re.compile(r'^[A-Za-z]{2,3}-[A-Za-z]{2,4}-\w+Neural$')
+# Audio durations remembered per process
+MAX_DURATIONS = 4096
+# A pending marker older than this was left by a worker that died mid-synthesis
+PENDING_STALE_AFTER = 120
+# How often a worker without the job looks for the finished file
+POLL_INTERVAL = 0.1
+# Least often the cache directory is scanned for eviction
+PRUNE_INTERVAL = 300
+
+
+class AzureSpeechSynthesizer:
+    """Azure Speech text-to-speech over the REST API"""
+    name = 'azure'
+    extension = 'mp3'
+    mimetype = 'audio/mpeg'
+    bitrate = 48000
+
+    def __init__(self, key, region):
+        self.key = key
+        self.region = region
+
+    def synthesize(self, text, voice):
+        import requests
+
+        # escape() leaves quotes alone; the voice sits in a single-quoted attribute
+        voice_name = escape(voice, {"'": '&apos;'})
+        ssml = (
+            "<speak version='1.0' xml:lang='en-US'>"
+            f"<voice name='{voice_name}'>{escape(text)}</voice>"
+            "</speak>"
+        )
+        response = requests.post(
+            f"https://{self.region}.tts.speech.microsoft.com/cognitiveservices/v1",
+            headers={
+                'Ocp-Apim-Subscription-Key': self.key,
+                'Content-Type': 'application/ssml+xml',
+                'X-Microsoft-OutputFormat': 'audio-24khz-48kbitrate-mono-mp3',
+                'User-Agent': 'TalentCoreAI'
+            },
+            data=ssml.encode('utf-8'),
+            timeout=30
+        )
+        if response.status_code != 200:
+            raise Exception(f"TTS API error: {response.status_code} - {response.text}")
+        return response.content
+
+    def duration(self, audio_data):
+        return len(audio_data) * 8 / self.bitrate
+
+
+class SilentSynthesizer:
+    """Offline stand-in that renders silence sized to the speaking time of the text"""
+    name = 'silent'
+    extension = 'wav'
+    mimetype = 'audio/wav'
+    sample_rate = 16000
+    seconds_per_char = 0.065
+
+    def synthesize(self, text, voice):
+        frames = int(len(text) * self.seconds_per_char * self.sample_rate)
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(b'\x00\x00' * frames)
+        return buffer.getvalue()
+
+    def duration(self, audio_data):
+        with wave.open(io.BytesIO(audio_data), 'rb') as wav:
+            return wav.getnframes() / wav.getframerate()
+
+
+def create_synthesizer():
+    """Pick the synthesizer from TTS_ENGINE, defaulting to Azure when configured"""
+    engine = os.getenv('TTS_ENGINE', '').lower()
+    key = os.getenv('AZURE_SPEECH_KEY')
+    region = os.getenv('AZURE_SPEECH_REGION')
+    if engine == 'silent' or not (key and region):
+        return SilentSynthesizer()
+    return AzureSpeechSynthesizer(key, region)
+
+
+class TTSCache:
+    """Audio files on disk named by a hash of engine, voice and text.
+
+    Identical text is only ever synthesized once per voice.  Synthesis can be
+    started ahead of time with ``prefetch``; a request for audio that is still
+    being produced waits for it instead of synthesizing it again.
+
+    The cache directory is shared by the workers of a host.  A worker that
+    starts a synthesis drops a ``<key>.pending`` marker next to the audio, so
+    the others wait for that file rather than answering 404 or synthesizing
+    it twice.  Files unused for ``TTS_CACHE_MAX_AGE`` seconds are removed, and
+    the least recently used go first once the cache outgrows
+    ``TTS_CACHE_MAX_BYTES``.
+    """
+
+    def __init__(self, synthesizer, cache_dir=None, max_workers=4, max_bytes=None, max_age=None):
+        self.synthesizer = synthesizer
+        self.cache_dir = cache_dir or os.getenv('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'talentcore-tts'))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = int(max_bytes or os.getenv('TTS_CACHE_MAX_BYTES', str(1024 ** 3)))
+        self.max_age = float(max_age or os.getenv('TTS_CACHE_MAX_AGE', str(30 * 24 * 3600)))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts')
+        self.pending = {}
+        self.durations = OrderedDict()
+        self.lock = threading.Lock()
+        self.last_prune = 0.0
+        self.stats = {'hits': 0, 'in_flight_hits': 0, 'syntheses': 0, 'evictions': 0}
+
+    def cache_key(self, text, voice=DEFAULT_VOICE):
+        if not VOICE_PATTERN.match(voice or ''):
+            raise ValueError('Invalid voice')
+        material = f"{self.synthesizer.name}\n{voice}\n{text}".encode('utf-8')
+        return hashlib.sha256(material).hexdigest()
+
+    def path_for(self, key):
+        if not CACHE_KEY_PATTERN.match(key):
+            raise ValueError('Invalid audio key')
+        return os.path.join(self.cache_dir, f"{key}.{self.synthesizer.extension}")
+
+    def marker_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pending")
+
+    def _touch(self, path):
+        """Mark a cached file as used, so eviction takes the least recently used first"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _claim(self, key):
+        """Create the pending marker; False if another worker is synthesizing ``key``"""
+        marker = self.marker_for(key)
+        for _ in range(2):
+            try:
+                os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(marker) < PENDING_STALE_AFTER:
+                        return False
+                    os.remove(marker)
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def prefetch(self, text, voice=DEFAULT_VOICE):
+        """Start synthesizing in the background and return the cache key"""
+        key = self.cache_key(text, voice)
+        if self._touch(self.path_for(key)):
+            with self.lock:
+                self.stats['hits'] += 1
+            return key
+        with self.lock:
+            if key in self.pending or not self._claim(key):
+                self.stats['in_flight_hits'] += 1
+                return key
+            # Another worker may have finished it between the lookup and the claim
+            if os.path.exists(self.path_for(key)):
+                os.remove(self.marker_for(key))
+                self.stats['hits'] += 1
+                return key
+            future = self.executor.submit(self._synthesize, key, text, voice)
+            self.pending[key] = future
+            self.stats['syntheses'] += 1
+        future.add_done_callback(lambda _: self._clear_pending(key))
+        return key
+
+    def _clear_pending(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def _synthesize(self, key, text, voice):
+        try:
+            audio_data = self.synthesizer.synthesize(text, voice)
+            path = self.path_for(key)
+            # Write then rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio_data)
+            os.replace(tmp_path, path)
+            self._remember_duration(key, self.synthesizer.duration(audio_data))
+        finally:
+            try:
+                os.remove(self.marker_for(key))
+            except FileNotFoundError:
+                pass
+        self._maybe_prune()
+        return path
+
+    def get(self, text, voice=DEFAULT_VOICE, timeout=30):
+        """Cache key for the audio of ``text``, synthesizing it if needed"""
+        key = self.prefetch(text, voice)
+        self.wait(key, timeout)
+        return key
+
+    def wait(self, key, timeout=30):
+        """Path of the cached audio, waiting for in-flight synthesis; None if unknown"""
+        path = self.path_for(key)
+        with self.lock:
+            future = self.pending.get(key)
+        if future:
+            future.result(timeout=timeout)
+        elif not os.path.exists(path):
+            # Another worker may be synthesizing it: wait while its marker is there
+            until = time.monotonic() + timeout
+            marker = self.marker_for(key)
+            while not os.path.exists(path) and os.path.exists(marker):
+                if time.monotonic() >= until:
+                    raise TimeoutError(f"Audio {key} is still being synthesized")
+                time.sleep(POLL_INTERVAL)
+        return path if self._touch(path) else None
+
+    def duration(self, key):
+        with self.lock:
+            seconds = self.durations.get(key)
+            if seconds is not None:
+                self.durations.move_to_end(key)
+                return seconds
+        path = self.wait(key)
+        if not path:
+            return None
+        with open(path, 'rb') as f:
+            seconds = self.synthesizer.duration(f.read())
+        self._remember_duration(key, seconds)
+        return seconds
+
+    def _remember_duration(self, key, seconds):
+        with self.lock:
+            self.durations[key] = seconds
+            self.durations.move_to_end(key)
+            while len(self.durations) > MAX_DURATIONS:
+                self.durations.popitem(last=False)
+
+    def _maybe_prune(self):
+        with self.lock:
+            if time.monotonic() - self.last_prune < PRUNE_INTERVAL:
+                return
+            self.last_prune = time.monotonic()
+        self.prune()
+
+    def prune(self):
+        """Remove audio unused for ``max_age``, then the least recently used beyond ``max_bytes``"""
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith('.pending'):
+                continue
+            # Partial writes are left behind only by a crash
+            if entry.name.endswith('.part'):
+                if now - stat.st_mtime > PENDING_STALE_AFTER:
+                    files.append((0.0, stat.st_size, entry.path))
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+            key = os.path.basename(path).split('.', 1)[0]
+            with self.lock:
+                self.durations.pop(key, None)
+        if removed:
+            with self.lock:
+                self.stats['evictions'] += removed
+        return removed
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.stats, pending=len(self.pending))